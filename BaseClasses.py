@@ -57,6 +57,7 @@ class MultiWorld():
     plando_connections: List
     worlds: Dict[int, auto_world]
     groups: Dict[int, Group]
+    entrance_dependents: Dict[Optional[Tuple[int, Optional[str]]], Set[Entrance]]
     regions: RegionManager
     itempool: List[Item]
     is_race: bool = False
@@ -152,6 +153,7 @@ class MultiWorld():
         self.early_items = {player: {} for player in self.player_ids}
         self.local_early_items = {player: {} for player in self.player_ids}
         self.indirect_connections = {}
+        self.entrance_dependents = {}
         self.start_inventory_from_pool: Dict[int, Options.StartInventoryPool] = {}
         self.fix_trock_doors = self.AttributeProxy(
             lambda player: self.shuffle[player] != 'vanilla' or self.mode[player] == 'inverted')
@@ -496,7 +498,12 @@ class MultiWorld():
         else:
             return all((self.has_beaten_game(state, p) for p in range(1, self.players + 1)))
 
-    def can_beat_game(self, starting_state: Optional[CollectionState] = None) -> bool:
+    def can_beat_game(self, starting_state: Optional[CollectionState] = None,
+                      locations: Optional[Iterable[Location]] = None) -> bool:
+        """
+        Searches spheres from starting_state, or from a fresh state, until the game is beaten.
+        The search can be limited to locations, which defaults to all of them.
+        """
         if starting_state:
             if self.has_beaten_game(starting_state):
                 return True
@@ -505,24 +512,22 @@ class MultiWorld():
             if self.has_beaten_game(self.state):
                 return True
             state = CollectionState(self)
-        prog_locations = {location for location in self.get_locations() if location.item
+        if locations is None:
+            locations = self.get_locations()
+        prog_locations = {location for location in locations if location.item
                           and location.item.advancement and location not in state.locations_checked}
+        search = SphereSearch(state, prog_locations)
 
-        while prog_locations:
-            sphere: Set[Location] = set()
+        while search:
             # build up spheres of collection radius.
             # Everything in each sphere is independent from each other in dependencies and only depends on lower spheres
-            for location in prog_locations:
-                if location.can_reach(state):
-                    sphere.add(location)
+            sphere = search.next_sphere()
 
             if not sphere:
                 # ran out of places and did not finish yet, quit
                 return False
 
-            for location in sphere:
-                state.collect(location.item, True, location)
-            prog_locations -= sphere
+            search.collect_sphere(sphere)
 
             if self.has_beaten_game(state):
                 return True
@@ -538,23 +543,16 @@ class MultiWorld():
         unreachable locations.
         """
         state = CollectionState(self)
-        locations = set(self.get_filled_locations())
-
-        while locations:
-            sphere: Set[Location] = set()
+        search = SphereSearch(state, set(self.get_filled_locations()))
 
-            for location in locations:
-                if location.can_reach(state):
-                    sphere.add(location)
+        while search:
+            sphere = search.next_sphere()
             yield sphere
             if not sphere:
-                if locations:
-                    yield locations  # unreachable locations
+                yield search.remaining  # unreachable locations
                 break
 
-            for location in sphere:
-                state.collect(location.item, True, location)
-            locations -= sphere
+            search.collect_sphere(sphere)
 
     def fulfills_accessibility(self, state: Optional[CollectionState] = None):
         """Check if accessibility rules are fulfilled with current or supplied state."""
@@ -589,22 +587,19 @@ class MultiWorld():
             """Check if all access rules are fulfilled"""
             if not beatable_fulfilled:
                 return False
-            if any(location_condition(location) for location in locations):
+            if any(location_condition(location) for location in search.remaining):
                 return False  # still locations required to be collected
             return True
 
-        locations = [location for location in self.get_locations() if location_relevant(location)]
+        search = SphereSearch(state, {location for location in self.get_locations() if location_relevant(location)})
 
-        while locations:
-            sphere: List[Location] = []
-            for n in range(len(locations) - 1, -1, -1):
-                if locations[n].can_reach(state):
-                    sphere.append(locations.pop(n))
+        while search:
+            sphere = search.next_sphere()
 
             if not sphere:
                 # ran out of places and did not finish yet, quit
                 logging.warning(f"Could not access required locations for accessibility check."
-                                f" Missing: {locations}")
+                                f" Missing: {search.remaining}")
                 return False
 
             for location in sphere:
@@ -623,11 +618,215 @@ class MultiWorld():
 PathValue = Tuple[str, Optional["PathValue"]]
 
 
+class ItemCounter(Counter):
+    """
+    Counter of a player's item names, that also keeps a running count per item name group of that player's game,
+    so that looking up a group does not have to go through every item name in it.
+    """
+    group_ids: Dict[str, int]
+    """index of each group name in group_counts"""
+    item_group_ids: Dict[str, Tuple[int, ...]]
+    """indexes of the groups each item name is in"""
+    group_counts: List[int]
+
+    def __init__(self, group_ids: Dict[str, int], item_group_ids: Dict[str, Tuple[int, ...]],
+                 iterable: Optional[Iterable[str]] = None) -> None:
+        super().__init__()
+        self.group_ids = group_ids
+        self.item_group_ids = item_group_ids
+        self.group_counts = [0] * len(group_ids)
+        if iterable is not None:
+            self.update(iterable)
+
+    def count_group(self, item_name_group: str) -> int:
+        return self.group_counts[self.group_ids[item_name_group]]
+
+    def _add_to_groups(self, item_name: str, delta: int) -> None:
+        group_counts = self.group_counts
+        for group_id in self.item_group_ids.get(item_name, ()):
+            group_counts[group_id] += delta
+
+    def __setitem__(self, item_name: str, count: int) -> None:
+        delta = count - dict.get(self, item_name, 0)
+        if delta:
+            self._add_to_groups(item_name, delta)
+        dict.__setitem__(self, item_name, count)
+
+    def __delitem__(self, item_name: str) -> None:
+        self._add_to_groups(item_name, -dict.__getitem__(self, item_name))
+        dict.__delitem__(self, item_name)
+
+    def pop(self, item_name: str, *default: Any) -> Any:
+        if item_name in self:
+            self._add_to_groups(item_name, -dict.__getitem__(self, item_name))
+        return dict.pop(self, item_name, *default)
+
+    def popitem(self) -> Tuple[str, int]:
+        item_name, count = dict.popitem(self)
+        self._add_to_groups(item_name, -count)
+        return item_name, count
+
+    def setdefault(self, item_name: str, default: int = 0) -> int:
+        if item_name not in self:
+            self[item_name] = default
+        return dict.__getitem__(self, item_name)
+
+    def clear(self) -> None:
+        dict.clear(self)
+        self.group_counts = [0] * len(self.group_ids)
+
+    def update(self, iterable: Optional[Iterable[str]] = None, /, **kwds: int) -> None:
+        # Counter.update would skip __setitem__ while empty
+        for item_name, count in Counter(iterable, **kwds).items():
+            self[item_name] = dict.get(self, item_name, 0) + count
+
+    def copy(self) -> ItemCounter:
+        new = ItemCounter.__new__(ItemCounter)
+        dict.update(new, self)
+        new.group_ids = self.group_ids
+        new.item_group_ids = self.item_group_ids
+        new.group_counts = self.group_counts.copy()
+        return new
+
+    def __reduce__(self):
+        return self.__class__, (self.group_ids, self.item_group_ids, dict(self))
+
+
+class _LazyPlayerDict(dict):
+    """Dict of per-player containers, copying a player's container from source, a plain dict that is no longer
+    modified, on first access, so copying a CollectionState only costs for the players looked at afterwards.
+    Holds only the containers it owns, which it may change. Access can't be told apart from writing to a container."""
+    __slots__ = ("source",)
+
+    def __init__(self, source: Dict[int, Any]):
+        super().__init__()
+        self.source = source
+
+    def __missing__(self, player: int) -> Any:
+        value = self[player] = self.source[player].copy()
+        return value
+
+    def flatten(self) -> Dict[int, Any]:
+        """A plain dict of the current containers, which stop being owned by this."""
+        if not dict.__len__(self):
+            return self.source
+        flat = dict(self.source)
+        flat.update(dict.items(self))
+        return flat
+
+    def _materialize(self) -> None:
+        for player in self.source:
+            if not dict.__contains__(self, player):
+                self.__missing__(player)
+
+    def __contains__(self, player: object) -> bool:
+        return dict.__contains__(self, player) or player in self.source
+
+    def get(self, player: int, default: Any = None) -> Any:
+        return self[player] if player in self else default
+
+    def __iter__(self) -> Iterator[int]:
+        self._materialize()
+        return dict.__iter__(self)
+
+    def __len__(self) -> int:
+        self._materialize()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._materialize()
+        return dict.keys(self)
+
+    def values(self):
+        self._materialize()
+        return dict.values(self)
+
+    def items(self):
+        self._materialize()
+        return dict.items(self)
+
+    def copy(self) -> Dict[int, Any]:
+        self._materialize()
+        return dict(dict.items(self))
+
+    def __eq__(self, other: object) -> bool:
+        self._materialize()
+        if isinstance(other, _LazyPlayerDict):
+            other._materialize()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        self._materialize()
+        return dict.__repr__(self)
+
+
+class _RecordingCounter:
+    """Read-only view of a player's prog_items Counter that records which item names get looked up."""
+    __slots__ = ("counter", "player", "keys")
+
+    def __init__(self, counter: Counter[str], player: int, keys: Set[Optional[Tuple[int, Optional[str]]]]):
+        self.counter = counter
+        self.player = player
+        self.keys = keys
+
+    def __getitem__(self, item: str) -> int:
+        self.keys.add((self.player, item))
+        return self.counter[item]
+
+    def __contains__(self, item: str) -> bool:
+        self.keys.add((self.player, item))
+        return item in self.counter
+
+    def get(self, item: str, default: Any = None) -> Any:
+        self.keys.add((self.player, item))
+        return self.counter.get(item, default)
+
+    def __iter__(self) -> Iterator[str]:
+        self.keys.add((self.player, None))
+        return iter(self.counter)
+
+    def __len__(self) -> int:
+        self.keys.add((self.player, None))
+        return len(self.counter)
+
+    def __getattr__(self, name: str) -> Any:
+        # anything looking at the Counter as a whole (values(), items(), total(), ...) depends on every item
+        self.keys.add((self.player, None))
+        return getattr(self.counter, name)
+
+
+class _DependencyRecorder:
+    """Stands in for CollectionState.prog_items while an Entrance's access_rule is evaluated.
+    Collects (player, item name) keys of everything looked up, (player, None) for a whole player's items
+    or None if all prog_items were looked at."""
+    __slots__ = ("prog_items", "keys", "views")
+
+    def __init__(self, prog_items: Dict[int, Counter[str]]):
+        self.prog_items = prog_items
+        self.keys: Set[Optional[Tuple[int, Optional[str]]]] = set()
+        self.views: Dict[int, _RecordingCounter] = {}
+
+    def __getitem__(self, player: int) -> _RecordingCounter:
+        view = self.views.get(player)
+        if view is None:
+            view = self.views[player] = _RecordingCounter(self.prog_items[player], player, self.keys)
+        return view
+
+    def __getattr__(self, name: str) -> Any:
+        self.keys.add(None)
+        return getattr(self.prog_items, name)
+
+
 class CollectionState():
     prog_items: Dict[int, Counter[str]]
     multiworld: MultiWorld
     reachable_regions: Dict[int, Set[Region]]
     blocked_connections: Dict[int, Set[Entrance]]
+    pending_connections: Dict[int, Set[Entrance]]
+    """blocked connections of worlds with incremental_reachability that need to be tested again"""
     events: Set[Location]
     path: Dict[Union[Region, Entrance], PathValue]
     locations_checked: Set[Location]
@@ -636,10 +835,11 @@ class CollectionState():
     additional_copy_functions: List[Callable[[CollectionState, CollectionState], CollectionState]] = []
 
     def __init__(self, parent: MultiWorld):
-        self.prog_items = {player: Counter() for player in parent.get_all_ids()}
+        self.prog_items = {player: self._new_item_counter(parent, player) for player in parent.get_all_ids()}
         self.multiworld = parent
         self.reachable_regions = {player: set() for player in parent.get_all_ids()}
         self.blocked_connections = {player: set() for player in parent.get_all_ids()}
+        self.pending_connections = {player: set() for player in parent.get_all_ids()}
         self.events = set()
         self.path = {}
         self.locations_checked = set()
@@ -654,8 +854,17 @@ class CollectionState():
         self.stale[player] = False
         reachable_regions = self.reachable_regions[player]
         blocked_connections = self.blocked_connections[player]
-        queue = deque(self.blocked_connections[player])
+        pending_connections = self.pending_connections[player]
         start = self.multiworld.get_region("Menu", player)
+        incremental = self.multiworld.worlds[player].incremental_reachability
+        recorder = _DependencyRecorder(self.prog_items) if incremental else None
+
+        if incremental and start in reachable_regions:
+            # only connections depending on something that changed can have been unblocked
+            queue = deque(connection for connection in pending_connections if connection in blocked_connections)
+        else:
+            queue = deque(blocked_connections)
+        pending_connections.clear()
 
         # init on first call - this can't be done on construction since the regions don't exist yet
         if start not in reachable_regions:
@@ -669,7 +878,7 @@ class CollectionState():
             new_region = connection.connected_region
             if new_region in reachable_regions:
                 blocked_connections.remove(connection)
-            elif connection.can_reach(self):
+            elif self._test_connection(connection, recorder) if recorder else connection.can_reach(self):
                 assert new_region, f"tried to search through an Entrance \"{connection}\" with no Region"
                 reachable_regions.add(new_region)
                 blocked_connections.remove(connection)
@@ -682,16 +891,55 @@ class CollectionState():
                     if new_entrance in blocked_connections and new_entrance not in queue:
                         queue.append(new_entrance)
 
+    def _test_connection(self, connection: Entrance, recorder: _DependencyRecorder) -> bool:
+        """Test a connection, remembering which items it depends on if it is blocked,
+        so collecting anything else does not have to test it again."""
+        prog_items = self.prog_items
+        self.prog_items = recorder
+        try:
+            reachable = connection.can_reach(self)
+        finally:
+            self.prog_items = prog_items
+        if not reachable:
+            entrance_dependents = self.multiworld.entrance_dependents
+            for key in recorder.keys:
+                entrance_dependents.setdefault(key, set()).add(connection)
+        recorder.keys.clear()
+        return reachable
+
+    def _mark_dependents(self, player: int, item_name: str) -> None:
+        """Queue connections of worlds with incremental_reachability which depend on this item for testing."""
+        entrance_dependents = self.multiworld.entrance_dependents
+        for key in ((player, item_name), (player, None), None):
+            connections = entrance_dependents.get(key)
+            if connections:
+                for connection in connections:
+                    self.pending_connections[connection.player].add(connection)
+                    self.stale[connection.player] = True
+
+    def _share_per_player(self, ret: CollectionState, attribute: str) -> None:
+        """Share a per-player dict between self and ret, each copying a player's container on first access.
+        Both read from the same flat dict, so lookups never go through more than one level."""
+        current = getattr(self, attribute)
+        if isinstance(current, _LazyPlayerDict) and not dict.__len__(current):
+            # nothing was touched since the last copy, so current can keep reading from its source
+            source = current.source
+        else:
+            source = current.flatten() if isinstance(current, _LazyPlayerDict) else current
+            setattr(self, attribute, _LazyPlayerDict(source))
+        setattr(ret, attribute, _LazyPlayerDict(source))
+
     def copy(self) -> CollectionState:
-        ret = CollectionState(self.multiworld)
-        ret.prog_items = copy.deepcopy(self.prog_items)
-        ret.reachable_regions = {player: copy.copy(self.reachable_regions[player]) for player in
-                                 self.reachable_regions}
-        ret.blocked_connections = {player: copy.copy(self.blocked_connections[player]) for player in
-                                   self.blocked_connections}
+        ret = CollectionState.__new__(CollectionState)
+        ret.multiworld = self.multiworld
+        for attribute in ("prog_items", "reachable_regions", "blocked_connections", "pending_connections"):
+            self._share_per_player(ret, attribute)
         ret.events = copy.copy(self.events)
         ret.path = copy.copy(self.path)
         ret.locations_checked = copy.copy(self.locations_checked)
+        ret.stale = dict.fromkeys(self.stale, True)
+        for function in self.additional_init_functions:
+            function(ret, self.multiworld)
         for function in self.additional_copy_functions:
             ret = function(self, ret)
         return ret
@@ -715,19 +963,27 @@ class CollectionState():
     def sweep_for_events(self, key_only: bool = False, locations: Optional[Iterable[Location]] = None) -> None:
         if locations is None:
             locations = self.multiworld.get_filled_locations()
-        reachable_events = True
         # since the loop has a good chance to run more than once, only filter the events once
-        locations = {location for location in locations if location.event and location not in self.events and
-                     not key_only or getattr(location.item, "locked_dungeon_item", False)}
-        while reachable_events:
-            reachable_events = {location for location in locations if location.can_reach(self)}
-            locations -= reachable_events
+        search = SphereSearch(self, {location for location in locations if location.event and
+                                     location not in self.events and not key_only
+                                     or getattr(location.item, "locked_dungeon_item", False)})
+        while search:
+            reachable_events = search.next_sphere()
+            if not reachable_events:
+                break
             for event in reachable_events:
                 self.events.add(event)
                 assert isinstance(event.item, Item), "tried to collect Event with no Item"
                 self.collect(event.item, True, event)
 
     # item name related
+    @staticmethod
+    def _new_item_counter(multiworld: MultiWorld, player: int) -> Counter[str]:
+        world = multiworld.worlds.get(player)
+        if world and world.count_item_name_groups:
+            return ItemCounter(world.item_name_group_ids, world.item_name_to_group_ids)
+        return Counter()
+
     def has(self, item: str, player: int, count: int = 1) -> bool:
         return self.prog_items[player][item] >= count
 
@@ -750,6 +1006,8 @@ class CollectionState():
     def has_group(self, item_name_group: str, player: int, count: int = 1) -> bool:
         found: int = 0
         player_prog_items = self.prog_items[player]
+        if type(player_prog_items) is ItemCounter:
+            return player_prog_items.count_group(item_name_group) >= count
         for item_name in self.multiworld.worlds[player].item_name_groups[item_name_group]:
             found += player_prog_items[item_name]
             if found >= count:
@@ -759,6 +1017,8 @@ class CollectionState():
     def count_group(self, item_name_group: str, player: int) -> int:
         found: int = 0
         player_prog_items = self.prog_items[player]
+        if type(player_prog_items) is ItemCounter:
+            return player_prog_items.count_group(item_name_group)
         for item_name in self.multiworld.worlds[player].item_name_groups[item_name_group]:
             found += player_prog_items[item_name]
         return found
@@ -774,21 +1034,94 @@ class CollectionState():
             self.prog_items[item.player][item.name] += 1
             changed = True
 
-        self.stale[item.player] = True
+        if changed:
+            self._mark_dependents(item.player, item.name)
+        if not self.multiworld.worlds[item.player].incremental_reachability:
+            self.stale[item.player] = True
 
         if changed and not event:
             self.sweep_for_events()
 
         return changed
 
-    def remove(self, item: Item):
+    def remove(self, item: Item, event: bool = False) -> bool:
         changed = self.multiworld.worlds[item.player].remove(self, item)
+
+        if not changed and event:
+            # counterpart to collect, which counts events even if the world does not
+            player_prog_items = self.prog_items[item.player]
+            if player_prog_items[item.name] > 0:
+                player_prog_items[item.name] -= 1
+                if player_prog_items[item.name] < 1:
+                    del player_prog_items[item.name]
+                changed = True
+
         if changed:
             # invalidate caches, nothing can be trusted anymore now
             self.reachable_regions[item.player] = set()
             self.blocked_connections[item.player] = set()
+            self.pending_connections[item.player] = set()
             self.stale[item.player] = True
 
+        return changed
+
+
+
+class SphereSearch:
+    """
+    Splits locations into spheres: each sphere is the set of remaining locations reachable with state.
+    Locations only get their rules tested while their parent region is reachable, as they can't be reached otherwise.
+    Collecting a sphere into state is up to the caller, before asking for the next one.
+    """
+    state: CollectionState
+    remaining: Set[Location]
+    """locations not in any sphere yet"""
+    by_region: Dict[Optional[Region], List[Tuple[int, Location]]]
+    """
+    remaining locations with their position in remaining by parent region,
+    None for locations that have to be tested every sphere
+    """
+
+    def __init__(self, state: CollectionState, locations: Set[Location]) -> None:
+        """Takes over locations as the set of remaining locations."""
+        self.state = state
+        self.remaining = locations
+        self.by_region = {}
+        for position, location in enumerate(locations):
+            region = location.parent_region if type(location).can_reach is Location.can_reach \
+                and type(location.parent_region).can_reach is Region.can_reach else None
+            self.by_region.setdefault(region, []).append((position, location))
+
+    def __bool__(self) -> bool:
+        return bool(self.remaining)
+
+    def __len__(self) -> int:
+        return len(self.remaining)
+
+    def next_sphere(self) -> Set[Location]:
+        """Removes and returns the remaining locations that are reachable with state."""
+        state = self.state
+        found: List[Tuple[int, Location]] = []
+        for region, locations in list(self.by_region.items()):
+            if region is None or region.can_reach(state):
+                blocked: List[Tuple[int, Location]] = []
+                for entry in locations:
+                    (found if entry[1].can_reach(state) else blocked).append(entry)
+                if not blocked:
+                    del self.by_region[region]
+                elif len(blocked) < len(locations):
+                    self.by_region[region] = blocked
+        # removing from a set keeps the order of the rest, so this is the order a scan of remaining would find them in
+        found.sort()
+        sphere = {location for _, location in found}
+        self.remaining -= sphere
+        return sphere
+
+    def collect_sphere(self, sphere: Iterable[Location]) -> None:
+        """Collects the items of a sphere into state."""
+        for location in sphere:
+            self.state.collect(location.item, True, location)
+
 
 class Entrance:
     access_rule: Callable[[CollectionState], bool] = staticmethod(lambda state: True)
@@ -854,6 +1187,9 @@ class Region:
         def __len__(self) -> int:
             return self._list.__len__()
 
+        def __iter__(self) -> Iterator:
+            return self._list.__iter__()
+
         # This seems to not be needed, but that's a bit suspicious.
         # def __del__(self):
         #     self.clear()
@@ -1184,19 +1520,16 @@ class Spoiler:
         state_cache: List[Optional[CollectionState]] = [None]
         collection_spheres: List[Set[Location]] = []
         state = CollectionState(multiworld)
-        sphere_candidates = set(prog_locations)
+        search = SphereSearch(state, set(prog_locations))
         logging.debug('Building up collection spheres.')
-        while sphere_candidates:
+        while search:
 
             # build up spheres of collection radius.
             # Everything in each sphere is independent from each other in dependencies and only depends on lower spheres
 
-            sphere = {location for location in sphere_candidates if state.can_reach(location)}
-
-            for location in sphere:
-                state.collect(location.item, True, location)
+            sphere = search.next_sphere()
+            search.collect_sphere(sphere)
 
-            sphere_candidates -= sphere
             collection_spheres.append(sphere)
             state_cache.append(state.copy())
 
@@ -1204,6 +1537,7 @@ class Spoiler:
                           len(sphere),
                           len(prog_locations))
             if not sphere:
+                sphere_candidates = search.remaining
                 logging.debug('The following items could not be reached: %s', ['%s (Player %d) at %s (Player %d)' % (
                     location.item.name, location.item.player, location.name, location.player) for location in
                                                                                sphere_candidates])
@@ -1216,21 +1550,9 @@ class Spoiler:
 
         # in the second phase, we cull each sphere such that the game is still beatable,
         # reducing each range of influence to the bare minimum required inside it
-        restore_later = {}
+        restore_later: Dict[Location, Item] = {}
         for num, sphere in reversed(tuple(enumerate(collection_spheres))):
-            to_delete = set()
-            for location in sphere:
-                # we remove the item at location and check if game is still beatable
-                logging.debug('Checking if %s (Player %d) is required to beat the game.', location.item.name,
-                              location.item.player)
-                old_item = location.item
-                location.item = None
-                if multiworld.can_beat_game(state_cache[num]):
-                    to_delete.add(location)
-                    restore_later[location] = old_item
-                else:
-                    # still required, got to keep it around
-                    location.item = old_item
+            to_delete = self.cull_sphere(sphere, state_cache[num], restore_later)
 
             # cull entries in spheres for spoiler walkthrough at end
             sphere -= to_delete
@@ -1254,23 +1576,20 @@ class Spoiler:
 
         required_locations = {item for sphere in collection_spheres for item in sphere}
         state = CollectionState(multiworld)
+        search = SphereSearch(state, required_locations)
         collection_spheres = []
-        while required_locations:
+        while search:
             state.sweep_for_events(key_only=True)
 
-            sphere = set(filter(state.can_reach, required_locations))
-
-            for location in sphere:
-                state.collect(location.item, True, location)
-
-            required_locations -= sphere
+            sphere = search.next_sphere()
+            search.collect_sphere(sphere)
 
             collection_spheres.append(sphere)
 
             logging.debug('Calculated final sphere %i, containing %i of %i progress items.', len(collection_spheres),
-                          len(sphere), len(required_locations))
+                          len(sphere), len(search))
             if not sphere:
-                raise RuntimeError(f'Not all required items reachable. Unreachable locations: {required_locations}')
+                raise RuntimeError(f'Not all required items reachable. Unreachable locations: {search.remaining}')
 
         # we can finally output our playthrough
         self.playthrough = {"0": sorted([self.multiworld.get_name_string_for_object(item) for item in
@@ -1290,6 +1609,60 @@ class Spoiler:
         for item in removed_precollected:
             multiworld.push_precollected(item)
 
+    def cull_sphere(self, sphere: Set[Location], starting_state: Optional[CollectionState],
+                    restore_later: Dict[Location, Item]) -> Set[Location]:
+        """
+        Removes the items of locations in sphere that are not required to beat the game from starting_state,
+        deciding for one location after the other. Returns the culled locations, their items are moved to restore_later.
+
+        Logic only gets easier with more items, so if the game can be beaten without a whole batch of items,
+        deciding for them one at a time would have culled every one of them as well. While most tested items turn out
+        not to be required, they get tested in batches, which are bisected down to the first required item if they fail.
+        """
+        multiworld = self.multiworld
+        locations = list(sphere)
+        to_delete: Set[Location] = set()
+        # only progression that starting_state did not collect yet can take part in the search
+        checked = starting_state.locations_checked if starting_state else set()
+        prog_locations = [location for location in multiworld.get_filled_locations()
+                          if location.item.advancement and location not in checked]
+
+        def can_beat_game_without(batch: List[Location]) -> bool:
+            old_items = [location.item for location in batch]
+            for location in batch:
+                location.item = None
+            if multiworld.can_beat_game(starting_state, prog_locations):
+                to_delete.update(batch)
+                restore_later.update(zip(batch, old_items))
+                return True
+            # still required, got to keep them around
+            for location, old_item in zip(batch, old_items):
+                location.item = old_item
+            return False
+
+        index = 0
+        while index < len(locations):
+            # batch size of generalized binary splitting, with the share of required items guessed from this sphere
+            required = index - len(to_delete)
+            batch_size = 1
+            while batch_size * 2 * (required + 1) <= len(to_delete) + 1:
+                batch_size *= 2
+            first, end = index, min(index + batch_size, len(locations))
+            logging.debug('Checking if %s (Player %d) and the %d items after it are required to beat the game.',
+                          locations[first].item.name, locations[first].item.player, end - first - 1)
+            if can_beat_game_without(locations[first:end]):
+                index = end
+                continue
+            # something in first:end is required, bisect until the first required one is found
+            while end - first > 1:
+                middle = (first + end) // 2
+                if can_beat_game_without(locations[first:middle]):
+                    first = middle
+                else:
+                    end = middle
+            index = first + 1
+        return to_delete
+
     def create_paths(self, state: CollectionState, collection_spheres: List[Set[Location]]) -> None:
         from itertools import zip_longest
         multiworld = self.multiworld
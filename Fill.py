@@ -7,7 +7,7 @@ from collections import Counter, deque
 from BaseClasses import CollectionState, Item, Location, LocationProgressType, MultiWorld
 from Options import Accessibility
 
-from worlds.AutoWorld import call_all
+from worlds.AutoWorld import call_all, World
 from worlds.generic.Rules import add_item_rule
 
 
@@ -27,6 +27,117 @@ def sweep_from_pool(base_state: CollectionState, itempool: typing.Sequence[Item]
     return new_state
 
 
+class ExplorationState:
+    """
+    State built by sweep_from_pool that can follow changes to its pool.
+    Only items that changed between pools get collected or removed. If items were removed or an event's location
+    holds another item now, events swept up since base_state are rolled back and swept again, as they may not be
+    reachable anymore. That resweep is not incremental: as fill_restrictive removes the placed items every round,
+    worlds with many events still pay for sweeping them each round, only the pool is not collected again.
+    Removing is only trusted for worlds using the default collect, remove and collect_item,
+    otherwise the state gets rebuilt from base_state.
+    """
+    base_state: CollectionState
+    state: CollectionState
+    items: typing.Dict[int, Item]
+    """items of the current pool by id"""
+    events: typing.Dict[Location, Item]
+    """events swept up since base_state, with the item they held at the time"""
+    removable: typing.Dict[int, bool]
+    """players whose items can be removed from the state again"""
+
+    def __init__(self, base_state: CollectionState, itempool: typing.Sequence[Item]) -> None:
+        self.base_state = base_state
+        self.removable = {player: (type(world).collect is World.collect and type(world).remove is World.remove
+                                   and type(world).collect_item is World.collect_item)
+                          for player, world in base_state.multiworld.worlds.items()}
+        self._rebuild(itempool)
+
+    def _rebuild(self, itempool: typing.Sequence[Item]) -> None:
+        self.state = sweep_from_pool(self.base_state, itempool)
+        self.items = {id(item): item for item in itempool}
+        self.events = self._swept_events()
+
+    def _swept_events(self) -> typing.Dict[Location, Item]:
+        return {location: location.item for location in self.state.events - self.base_state.events}
+
+    def update(self, itempool: typing.Sequence[Item]) -> CollectionState:
+        """Update the state to the new pool, base_state must not have changed since creation."""
+        pool = {id(item): item for item in itempool}
+        removed = [item for item_id, item in self.items.items() if item_id not in pool]
+        if not all(self.removable[item.player] for item in itertools.chain(removed, self.events.values())):
+            self._rebuild(itempool)
+            return self.state
+
+        state = self.state
+        # with only items added and the events still in place, everything reachable stays reachable
+        if removed or any(location.item is not item for location, item in self.events.items()):
+            for location, item in self.events.items():
+                state.remove(item, True)
+                state.locations_checked.discard(location)
+            state.events = self.base_state.events.copy()
+        for item in removed:
+            state.remove(item, True)
+        for item_id, item in pool.items():
+            if item_id not in self.items:
+                state.collect(item, True)
+        self.items = pool
+        state.sweep_for_events()
+        self.events = self._swept_events()
+        return state
+
+
+class LocationPool:
+    """
+    Locations that are still to be filled, popped in the order they were given in.
+    With by_player, locations are bucketed by player, so only the item's player's locations are looked at.
+    """
+    buckets: typing.Dict[typing.Optional[int], typing.List[Location]]
+    order: typing.Dict[Location, int]
+    """position of each location in the original order, to merge the buckets back together"""
+    by_player: bool
+
+    def __init__(self, locations: typing.Iterable[Location], by_player: bool = False) -> None:
+        self.buckets = {}
+        self.order = {}
+        self.by_player = by_player
+        for location in locations:
+            self.append(location)
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets.values())
+
+    def __bool__(self) -> bool:
+        return any(self.buckets.values())
+
+    def append(self, location: Location) -> None:
+        self.order[location] = len(self.order)
+        self.buckets.setdefault(location.player if self.by_player else None, []).append(location)
+
+    def to_list(self) -> typing.List[Location]:
+        if len(self.buckets) == 1:
+            return list(*self.buckets.values())
+        return sorted(itertools.chain.from_iterable(self.buckets.values()), key=self.order.__getitem__)
+
+    def _pop_first(self, item: Item, predicate: typing.Callable[[Location], bool]) -> typing.Optional[Location]:
+        bucket = self.buckets.get(item.player if self.by_player else None)
+        if bucket:
+            for i, location in enumerate(bucket):
+                if predicate(location):
+                    # popping by index is faster than removing by content,
+                    # skipping a scan for the element
+                    return bucket.pop(i)
+        return None
+
+    def pop_fillable(self, state: CollectionState, item: Item, check_access: bool = True) -> typing.Optional[Location]:
+        """Removes and returns the first location that can be filled with item, if any."""
+        return self._pop_first(item, lambda location: location.can_fill(state, item, check_access))
+
+    def pop_allowed(self, item: Item) -> typing.Optional[Location]:
+        """Removes and returns the first location whose item rule allows item, if any."""
+        return self._pop_first(item, lambda location: location.item_rule(item))
+
+
 def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locations: typing.List[Location],
                      item_pool: typing.List[Item], single_player_placement: bool = False, lock: bool = False,
                      swap: bool = True, on_place: typing.Optional[typing.Callable[[Location], None]] = None,
@@ -56,7 +167,11 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
     total = min(len(item_pool), len(locations))
     placed = 0
 
-    while any(reachable_items.values()) and locations:
+    # reused between rounds, only catching up on the items that changed in the pool
+    exploration: typing.Optional[ExplorationState] = None
+    location_pool = LocationPool(locations, single_player_placement)
+
+    while any(reachable_items.values()) and location_pool:
         # grab one item per player
         items_to_place = [items.pop()
                           for items in reachable_items.values() if items]
@@ -65,20 +180,21 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
                 if pool_item is item:
                     item_pool.pop(p)
                     break
-        maximum_exploration_state = sweep_from_pool(
-            base_state, item_pool + unplaced_items)
+        if exploration is None:
+            exploration = ExplorationState(base_state, item_pool + unplaced_items)
+            maximum_exploration_state = exploration.state
+        else:
+            maximum_exploration_state = exploration.update(item_pool + unplaced_items)
 
         has_beaten_game = multiworld.has_beaten_game(maximum_exploration_state)
 
         while items_to_place:
             # if we have run out of locations to fill,break out of this loop
-            if not locations:
+            if not location_pool:
                 unplaced_items += items_to_place
                 break
             item_to_place = items_to_place.pop(0)
 
-            spot_to_fill: typing.Optional[Location] = None
-
             # if minimal accessibility, only check whether location is reachable if game not beatable
             if multiworld.worlds[item_to_place.player].options.accessibility == Accessibility.option_minimal:
                 perform_access_check = not multiworld.has_beaten_game(maximum_exploration_state,
@@ -87,15 +203,8 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
             else:
                 perform_access_check = True
 
-            for i, location in enumerate(locations):
-                if (not single_player_placement or location.player == item_to_place.player) \
-                        and location.can_fill(maximum_exploration_state, item_to_place, perform_access_check):
-                    # popping by index is faster than removing by content,
-                    spot_to_fill = locations.pop(i)
-                    # skipping a scan for the element
-                    break
-
-            else:
+            spot_to_fill = location_pool.pop_fillable(maximum_exploration_state, item_to_place, perform_access_check)
+            if spot_to_fill is None:
                 # we filled all reachable spots.
                 if swap:
                     # try swapping this item with previously placed items in a safe way then in an unsafe way
@@ -169,6 +278,8 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
     if total > 1000:
         _log_fill_progress(name, placed, total)
 
+    locations[:] = location_pool.to_list()
+
     if cleanup_required:
         # validate all placements and remove invalid ones
         state = sweep_from_pool(base_state, [])
@@ -214,18 +325,12 @@ def remaining_fill(multiworld: MultiWorld,
     swapped_items: typing.Counter[typing.Tuple[int, str]] = Counter()
     total = min(len(itempool),  len(locations))
     placed = 0
-    while locations and itempool:
+    location_pool = LocationPool(locations)
+    while location_pool and itempool:
         item_to_place = itempool.pop()
-        spot_to_fill: typing.Optional[Location] = None
-
-        for i, location in enumerate(locations):
-            if location.item_rule(item_to_place):
-                # popping by index is faster than removing by content,
-                spot_to_fill = locations.pop(i)
-                # skipping a scan for the element
-                break
+        spot_to_fill = location_pool.pop_allowed(item_to_place)
 
-        else:
+        if spot_to_fill is None:
             # we filled all reachable spots.
             # try swapping this item with previously placed items
 
@@ -270,6 +375,8 @@ def remaining_fill(multiworld: MultiWorld,
     if total > 1000:
         _log_fill_progress("Remaining", placed, total)
 
+    locations[:] = location_pool.to_list()
+
     if unplaced_items and locations:
         # There are leftover unplaceable items and locations that won't accept them
         raise FillError(f'No more spots to place {unplaced_items}, locations {locations} are invalid. '
@@ -2,11 +2,9 @@ import collections
 import concurrent.futures
 import logging
 import os
-import pickle
 import tempfile
 import time
 import zipfile
-import zlib
 from typing import Dict, List, Optional, Set, Tuple, Union
 
 import worlds
@@ -333,6 +331,9 @@ def main(args, seed=None, baked_server_options: Optional[Dict[str, object]] = No
             er_hint_data: Dict[int, Dict[int, str]] = {}
             AutoWorld.call_all(multiworld, 'extend_hint_information', er_hint_data)
 
+            compression_level = get_settings().generator.multidata_compression
+            format_version = get_settings().generator.multidata_format
+
             def write_multidata():
                 import NetUtils
                 slot_data = {}
@@ -415,11 +416,8 @@ def main(args, seed=None, baked_server_options: Optional[Dict[str, object]] = No
                 }
                 AutoWorld.call_all(multiworld, "modify_multidata", multidata)
 
-                multidata = zlib.compress(pickle.dumps(multidata), 9)
-
                 with open(os.path.join(temp_dir, f'{outfilebase}.archipelago'), 'wb') as f:
-                    f.write(bytes([3]))  # version of format
-                    f.write(multidata)
+                    NetUtils.write_multidata(f, multidata, compression_level, format_version)
 
             output_file_futures.append(pool.submit(write_multidata))
             if not check_accessibility_task.result():
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import bisect
 import collections
 import copy
 import datetime
@@ -14,6 +15,7 @@ import math
 import operator
 import pickle
 import random
+import struct
 import threading
 import time
 import typing
@@ -39,7 +41,7 @@ import NetUtils
 import Utils
 from Utils import version_tuple, restricted_loads, Version, async_start
 from NetUtils import Endpoint, ClientStatus, NetworkItem, decode, encode, NetworkPlayer, Permission, NetworkSlot, \
-    SlotType, LocationStore
+    SlotType, LocationStore, EncodedJSON
 
 min_client_version = Version(0, 1, 6)
 colorama.init()
@@ -99,6 +101,85 @@ def get_saving_second(seed_name: str, interval: int = 60) -> int:
     return int(hashlib.sha256(seed_name.encode()).hexdigest(), 16) % interval
 
 
+save_journal_frame = struct.Struct("<IQ")  # size of the compressed records, journal generation
+_paired_save_sections = ("client_activity_timers", "client_connection_timers", "video")
+
+
+def encode_save_journal(generation: int, records: typing.Iterable[typing.Tuple[str, typing.Any, typing.Any]]) -> bytes:
+    """Encodes records as one frame of a save journal belonging to the snapshot of generation."""
+    data = zlib.compress(pickle.dumps(list(records)))
+    return save_journal_frame.pack(len(data), generation) + data
+
+
+def apply_save_journal(save: dict, chunks: typing.Iterable[bytes]) -> dict:
+    """
+    Returns save, the data of a snapshot as made by Context.get_save, with the journal frames in chunks applied.
+    Frames of another generation than the snapshot's are left over from before it was written and are skipped,
+    as is a frame cut off by a crash.
+    Every record sets a value or adds to a collection, so applying a record the snapshot already contains is harmless.
+    save itself is left as it is, changed sections and collections are copies, so others can keep reading it.
+    """
+    save = dict(save)
+    generation = save.get("journal_generation", 0)
+    paired = {section: {tuple(key): value for key, value in save.get(section, ())}
+              for section in _paired_save_sections}
+    copied: typing.Set[typing.Tuple[str, typing.Any]] = set()  # sections and collections that are copies already
+
+    def get_own(section: str, key: typing.Any = None, factory: typing.Callable[[], typing.Any] = dict) -> typing.Any:
+        if (section, None) not in copied:
+            copied.add((section, None))
+            save[section] = dict(save[section])
+        if key is None:
+            return save[section]
+        if (section, key) not in copied:
+            copied.add((section, key))
+            save[section][key] = value = factory(save[section].get(key, ()))
+            return value
+        return save[section][key]
+
+    for chunk in chunks:
+        position = 0
+        while position + save_journal_frame.size <= len(chunk):
+            size, frame_generation = save_journal_frame.unpack_from(chunk, position)
+            position += save_journal_frame.size
+            if position + size > len(chunk):
+                logging.warning("Save journal ends in an incomplete entry, ignoring it.")
+                break
+            frame = chunk[position:position + size]
+            position += size
+            if frame_generation != generation:
+                continue
+            for section, key, value in restricted_loads(zlib.decompress(frame)):
+                if section == "location_checks":
+                    get_own(section, key, set).update(value)
+                elif section == "received_items":
+                    start, items = value
+                    get_own(section, key, list)[start:start + len(items)] = items
+                elif section == "hints":
+                    get_own(section, key, set).update(value)
+                elif section == "group_collected":
+                    get_own(section, key, set).add(value)
+                elif section in paired:
+                    paired[section][key] = value
+                elif section == "name_aliases" and value is None:
+                    get_own(section).pop(key, None)
+                elif key is None:  # random_state and game_options
+                    save[section] = value
+                else:
+                    get_own(section)[key] = value
+    for section, values in paired.items():
+        if section in save or values:
+            save[section] = tuple(values.items())
+    # hints are rechecked on every save in get_save, but not when journaled
+    location_checks = save["location_checks"]
+    for (team, slot), hints in get_own("hints").items():
+        save["hints"][team, slot] = {
+            hint._replace(found=True) if not hint.found
+            and hint.location in location_checks.get((team, hint.finding_player), ()) else hint
+            for hint in hints}
+    return save
+
+
 class Client(Endpoint):
     version = Version(0, 0, 0)
     tags: typing.List[str] = []
@@ -141,6 +222,117 @@ class Client(Endpoint):
 
 team_slot = typing.Tuple[int, int]
 
+client_cmds = frozenset(("Connect", "ConnectUpdate", "GetDataPackage", "Sync", "LocationChecks", "LocationScouts",
+                         "StatusUpdate", "Say", "Bounce", "Get", "Set", "SetNotify"))
+
+
+class Metrics:
+    """Call counts, latencies and bytes sent of a running server, by kind of work, such as "cmd:Sync" or "save".
+    Only exists while enabled, so measuring code checks for ctx.metrics first and costs nothing otherwise."""
+    buckets = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # upper bounds of latencies, in seconds
+
+    def __init__(self):
+        self.started = time.time()
+        # kind -> [calls, total seconds, max seconds, calls per bucket..., calls above the last bucket]
+        self.timings: typing.Dict[str, typing.List[typing.Union[int, float]]] = {}
+        # cmd of the first packet in a frame -> [frames, receivers, bytes]
+        self.sent: typing.Dict[str, typing.List[int]] = {}
+        self.received: typing.List[int] = [0, 0]  # frames, bytes
+
+    def record(self, kind: str, seconds: float):
+        timing = self.timings.get(kind)
+        if timing is None:
+            timing = self.timings[kind] = [0, 0.0, 0.0] + [0] * (len(self.buckets) + 1)
+        timing[0] += 1
+        timing[1] += seconds
+        if seconds > timing[2]:
+            timing[2] = seconds
+        timing[3 + bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def record_since(self, kind: str, start: float):
+        """Records the time since start, taken from time.perf_counter."""
+        self.record(kind, time.perf_counter() - start)
+
+    def record_sent(self, msg: str, receivers: int = 1):
+        if not receivers:
+            return
+        start = msg.find('"cmd":"', 0, 64)  # the server puts cmd first
+        kind = msg[start + 7:msg.find('"', start + 7)] if start >= 0 else ""
+        sent = self.sent.get(kind)
+        if sent is None:
+            sent = self.sent[kind] = [0, 0, 0]
+        sent[0] += 1
+        sent[1] += receivers
+        sent[2] += len(msg.encode()) * receivers
+
+    def record_received(self, data: typing.Union[str, bytes]):
+        self.received[0] += 1
+        self.received[1] += len(data.encode() if isinstance(data, str) else data)
+
+    def get_percentile(self, timing: typing.Sequence[typing.Union[int, float]], fraction: float) -> float:
+        """Upper bound of the bucket holding this fraction of calls, the longest call for the last bucket."""
+        needed = timing[0] * fraction
+        seen = 0
+        for bound, calls in zip(self.buckets, timing[3:]):
+            seen += calls
+            if seen >= needed:
+                return min(bound, timing[2])
+        return timing[2]
+
+    def as_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "started": self.started,
+            "seconds": time.time() - self.started,
+            "buckets": self.buckets,
+            "timings": {kind: {"calls": timing[0], "seconds": timing[1], "max": timing[2], "histogram": timing[3:]}
+                        for kind, timing in self.timings.items()},
+            "sent": {kind: {"frames": sent[0], "receivers": sent[1], "bytes": sent[2]}
+                     for kind, sent in self.sent.items()},
+            "received": {"frames": self.received[0], "bytes": self.received[1]},
+        }
+
+    def get_report(self) -> typing.List[str]:
+        lines = [f"Metrics of the last {time.time() - self.started:.0f} seconds, "
+                 f"received {self.received[0]} frames with {Utils.format_SI_prefix(self.received[1])}B."]
+        for kind, timing in sorted(self.timings.items(), key=lambda kind_timing: -kind_timing[1][1]):
+            lines.append(f"{kind}: {timing[0]} calls, {timing[1] * 1000:.1f} ms total, "
+                         f"{timing[1] * 1000 / timing[0]:.2f} ms mean, "
+                         f"p99 <= {self.get_percentile(timing, 0.99) * 1000:.1f} ms, {timing[2] * 1000:.1f} ms max")
+        for kind, sent in sorted(self.sent.items(), key=lambda kind_sent: -kind_sent[1][2]):
+            lines.append(f"sent {kind or 'other'}: {sent[0]} frames to {sent[1]} receivers, "
+                         f"{Utils.format_SI_prefix(sent[2])}B")
+        return lines
+
+
+async def measure_loop_lag(ctx: Context, metrics: Metrics, interval: float = 1.0):
+    """Records how much later than asked for the event loop wakes up, as "loop_lag", until metrics are replaced."""
+    while ctx.metrics is metrics and not ctx.exit_event.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.record("loop_lag", max(0.0, time.perf_counter() - start - interval))
+
+
+async def serve_metrics(ctx: Context, port: int) -> asyncio.AbstractServer:
+    """Answers any HTTP request on localhost:port with the current metrics as JSON."""
+    import json
+
+    async def answer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            if ctx.metrics:
+                status, body = "200 OK", json.dumps(ctx.metrics.as_dict()).encode()
+            else:
+                status, body = "404 Not Found", b'{"error":"metrics are disabled"}'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(answer, "127.0.0.1", port)
+
 
 class Context:
     dumper = staticmethod(encode)
@@ -165,6 +357,9 @@ class Context:
     stored_data: typing.Dict[str, object]
     read_data: typing.Dict[str, object]
     stored_data_notification_clients: typing.Dict[str, typing.Set[Client]]
+    clients_by_game: typing.Dict[typing.Tuple[int, str], typing.Set[Client]]
+    clients_by_tag: typing.Dict[typing.Tuple[int, str], typing.Set[Client]]
+    indexed_clients: typing.Dict[Client, typing.Tuple[int, str, typing.FrozenSet[str]]]
     slot_info: typing.Dict[int, NetworkSlot]
     generator_version = Version(0, 0, 0)
     checksums: typing.Dict[str, str]
@@ -175,14 +370,18 @@ class Context:
     all_item_and_group_names: typing.Dict[str, typing.Set[str]]
     all_location_and_group_names: typing.Dict[str, typing.Set[str]]
     non_hintable_names: typing.Dict[str, typing.Set[str]]
+    fuzzy_indexes: typing.Dict[typing.Tuple[str, str], Utils.FuzzyIndex]
+    encoded_fragments: typing.Dict[typing.Hashable, typing.Tuple[typing.Any, EncodedJSON]]
+    metrics: typing.Optional[Metrics]
 
     def __init__(self, host: str, port: int, server_password: str, password: str, location_check_points: int,
                  hint_cost: int, item_cheat: bool, release_mode: str = "disabled", collect_mode="disabled",
                  remaining_mode: str = "disabled", auto_shutdown: typing.SupportsFloat = 0, compatibility: int = 2,
-                 log_network: bool = False):
+                 log_network: bool = False, journal_saves: bool = False):
         super(Context, self).__init__()
         self.slot_info = {}
         self.log_network = log_network
+        self.metrics = None  # see enable_metrics
         self.endpoints = []
         self.clients = {}
         self.compatibility: int = compatibility
@@ -201,6 +400,8 @@ class Context:
         self.server = None
         self.countdown_timer = 0
         self.received_items = {}
+        self.dirty_slots: typing.Set[team_slot] = set()  # slots that received items since the last send_new_items
+        self.skipped_item_deliveries = 0  # connected clients send_new_items did not have to look at
         self.start_inventory = {}
         self.name_aliases: typing.Dict[team_slot, str] = {}
         self.location_checks = collections.defaultdict(set)
@@ -224,6 +425,13 @@ class Context:
         self.embedded_blacklist = {"host", "port"}
         self.client_ids: typing.Dict[typing.Tuple[int, int], datetime.datetime] = {}
         self.auto_save_interval = 60  # in seconds
+        self.journal_saves = journal_saves
+        # changes since the last save, as (section, key, value) records, see apply_save_journal
+        self.save_journal: typing.Deque[typing.Tuple[str, typing.Any, typing.Any]] = collections.deque()
+        self.journal_generation = 0
+        self.journal_size = 0
+        self.snapshot_size = 0  # 0 until the first journaled save wrote a snapshot
+        self.journaled_values: typing.Dict[str, typing.Any] = {}
         self.auto_saver_thread = None
         self.save_dirty = False
         self.tags = ['AP']
@@ -235,6 +443,9 @@ class Context:
         self.random = random.Random()
         self.stored_data = {}
         self.stored_data_notification_clients = collections.defaultdict(weakref.WeakSet)
+        self.clients_by_game = {}
+        self.clients_by_tag = {}
+        self.indexed_clients = {}
         self.read_data = {}
 
         # init empty to satisfy linter, I suppose
@@ -245,6 +456,8 @@ class Context:
         self.all_item_and_group_names = {}
         self.all_location_and_group_names = {}
         self.non_hintable_names = collections.defaultdict(frozenset)
+        self.fuzzy_indexes = {}
+        self.encoded_fragments = {}
 
         self._load_game_data()
 
@@ -279,6 +492,19 @@ class Context:
     def location_names_for_game(self, game: str) -> typing.Optional[typing.Dict[str, int]]:
         return self.gamespackage[game]["location_name_to_id"] if game in self.gamespackage else None
 
+    def get_fuzzy_index(self, game: str, kind: str, names: typing.Iterable[str]) -> Utils.FuzzyIndex:
+        """Index to look up names of a kind, such as "items" or "locations", for get_intended_text; built on first use,
+        as names of a game don't change while the server runs."""
+        index = self.fuzzy_indexes.get((game, kind))
+        if index is None:
+            index = self.fuzzy_indexes[game, kind] = Utils.FuzzyIndex(names)
+        return index
+
+    def enable_metrics(self):
+        """Starts measuring anew, see Metrics. Has to be called from within the event loop."""
+        self.metrics = Metrics()
+        async_start(measure_loop_lag(self, self.metrics), name="measure loop lag")
+
     # General networking
     async def send_msgs(self, endpoint: Endpoint, msgs: typing.Iterable[dict]) -> bool:
         if not endpoint.socket or not endpoint.socket.open:
@@ -293,6 +519,8 @@ class Context:
         else:
             if self.log_network:
                 logging.info(f"Outgoing message: {msg}")
+            if self.metrics:
+                self.metrics.record_sent(msg)
             return True
 
     async def send_encoded_msgs(self, endpoint: Endpoint, msg: str) -> bool:
@@ -307,6 +535,8 @@ class Context:
         else:
             if self.log_network:
                 logging.info(f"Outgoing message: {msg}")
+            if self.metrics:
+                self.metrics.record_sent(msg)
             return True
 
     async def broadcast_send_encoded_msgs(self, endpoints: typing.Iterable[Endpoint], msg: str) -> bool:
@@ -322,6 +552,8 @@ class Context:
         else:
             if self.log_network:
                 logging.info(f"Outgoing broadcast: {msg}")
+            if self.metrics:
+                self.metrics.record_sent(msg, len(sockets))
             return True
 
     def broadcast_all(self, msgs: typing.List[dict]):
@@ -342,13 +574,60 @@ class Context:
         msgs = self.dumper(msgs)
         async_start(self.broadcast_send_encoded_msgs(endpoints, msgs))
 
+    def broadcast_team_batch(self, team: int, msgs: typing.List[dict],
+                             client_msgs: typing.Dict[Client, typing.List[dict]]):
+        """Sends msgs to every client of team, followed by that client's own client_msgs, in one frame per client.
+        msgs are only encoded once and clients ending up with the same frame share one broadcast."""
+        msgs = self.dumper(msgs) if msgs else ""
+        frames: typing.Dict[str, typing.List[Client]] = collections.defaultdict(list)
+        for endpoint in itertools.chain.from_iterable(self.clients[team].values()):
+            own_msgs = client_msgs.get(endpoint)
+            if not own_msgs:
+                frame = msgs
+            elif msgs:
+                frame = f"{msgs[:-1]},{self.dumper(own_msgs)[1:]}"  # join the two JSON arrays
+            else:
+                frame = self.dumper(own_msgs)
+            if frame:
+                frames[frame].append(endpoint)
+        for frame, endpoints in frames.items():
+            async_start(self.broadcast_send_encoded_msgs(endpoints, frame))
+
     async def disconnect(self, endpoint: Client):
         if endpoint in self.endpoints:
             self.endpoints.remove(endpoint)
         if endpoint.slot and endpoint in self.clients[endpoint.team][endpoint.slot]:
             self.clients[endpoint.team][endpoint.slot].remove(endpoint)
+        self.unindex_client(endpoint)
         await on_client_disconnected(self, endpoint)
 
+    def index_client(self, client: Client):
+        """Files an authenticated client under its team and game and its team and each of its tags,
+        to find the receivers of Bounce packets. Has to be called again whenever its slot or tags change."""
+        self.unindex_client(client)
+        team, game = client.team, self.games[client.slot]
+        tags = frozenset(tag for tag in client.tags if isinstance(tag, str))
+        self.indexed_clients[client] = team, game, tags
+        self.clients_by_game.setdefault((team, game), set()).add(client)
+        for tag in tags:
+            self.clients_by_tag.setdefault((team, tag), set()).add(client)
+
+    def unindex_client(self, client: Client):
+        indexed = self.indexed_clients.pop(client, None)
+        if indexed:
+            team, game, tags = indexed
+            self._discard_indexed(self.clients_by_game, (team, game), client)
+            for tag in tags:
+                self._discard_indexed(self.clients_by_tag, (team, tag), client)
+
+    @staticmethod
+    def _discard_indexed(index: typing.Dict[typing.Tuple[int, str], typing.Set[Client]], key: typing.Tuple[int, str],
+                         client: Client):
+        clients = index[key]
+        clients.discard(client)
+        if not clients:
+            del index[key]
+
     def notify_client(self, client: Client, text: str, additional_arguments: dict = {}):
         if not client.auth:
             return
@@ -381,11 +660,9 @@ class Context:
         self.data_filename = multidatapath
 
     @staticmethod
-    def decompress(data: bytes) -> dict:
-        format_version = data[0]
-        if format_version > 3:
-            raise Utils.VersionException("Incompatible multidata.")
-        return restricted_loads(zlib.decompress(data[1:]))
+    def decompress(data: bytes, known_checksums: typing.Container[str] = ()) -> dict:
+        """Reads multidata, leaving out data packages with a checksum in known_checksums if the format allows."""
+        return NetUtils.read_multidata(data, known_checksums)
 
     def _load(self, decoded_obj: dict, game_data_packages: typing.Dict[str, typing.Any],
               use_embedded_server_options: bool):
@@ -459,9 +736,9 @@ class Context:
                 del data["location_name_groups"]
             del data["item_name_groups"]  # remove from data package, but keep in self.item_name_groups
         self._init_game_data()
-        for game_name, data in self.item_name_groups.items():
+        for game_name in self.item_name_groups:
             self.read_data[f"item_name_groups_{game_name}"] = lambda lgame=game_name: self.item_name_groups[lgame]
-        for game_name, data in self.location_name_groups.items():
+        for game_name in self.location_name_groups:
             self.read_data[f"location_name_groups_{game_name}"] = lambda lgame=game_name: self.location_name_groups[lgame]
 
     # saving
@@ -478,15 +755,72 @@ class Context:
         return False
 
     def _save(self, exit_save: bool = False) -> bool:
+        metrics = self.metrics
+        start = time.perf_counter() if metrics else 0.0
         try:
-            encoded_save = pickle.dumps(self.get_save())
-            with open(self.save_filename, "wb") as f:
-                f.write(zlib.compress(encoded_save))
+            if self.journal_saves:
+                self._save_journal()
+            else:
+                encoded_save = pickle.dumps(self.get_save())
+                with open(self.save_filename, "wb") as f:
+                    f.write(zlib.compress(encoded_save))
         except Exception as e:
             logging.exception(e)
             return False
         else:
             return True
+        finally:
+            if metrics:
+                metrics.record_since("save", start)
+
+    def journal(self, section: str, key: typing.Any, value: typing.Any):
+        """Records a change for the next journaled save. See apply_save_journal for the sections."""
+        if self.journal_saves and self.saving:
+            self.save_journal.append((section, key, value))
+
+    def _save_journal(self):
+        """Appends the changes since the last save to the journal,
+        or replaces snapshot and journal by a new snapshot once the journal outgrew the snapshot."""
+        # take records one by one, as the server keeps adding them while this runs in the saving thread
+        records = [self.save_journal.popleft() for _ in range(len(self.save_journal))]
+        taken = len(records)
+        journaled_values = dict(self.journaled_values)
+        for section, value in (("random_state", self.random.getstate()), ("game_options", self.get_game_options())):
+            if self.journaled_values.get(section) != value:
+                self.journaled_values[section] = value
+                records.append((section, None, value))
+
+        try:
+            if not self.snapshot_size or self.journal_size > max(self.snapshot_size, 1 << 16):
+                # records up to here are part of the snapshot, frames of the last generation are obsolete
+                self.journal_generation += 1
+                self.snapshot_size = self._write_save_snapshot(self.get_save())
+                self.journal_size = 0
+            elif records:
+                frame = encode_save_journal(self.journal_generation, records)
+                self._append_save_journal(frame)
+                self.journal_size += len(frame)
+        except Exception:
+            # keep the changes for the next save, which writes a snapshot, as a failed append may have cut off a frame
+            self.save_journal.extendleft(reversed(records[:taken]))
+            self.journaled_values = journaled_values
+            self.snapshot_size = 0
+            raise
+
+    def _write_save_snapshot(self, save: dict) -> int:
+        """Replaces the save file and empties the journal, returns the size of the written save."""
+        import os
+        data = zlib.compress(pickle.dumps(save))
+        with open(self.save_filename + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(self.save_filename + ".tmp", self.save_filename)
+        with open(self.save_filename + ".journal", "wb"):
+            pass
+        return len(data)
+
+    def _append_save_journal(self, frame: bytes):
+        with open(self.save_filename + ".journal", "ab") as f:
+            f.write(frame)
 
     def init_save(self, enabled: bool = True):
         self.saving = enabled
@@ -499,7 +833,12 @@ class Context:
             try:
                 with open(self.save_filename, 'rb') as f:
                     save_data = restricted_loads(zlib.decompress(f.read()))
-                    self.set_save(save_data)
+                try:
+                    with open(self.save_filename + ".journal", "rb") as f:
+                        save_data = apply_save_journal(save_data, [f.read()])
+                except FileNotFoundError:
+                    pass
+                self.set_save(save_data)
             except FileNotFoundError:
                 logging.error('No save data found, starting a new game')
             except Exception as e:
@@ -519,7 +858,7 @@ class Context:
                     try:
                         next_wakeup = (second - get_datetime_second()) % self.auto_save_interval
                         time.sleep(max(1.0, next_wakeup))
-                        if self.save_dirty:
+                        if self.save_dirty and not self.exit_event.is_set():
                             logging.debug("Saving via thread.")
                             self._save()
                     except OperationalError as e:
@@ -551,21 +890,25 @@ class Context:
             "random_state": self.random.getstate(),
             "group_collected": dict(self.group_collected),
             "stored_data": self.stored_data,
-            "game_options": {"hint_cost": self.hint_cost, "location_check_points": self.location_check_points,
-                             "server_password": self.server_password, "password": self.password,
-                             "release_mode": self.release_mode,
-                             "remaining_mode": self.remaining_mode, "collect_mode": self.collect_mode,
-                             "item_cheat": self.item_cheat, "compatibility": self.compatibility}
-
+            "game_options": self.get_game_options(),
+            "journal_generation": self.journal_generation,
         }
 
         return d
 
+    def get_game_options(self) -> dict:
+        return {"hint_cost": self.hint_cost, "location_check_points": self.location_check_points,
+                "server_password": self.server_password, "password": self.password,
+                "release_mode": self.release_mode,
+                "remaining_mode": self.remaining_mode, "collect_mode": self.collect_mode,
+                "item_cheat": self.item_cheat, "compatibility": self.compatibility}
+
     def set_save(self, savedata: dict):
         if self.connect_names != savedata["connect_names"]:
             raise Exception("This savegame does not appear to match the loaded multiworld.")
         if savedata["version"] > self.save_version:
             raise Exception("This savegame is newer than the server.")
+        self.encoded_fragments.clear()
         self.received_items = savedata["received_items"]
         self.hints_used.update(savedata["hints_used"])
         self.hints.update(savedata["hints"])
@@ -597,6 +940,8 @@ class Context:
 
         if "stored_data" in savedata:
             self.stored_data = savedata["stored_data"]
+
+        self.journal_generation = savedata.get("journal_generation", 0)
         # count items and slots from lists for items_handling = remote
         logging.info(
             f'Loaded save file with {sum([len(v) for k, v in self.received_items.items() if k[2]])} received items '
@@ -624,6 +969,45 @@ class Context:
     def get_players_package(self):
         return [NetworkPlayer(t, p, self.get_aliased_name(t, p), n) for (t, p), n in self.player_names.items()]
 
+    def get_encoded(self, key: typing.Hashable, version: typing.Any,
+                    create: typing.Callable[[], typing.Any]) -> EncodedJSON:
+        """Encoded result of create, kept under key and reused for as long as version doesn't change,
+        so a lot of clients connecting at once don't each encode the same parts of their packets again."""
+        cached = self.encoded_fragments.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        encoded = EncodedJSON(self.dumper(create()))
+        self.encoded_fragments[key] = version, encoded
+        return encoded
+
+    def get_encoded_players_package(self) -> EncodedJSON:
+        return self.get_encoded("players", tuple(self.name_aliases.items()), self.get_players_package)
+
+    def get_encoded_slot_info(self) -> EncodedJSON:
+        return self.get_encoded("slot_info", None, lambda: self.slot_info)
+
+    def get_encoded_slot_data(self, slot: int) -> EncodedJSON:
+        return self.get_encoded(("slot_data", slot), None, lambda: self.slot_data[slot])
+
+    def get_encoded_checks(self, team: int, slot: int) -> typing.Tuple[EncodedJSON, EncodedJSON]:
+        """Encoded missing and checked locations of a slot. Checks of a slot only ever get added, so with the number of
+        them as version, these are encoded again only after new checks."""
+        checks = self.location_checks[team, slot]
+        version = id(checks), len(checks)
+        return (self.get_encoded(("missing_locations", team, slot), version,
+                                 lambda: get_missing_checks(self, team, slot)),
+                self.get_encoded(("checked_locations", team, slot), version,
+                                 lambda: get_checked_checks(self, team, slot)))
+
+    def get_encoded_received_items(self, team: int, slot: int, client: Client) -> typing.Tuple[int, EncodedJSON]:
+        """Number and encoded list of all items client should have received, start inventory first."""
+        start_inventory = get_start_inventory(self, slot, client.remote_start_inventory)
+        items = get_received_items(self, team, slot, client.remote_items)
+        version = len(start_inventory), id(items), len(items)
+        return len(start_inventory) + len(items), \
+            self.get_encoded(("items", team, slot, client.remote_items, client.remote_start_inventory), version,
+                             lambda: start_inventory + items)
+
     def slot_set(self, slot) -> typing.Set[int]:
         """Returns the slot IDs that concern that slot,
         as in expands groups out and returns back the input for solo."""
@@ -676,9 +1060,11 @@ class Context:
                 # we can check once if hint already exists
                 if hint not in self.hints[team, hint.finding_player]:
                     self.hints[team, hint.finding_player].add(hint)
+                    self.journal("hints", (team, hint.finding_player), {hint})
                     new_hint_events.add(hint.finding_player)
                     for player in self.slot_set(hint.receiving_player):
                         self.hints[team, player].add(hint)
+                        self.journal("hints", (team, player), {hint})
                         new_hint_events.add(player)
 
             logging.info("Notice (Team #%d): %s" % (team + 1, format_hint(self, team, hint)))
@@ -706,9 +1092,9 @@ class Context:
 
     def on_new_hint(self, team: int, slot: int):
         key: str = f"_read_hints_{team}_{slot}"
-        targets: typing.Set[Client] = set(self.stored_data_notification_clients[key])
+        targets = self.stored_data_notification_clients.get(key)
         if targets:
-            self.broadcast(targets, [{"cmd": "SetReply", "key": key, "value": self.hints[team, slot]}])
+            self.broadcast(list(targets), [{"cmd": "SetReply", "key": key, "value": self.hints[team, slot]}])
         self.broadcast(self.clients[team][slot], [{
             "cmd": "RoomUpdate",
             "hint_points": get_slot_points(self, team, slot)
@@ -716,14 +1102,15 @@ class Context:
 
     def on_client_status_change(self, team: int, slot: int):
         key: str = f"_read_client_status_{team}_{slot}"
-        targets: typing.Set[Client] = set(self.stored_data_notification_clients[key])
+        targets = self.stored_data_notification_clients.get(key)
         if targets:
-            self.broadcast(targets, [{"cmd": "SetReply", "key": key, "value": self.client_game_state[team, slot]}])
+            self.broadcast(list(targets),
+                           [{"cmd": "SetReply", "key": key, "value": self.client_game_state[team, slot]}])
 
 
 def update_aliases(ctx: Context, team: int):
     cmd = ctx.dumper([{"cmd": "RoomUpdate",
-                       "players": ctx.get_players_package()}])
+                       "players": ctx.get_encoded_players_package()}])
 
     for clients in ctx.clients[team].values():
         for client in clients:
@@ -743,6 +1130,9 @@ async def server(websocket, path: str = "/", ctx: Context = None):
         async for data in websocket:
             if ctx.log_network:
                 logging.info(f"Incoming message: {data}")
+            if ctx.metrics:
+                await process_measured(ctx, client, data, ctx.metrics)
+                continue
             for msg in decode(data):
                 await process_client_cmd(ctx, client, msg)
     except Exception as e:
@@ -754,6 +1144,23 @@ async def server(websocket, path: str = "/", ctx: Context = None):
         await ctx.disconnect(client)
 
 
+async def process_measured(ctx: Context, client: Client, data: typing.Union[str, bytes], metrics: Metrics):
+    """process_client_cmd for each packet of data, recording time taken per cmd."""
+    metrics.record_received(data)
+    start = time.perf_counter()
+    msgs = decode(data)
+    metrics.record_since("decode", start)
+    for msg in msgs:
+        cmd = msg.get("cmd") if isinstance(msg, dict) else None
+        # unknown cmds share a kind to keep it bounded, a cmd that isn't a str may not even be hashable
+        kind = f"cmd:{cmd}" if type(cmd) is str and cmd in client_cmds else "cmd:other"
+        start = time.perf_counter()
+        try:
+            await process_client_cmd(ctx, client, msg)
+        finally:
+            metrics.record_since(kind, start)
+
+
 async def on_client_connected(ctx: Context, client: Client):
     players = []
     for team, clients in ctx.clients.items():
@@ -778,10 +1185,9 @@ async def on_client_connected(ctx: Context, client: Client):
         'permissions': get_permissions(ctx),
         'hint_cost': ctx.hint_cost,
         'location_check_points': ctx.location_check_points,
-        'datapackage_versions': {game: game_data["version"] for game, game_data
-                                 in ctx.gamespackage.items() if game in games},
-        'datapackage_checksums': {game: game_data["checksum"] for game, game_data
-                                  in ctx.gamespackage.items() if game in games and "checksum" in game_data},
+        'datapackage_versions': {game: ctx.gamespackage[game]["version"] for game
+                                 in games if game in ctx.gamespackage},
+        'datapackage_checksums': {game: ctx.checksums[game] for game in games if game in ctx.checksums},
         'seed_name': ctx.seed_name,
         'time': time.time(),
     }])
@@ -815,13 +1221,15 @@ async def on_client_joined(ctx: Context, client: Client):
                               "If your client supports it, "
                               "you may have additional local commands you can list with /help.",
                       {"type": "Tutorial"})
-    ctx.client_connection_timers[client.team, client.slot] = datetime.datetime.now(datetime.timezone.utc)
+    ctx.client_connection_timers[client.team, client.slot] = now = datetime.datetime.now(datetime.timezone.utc)
+    ctx.journal("client_connection_timers", (client.team, client.slot), now.timestamp())
 
 
 async def on_client_left(ctx: Context, client: Client):
     if len(ctx.clients[client.team][client.slot]) < 1:
         update_client_status(ctx, client, ClientStatus.CLIENT_UNKNOWN)
-        ctx.client_connection_timers[client.team, client.slot] = datetime.datetime.now(datetime.timezone.utc)
+        ctx.client_connection_timers[client.team, client.slot] = now = datetime.datetime.now(datetime.timezone.utc)
+        ctx.journal("client_connection_timers", (client.team, client.slot), now.timestamp())
     ctx.broadcast_text_all(
         "%s (Team #%d) has left the game" % (ctx.get_aliased_name(client.team, client.slot), client.team + 1),
         {"type": "Part", "team": client.team, "slot": client.slot})
@@ -884,21 +1292,46 @@ def get_start_inventory(ctx: Context, player: int, remote_start_inventory: bool)
     return ctx.start_inventory.setdefault(player, []) if remote_start_inventory else []
 
 
+def get_new_items_msg(ctx: Context, team: int, slot: int, client: Client) -> typing.Optional[dict]:
+    """Returns the ReceivedItems message of items client has not been sent yet and marks them as sent."""
+    if client.no_items:
+        return None
+    start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
+    items = get_received_items(ctx, team, slot, client.remote_items)
+    if len(start_inventory) + len(items) <= client.send_index:
+        return None
+    first_new_item = max(0, client.send_index - len(start_inventory))
+    msg = {
+        "cmd": "ReceivedItems",
+        "index": client.send_index,
+        "items": start_inventory[client.send_index:] + items[first_new_item:]}
+    client.send_index = len(start_inventory) + len(items)
+    return msg
+
+
+def collect_new_items_msgs(ctx: Context, team: typing.Optional[int] = None) -> typing.Dict[Client, dict]:
+    """Returns ReceivedItems messages for the clients of slots that received items since they were last collected,
+    of one team or of all teams. Only these slots are visited, see send_items_to."""
+    if team is None:
+        dirty_slots, ctx.dirty_slots = ctx.dirty_slots, set()
+    else:
+        dirty_slots = {team_slot for team_slot in ctx.dirty_slots if team_slot[0] == team}
+        ctx.dirty_slots -= dirty_slots
+    msgs: typing.Dict[Client, dict] = {}
+    visited = 0
+    for dirty_team, slot in dirty_slots:
+        for client in ctx.clients.get(dirty_team, {}).get(slot, ()):
+            visited += 1
+            msg = get_new_items_msg(ctx, dirty_team, slot, client)
+            if msg:
+                msgs[client] = msg
+    ctx.skipped_item_deliveries += max(0, len(ctx.endpoints) - visited)
+    return msgs
+
+
 def send_new_items(ctx: Context):
-    for team, clients in ctx.clients.items():
-        for slot, clients in clients.items():
-            for client in clients:
-                if client.no_items:
-                    continue
-                start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
-                items = get_received_items(ctx, team, slot, client.remote_items)
-                if len(start_inventory) + len(items) > client.send_index:
-                    first_new_item = max(0, client.send_index - len(start_inventory))
-                    async_start(ctx.send_msgs(client, [{
-                        "cmd": "ReceivedItems",
-                        "index": client.send_index,
-                        "items": start_inventory[client.send_index:] + items[first_new_item:]}]))
-                    client.send_index = len(start_inventory) + len(items)
+    for client, msg in collect_new_items_msgs(ctx).items():
+        async_start(ctx.send_msgs(client, [msg]))
 
 
 def update_checked_locations(ctx: Context, team: int, slot: int):
@@ -932,6 +1365,7 @@ def collect_player(ctx: Context, team: int, slot: int, is_group: bool = False):
             if slot in group_players:
                 group_collected_players = ctx.group_collected.setdefault(group, set())
                 group_collected_players.add(slot)
+                ctx.journal("group_collected", group, slot)
                 if set(group_players) == group_collected_players:
                     collect_player(ctx, team, group, True)
 
@@ -940,12 +1374,20 @@ def get_remaining(ctx: Context, team: int, slot: int) -> typing.List[int]:
     return ctx.locations.get_remaining(ctx.location_checks, team, slot)
 
 
+def add_received_items(ctx: Context, team: int, target: int, remote_items: bool,
+                       items: typing.Sequence[NetworkItem]):
+    received_items = get_received_items(ctx, team, target, remote_items)
+    ctx.journal("received_items", (team, target, remote_items), (len(received_items), tuple(items)))
+    received_items.extend(items)
+
+
 def send_items_to(ctx: Context, team: int, target_slot: int, *items: NetworkItem):
     for target in ctx.slot_set(target_slot):
-        for item in items:
-            if item.player != target_slot:
-                get_received_items(ctx, team, target, False).append(item)
-            get_received_items(ctx, team, target, True).append(item)
+        ctx.dirty_slots.add((team, target))
+        local_items = [item for item in items if item.player != target_slot]
+        if local_items:
+            add_received_items(ctx, team, target, False, local_items)
+        add_received_items(ctx, team, target, True, items)
 
 
 def register_location_checks(ctx: Context, team: int, slot: int, locations: typing.Iterable[int],
@@ -954,25 +1396,33 @@ def register_location_checks(ctx: Context, team: int, slot: int, locations: typi
     new_locations.intersection_update(ctx.locations[slot])  # ignore location IDs unknown to this multidata
     if new_locations:
         if count_activity:
-            ctx.client_activity_timers[team, slot] = datetime.datetime.now(datetime.timezone.utc)
+            ctx.client_activity_timers[team, slot] = now = datetime.datetime.now(datetime.timezone.utc)
+            ctx.journal("client_activity_timers", (team, slot), now.timestamp())
+        info_texts = []
         for location in new_locations:
             item_id, target_player, flags = ctx.locations[slot][location]
             new_item = NetworkItem(item_id, location, slot, flags)
             send_items_to(ctx, team, target_player, new_item)
 
-            logging.info('(Team #%d) %s sent %s to %s (%s)' % (
-                team + 1, ctx.player_names[(team, slot)], ctx.item_names[item_id],
-                ctx.player_names[(team, target_player)], ctx.location_names[location]))
-            info_text = json_format_send_event(new_item, target_player)
-            ctx.broadcast_team(team, [info_text])
+            logging.info('(Team #%d) %s sent %s to %s (%s)',
+                         team + 1, ctx.player_names[(team, slot)], ctx.item_names[item_id],
+                         ctx.player_names[(team, target_player)], ctx.location_names[location])
+            info_texts.append(json_format_send_event(new_item, target_player))
 
         ctx.location_checks[team, slot] |= new_locations
-        send_new_items(ctx)
-        ctx.broadcast(ctx.clients[team][slot], [{
+        ctx.journal("location_checks", (team, slot), new_locations)
+        # everything caused by this batch of checks goes out in a single frame per client, in the order of
+        # ItemSend messages, new items of the client and the RoomUpdate of the checking slot
+        client_msgs: typing.Dict[Client, typing.List[dict]] = {
+            client: [msg] for client, msg in collect_new_items_msgs(ctx, team).items()}
+        room_update = {
             "cmd": "RoomUpdate",
             "hint_points": get_slot_points(ctx, team, slot),
             "checked_locations": new_locations,  # send back new checks only
-        }])
+        }
+        for client in ctx.clients[team][slot]:
+            client_msgs.setdefault(client, []).append(room_update)
+        ctx.broadcast_team_batch(team, info_texts, client_msgs)
 
         ctx.save()
 
@@ -1189,6 +1639,15 @@ class ClientMessageProcessor(CommonCommandProcessor):
         if not raw.startswith("!admin"):
             self.ctx.broadcast_text_all(self.ctx.get_aliased_name(self.client.team, self.client.slot) + ': ' + raw,
                                         {"type": "Chat", "team": self.client.team, "slot": self.client.slot, "message": raw})
+        metrics = self.ctx.metrics
+        if metrics:
+            command = raw.split(maxsplit=1)[0][1:].lower() if raw.startswith(self.marker) else ""
+            kind = f"command:{command}" if command in self.commands else "command:chat"
+            start = time.perf_counter()
+            try:
+                return super(ClientMessageProcessor, self).__call__(raw)
+            finally:
+                metrics.record_since(kind, start)
         return super(ClientMessageProcessor, self).__call__(raw)
 
     def output(self, text: str):
@@ -1383,12 +1842,14 @@ class ClientMessageProcessor(CommonCommandProcessor):
         if alias_name:
             alias_name = alias_name[:16].strip()
             self.ctx.name_aliases[self.client.team, self.client.slot] = alias_name
+            self.ctx.journal("name_aliases", (self.client.team, self.client.slot), alias_name)
             self.output(f"Hello, {alias_name}")
             update_aliases(self.ctx, self.client.team)
             self.ctx.save()
             return True
         elif (self.client.team, self.client.slot) in self.ctx.name_aliases:
             del (self.ctx.name_aliases[self.client.team, self.client.slot])
+            self.ctx.journal("name_aliases", (self.client.team, self.client.slot), None)
             self.output("Removed Alias")
             update_aliases(self.ctx, self.client.team)
             self.ctx.save()
@@ -1399,15 +1860,17 @@ class ClientMessageProcessor(CommonCommandProcessor):
     def _cmd_getitem(self, item_name: str) -> bool:
         """Cheat in an item, if it is enabled on this server"""
         if self.ctx.item_cheat:
-            names = self.ctx.item_names_for_game(self.ctx.games[self.client.slot])
+            game = self.ctx.games[self.client.slot]
+            names = self.ctx.item_names_for_game(game)
             item_name, usable, response = get_intended_text(
                 item_name,
-                names
+                self.ctx.get_fuzzy_index(game, "items", names)
             )
             if usable:
                 new_item = NetworkItem(names[item_name], -1, self.client.slot)
-                get_received_items(self.ctx, self.client.team, self.client.slot, False).append(new_item)
-                get_received_items(self.ctx, self.client.team, self.client.slot, True).append(new_item)
+                add_received_items(self.ctx, self.client.team, self.client.slot, False, [new_item])
+                add_received_items(self.ctx, self.client.team, self.client.slot, True, [new_item])
+                self.ctx.dirty_slots.add((self.client.team, self.client.slot))
                 self.ctx.broadcast_text_all(
                     'Cheat console: sending "' + item_name + '" to ' + self.ctx.get_aliased_name(self.client.team,
                                                                                                  self.client.slot),
@@ -1455,9 +1918,10 @@ class ClientMessageProcessor(CommonCommandProcessor):
             if game not in self.ctx.all_item_and_group_names:
                 self.output("Can't look up item/location for unknown game. Hint for ID instead.")
                 return False
-            names = self.ctx.all_location_and_group_names[game] \
+            names = self.ctx.get_fuzzy_index(game, "location_and_group_names",
+                                             self.ctx.all_location_and_group_names[game]) \
                 if for_location else \
-                self.ctx.all_item_and_group_names[game]
+                self.ctx.get_fuzzy_index(game, "item_and_group_names", self.ctx.all_item_and_group_names[game])
             hint_name, usable, response = get_intended_text(input_text, names)
 
             if usable:
@@ -1513,6 +1977,8 @@ class ClientMessageProcessor(CommonCommandProcessor):
                     hints.append(hint)
                     can_pay -= 1
                     self.ctx.hints_used[self.client.team, self.client.slot] += 1
+                    self.ctx.journal("hints_used", (self.client.team, self.client.slot),
+                                     self.ctx.hints_used[self.client.team, self.client.slot])
                     points_available = get_client_points(self.ctx, self.client)
 
                 if not_found_hints:
@@ -1639,34 +2105,34 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             ctx.clients[team][slot].append(client)
             client.version = args['version']
             client.tags = args['tags']
+            ctx.index_client(client)
             client.no_locations = 'TextOnly' in client.tags or 'Tracker' in client.tags
+            missing_locations, checked_locations = ctx.get_encoded_checks(team, slot)
             connected_packet = {
                 "cmd": "Connected",
                 "team": client.team, "slot": client.slot,
-                "players": ctx.get_players_package(),
-                "missing_locations": get_missing_checks(ctx, team, slot),
-                "checked_locations": get_checked_checks(ctx, team, slot),
-                "slot_info": ctx.slot_info,
+                "players": ctx.get_encoded_players_package(),
+                "missing_locations": missing_locations,
+                "checked_locations": checked_locations,
+                "slot_info": ctx.get_encoded_slot_info(),
                 "hint_points": get_slot_points(ctx, team, slot),
             }
             reply = [connected_packet]
-            start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
-            items = get_received_items(ctx, client.team, client.slot, client.remote_items)
-            if (start_inventory or items) and not client.no_items:
-                reply.append({"cmd": 'ReceivedItems', "index": 0, "items": start_inventory + items})
-                client.send_index = len(start_inventory) + len(items)
+            count, items = ctx.get_encoded_received_items(team, slot, client)
+            if count and not client.no_items:
+                reply.append({"cmd": 'ReceivedItems', "index": 0, "items": items})
+                client.send_index = count
             if not client.auth:  # if this was a Re-Connect, don't print to console
                 client.auth = True
                 await on_client_joined(ctx, client)
             if args.get("slot_data", True):
-                connected_packet["slot_data"] = ctx.slot_data[client.slot]
+                connected_packet["slot_data"] = ctx.get_encoded_slot_data(client.slot)
             await ctx.send_msgs(client, reply)
 
     elif cmd == "GetDataPackage":
         exclusions = args.get("exclusions", [])
         if "games" in args:
-            games = {name: game_data for name, game_data in ctx.gamespackage.items()
-                     if name in set(args.get("games", []))}
+            games = {name: ctx.gamespackage[name] for name in args.get("games", []) if name in ctx.gamespackage}
             await ctx.send_msgs(client, [{"cmd": "DataPackage",
                                           "data": {"games": games}}])
         # TODO: remove exclusions behaviour around 0.5.0
@@ -1681,7 +2147,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
 
         else:
             await ctx.send_msgs(client, [{"cmd": "DataPackage",
-                                          "data": {"games": ctx.gamespackage}}])
+                                          "data": {"games": dict(ctx.gamespackage)}}])
 
     elif client.auth:
         if cmd == "ConnectUpdate":
@@ -1693,12 +2159,10 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             if args.get('items_handling', None) is not None and client.items_handling != args['items_handling']:
                 try:
                     client.items_handling = args['items_handling']
-                    start_inventory = get_start_inventory(ctx, client.slot, client.remote_start_inventory)
-                    items = get_received_items(ctx, client.team, client.slot, client.remote_items)
-                    if (items or start_inventory) and not client.no_items:
-                        client.send_index = len(start_inventory) + len(items)
-                        await ctx.send_msgs(client, [{"cmd": "ReceivedItems", "index": 0,
-                                                      "items": start_inventory + items}])
+                    count, items = ctx.get_encoded_received_items(client.team, client.slot, client)
+                    if count and not client.no_items:
+                        client.send_index = count
+                        await ctx.send_msgs(client, [{"cmd": "ReceivedItems", "index": 0, "items": items}])
                     else:
                         client.send_index = 0
                 except (ValueError, TypeError) as err:
@@ -1710,6 +2174,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             if "tags" in args:
                 old_tags = client.tags
                 client.tags = args["tags"]
+                ctx.index_client(client)
                 if set(old_tags) != set(client.tags):
                     client.no_locations = 'TextOnly' in client.tags or 'Tracker' in client.tags
                     ctx.broadcast_text_all(
@@ -1718,12 +2183,10 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
                         {"type": "TagsChanged", "team": client.team, "slot": client.slot, "tags": client.tags})
 
         elif cmd == 'Sync':
-            start_inventory = get_start_inventory(ctx, client.slot, client.remote_start_inventory)
-            items = get_received_items(ctx, client.team, client.slot, client.remote_items)
-            if (start_inventory or items) and not client.no_items:
-                client.send_index = len(start_inventory) + len(items)
-                await ctx.send_msgs(client, [{"cmd": "ReceivedItems", "index": 0,
-                                              "items": start_inventory + items}])
+            count, items = ctx.get_encoded_received_items(client.team, client.slot, client)
+            if count and not client.no_items:
+                client.send_index = count
+                await ctx.send_msgs(client, [{"cmd": "ReceivedItems", "index": 0, "items": items}])
 
         elif cmd == 'LocationChecks':
             if client.no_locations:
@@ -1765,17 +2228,16 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             client.messageprocessor(args["text"])
 
         elif cmd == "Bounce":
-            games = set(args.get("games", []))
-            tags = set(args.get("tags", []))
-            slots = set(args.get("slots", []))
+            targets: typing.Set[Client] = set()
+            for game in args.get("games", []):
+                targets.update(ctx.clients_by_game.get((client.team, game), ()))
+            for tag in args.get("tags", []):
+                targets.update(ctx.clients_by_tag.get((client.team, tag), ()))
+            for slot in args.get("slots", []):
+                targets.update(ctx.clients[client.team].get(slot, ()))
             args["cmd"] = "Bounced"
-            msg = ctx.dumper([args])
-
-            for bounceclient in ctx.endpoints:
-                if client.team == bounceclient.team and (ctx.games[bounceclient.slot] in games or
-                                                         set(bounceclient.tags) & tags or
-                                                         bounceclient.slot in slots):
-                    await ctx.send_encoded_msgs(bounceclient, msg)
+            if targets:
+                ctx.broadcast(targets, [args])
 
         elif cmd == "Get":
             if "keys" not in args or type(args["keys"]) != list:
@@ -1804,9 +2266,11 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
                 func = modify_functions[operation["operation"]]
                 value = func(value, operation["value"])
             ctx.stored_data[args["key"]] = args["value"] = value
-            targets = set(ctx.stored_data_notification_clients[args["key"]])
-            if args.get("want_reply", True):
-                targets.add(client)
+            ctx.journal("stored_data", args["key"], value)
+            notified = ctx.stored_data_notification_clients.get(args["key"], ())
+            targets = list(notified)
+            if args.get("want_reply", True) and client not in notified:
+                targets.append(client)
             if targets:
                 ctx.broadcast(targets, [args])
             ctx.save()
@@ -1827,6 +2291,7 @@ def update_client_status(ctx: Context, client: Client, new_status: ClientStatus)
             ctx.on_goal_achieved(client)
 
         ctx.client_game_state[client.team, client.slot] = new_status
+        ctx.journal("client_game_state", (client.team, client.slot), new_status)
         ctx.on_client_status_change(client.team, client.slot)
         ctx.save()
 
@@ -1854,6 +2319,28 @@ class ServerCommandProcessor(CommonCommandProcessor):
             self.output("Saving is disabled.")
             return False
 
+    def _cmd_metrics(self, action: str = "") -> bool:
+        """Show call counts, latencies and bytes sent since metrics were enabled.
+        "/metrics on" starts measuring, "/metrics off" stops and "/metrics reset" starts over."""
+        action = action.lower()
+        if action == "on" and self.ctx.metrics:
+            self.output("Metrics are already enabled.")
+        elif action in ("on", "reset"):
+            self.ctx.enable_metrics()
+            self.output("Metrics enabled.")
+        elif action == "off":
+            self.ctx.metrics = None
+            self.output("Metrics disabled.")
+        elif action:
+            self.output(f"Unknown action {action}, use on, off or reset.")
+            return False
+        elif self.ctx.metrics:
+            self.output("\n".join(self.ctx.metrics.get_report()))
+        else:
+            self.output("Metrics are disabled, enable them with /metrics on.")
+            return False
+        return True
+
     def _cmd_players(self) -> bool:
         """Get information about connected players"""
         self.output(get_players_string(self.ctx))
@@ -1886,12 +2373,14 @@ class ServerCommandProcessor(CommonCommandProcessor):
                     if alias_name:
                         alias_name = alias_name.strip()[:15]
                         self.ctx.name_aliases[team, slot] = alias_name
+                        self.ctx.journal("name_aliases", (team, slot), alias_name)
                         self.output(f"Named {player_name} as {alias_name}")
                         update_aliases(self.ctx, team)
                         self.ctx.save()
                         return True
                     else:
                         del (self.ctx.name_aliases[team, slot])
+                        self.ctx.journal("name_aliases", (team, slot), None)
                         self.output(f"Removed Alias for {player_name}")
                         update_aliases(self.ctx, team)
                         self.ctx.save()
@@ -1975,8 +2464,10 @@ class ServerCommandProcessor(CommonCommandProcessor):
         if usable:
             team, slot = self.ctx.player_name_lookup[seeked_player]
             item_name = " ".join(item_name)
-            names = self.ctx.item_names_for_game(self.ctx.games[slot])
-            item_name, usable, response = get_intended_text(item_name, names)
+            game = self.ctx.games[slot]
+            names = self.ctx.item_names_for_game(game)
+            item_name, usable, response = get_intended_text(item_name,
+                                                            self.ctx.get_fuzzy_index(game, "items", names))
             if usable:
                 amount: int = int(amount)
                 new_items = [NetworkItem(names[item_name], -1, 0) for _ in range(int(amount))]
@@ -2009,7 +2500,8 @@ class ServerCommandProcessor(CommonCommandProcessor):
             if full_name.isnumeric():
                 location, usable, response = int(full_name), True, None
             elif self.ctx.location_names_for_game(game) is not None:
-                location, usable, response = get_intended_text(full_name, self.ctx.location_names_for_game(game))
+                location, usable, response = get_intended_text(
+                    full_name, self.ctx.get_fuzzy_index(game, "locations", self.ctx.location_names_for_game(game)))
             else:
                 self.output("Can't look up location for unknown game. Send by ID instead.")
                 return False
@@ -2040,7 +2532,9 @@ class ServerCommandProcessor(CommonCommandProcessor):
             if full_name.isnumeric():
                 item, usable, response = int(full_name), True, None
             elif game in self.ctx.all_item_and_group_names:
-                item, usable, response = get_intended_text(full_name, self.ctx.all_item_and_group_names[game])
+                item, usable, response = get_intended_text(
+                    full_name, self.ctx.get_fuzzy_index(game, "item_and_group_names",
+                                                         self.ctx.all_item_and_group_names[game]))
             else:
                 self.output("Can't look up item for unknown game. Hint for ID instead.")
                 return False
@@ -2079,7 +2573,8 @@ class ServerCommandProcessor(CommonCommandProcessor):
             if full_name.isnumeric():
                 location, usable, response = int(full_name), True, None
             elif self.ctx.location_names_for_game(game) is not None:
-                location, usable, response = get_intended_text(full_name, self.ctx.location_names_for_game(game))
+                location, usable, response = get_intended_text(
+                    full_name, self.ctx.get_fuzzy_index(game, "locations", self.ctx.location_names_for_game(game)))
             else:
                 self.output("Can't look up location for unknown game. Hint for ID instead.")
                 return False
@@ -2204,6 +2699,13 @@ def parse_args() -> argparse.Namespace:
     #0 -> recommended for tournaments to force a level playing field, only allow an exact version match
     """)
     parser.add_argument('--log_network', default=defaults["log_network"], action="store_true")
+    parser.add_argument('--journal_saves', default=defaults["journal_saves"], action="store_true",
+                        help="append changes to a journal instead of rewriting the whole save file every time")
+    parser.add_argument('--metrics', default=defaults["metrics"], action="store_true",
+                        help="measure call counts, latencies and bytes sent, shown by the /metrics command")
+    parser.add_argument('--metrics_port', default=defaults["metrics_port"], type=int,
+                        help="serve metrics as JSON over HTTP on this port of localhost, implies --metrics. "
+                             "0 to not serve them.")
     args = parser.parse_args()
     return args
 
@@ -2246,7 +2748,7 @@ async def main(args: argparse.Namespace):
     ctx = Context(args.host, args.port, args.server_password, args.password, args.location_check_points,
                   args.hint_cost, not args.disable_item_cheat, args.release_mode, args.collect_mode,
                   args.remaining_mode,
-                  args.auto_shutdown, args.compatibility, args.log_network)
+                  args.auto_shutdown, args.compatibility, args.log_network, args.journal_saves)
     data_filename = args.multidata
 
     if not data_filename:
@@ -2286,6 +2788,11 @@ async def main(args: argparse.Namespace):
                                                  'No password' if not ctx.password else 'Password: %s' % ctx.password))
 
     await ctx.server
+    if args.metrics or args.metrics_port:
+        ctx.enable_metrics()
+    if args.metrics_port:
+        await serve_metrics(ctx, args.metrics_port)
+        logging.info(f"Serving metrics at http://127.0.0.1:{args.metrics_port}")
     console_task = asyncio.create_task(console(ctx))
     if ctx.auto_shutdown:
         ctx.shutdown_task = asyncio.create_task(auto_shutdown(ctx, [console_task]))
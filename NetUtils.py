@@ -1,13 +1,23 @@
 from __future__ import annotations
 
 import typing
+import bisect
 import enum
+import hashlib
+import itertools
+import mmap
+import operator
+import os
+import pickle
+import struct
 import warnings
+import zlib
 from json import JSONEncoder, JSONDecoder
+from json.encoder import c_make_encoder, encode_basestring
 
 import websockets
 
-from Utils import ByValue, Version
+from Utils import ByValue, Version, VersionException, restricted_loads
 
 
 class JSONMessagePart(typing.TypedDict, total=False):
@@ -94,15 +104,135 @@ def _scan_for_TypedTuples(obj: typing.Any) -> typing.Any:
     return obj
 
 
-_encode = JSONEncoder(
+_json_encoder = JSONEncoder(
     ensure_ascii=False,
     check_circular=False,
     separators=(',', ':'),
-).encode
+)
+_encode = _json_encoder.encode
+
+if c_make_encoder:
+    # JSONEncoder.encode sets up a new C encoder for each call, which would dominate encoding many small parts
+    _c_encoder = c_make_encoder(None, _json_encoder.default, encode_basestring, None, ":", ",", False, False, True)
+
+    def _encode_plain(obj: typing.Any) -> str:
+        return "".join(_c_encoder(obj, 0))
+else:
+    _encode_plain = _encode
+
+class EncodedJSON(str):
+    """JSON text that encode writes out as it is, to reuse already encoded parts of packets."""
+    __slots__ = ()
+
+
+_plain_types: typing.Set[type] = {str, int, float, bool, type(None)}
+_other_types: typing.Set[type] = {EncodedJSON}
+
+
+def _is_plain(types: typing.Iterable[type]) -> bool:
+    """If values of these types can't contain NamedTuples, so _encode_plain encodes them like encode would."""
+    types = set(types)
+    if _plain_types.issuperset(types):
+        return True
+    if not _other_types.isdisjoint(types):
+        return False
+    for cls in types.difference(_plain_types):
+        if issubclass(cls, (str, int, float)):  # enums of those are plain too
+            _plain_types.add(cls)
+        else:
+            _other_types.add(cls)
+            return False
+    return True
+
+
+_typed_tuple_encoders: typing.Dict[type, typing.Callable[[typing.Any], str]] = {}
+
+
+def _make_typed_tuple_encoder(cls: type) -> typing.Callable[[typing.Any], str]:
+    """Encodes a NamedTuple as a dict with a "class" key, formatting fields straight into a template if they're ints."""
+    name = cls.__name__
+    template = "{" + ",".join(f"{encode_basestring(field)}:%d" for field in cls._fields) + \
+               f',"class":{encode_basestring(name)}}}'
+    only_ints = frozenset((int,)).issuperset if cls._fields and "class" not in cls._fields else lambda types: False
+
+    def encode_typed_tuple(obj: typing.Any) -> str:
+        if only_ints(map(type, obj)):
+            return template % obj
+        data = obj._asdict()
+        data["class"] = name
+        return _encode_plain(data)
+
+    def encode_many(objs: typing.Iterable[typing.Any]) -> str:
+        if only_ints(map(type, itertools.chain.from_iterable(objs))):
+            return ",".join(map(template.__mod__, objs))
+        return ",".join(map(encode_typed_tuple, objs))
+
+    encode_typed_tuple.encode_many = encode_many
+    return encode_typed_tuple
+
+
+def _encode_key(key: typing.Any) -> str:
+    if isinstance(key, str):
+        return encode_basestring(key)
+    if isinstance(key, (int, float)) or key is None:
+        return f'"{_encode_plain(key)}"'
+    raise TypeError(f"keys must be str, int, float, bool or None, not {key.__class__.__name__}")
+
+
+_plain_containers = frozenset((list, tuple, dict))
+
+
+def _is_plain_tree(obj: typing.Union[list, tuple, dict]) -> bool:
+    """If obj is nested lists, tuples and dicts of only plain values, so _encode_plain encodes it like encode would."""
+    values = obj.values() if obj.__class__ is dict else obj
+    types = set(map(type, values))
+    if _plain_types.issuperset(types):
+        return True
+    containers = types & _plain_containers
+    if not containers:
+        return _is_plain(types)
+    return _is_plain(types - containers) and \
+        all(_is_plain_tree(value) for value in values if value.__class__ in containers)
+
+
+def _get_typed_tuple_encoder(cls: type) -> typing.Callable[[typing.Any], str]:
+    encoder = _typed_tuple_encoders.get(cls)
+    if encoder is None:
+        encoder = _typed_tuple_encoders[cls] = _make_typed_tuple_encoder(cls)
+    return encoder
+
+
+def _encode_value(obj: typing.Any) -> str:
+    cls = obj.__class__
+    if cls is str:
+        return encode_basestring(obj)
+    if cls is int:
+        return int.__repr__(obj)
+    if cls is EncodedJSON:
+        return obj
+    if cls in _plain_containers and _is_plain_tree(obj):
+        return _encode_plain(obj)
+    if isinstance(obj, tuple) and hasattr(obj, "_fields"):  # NamedTuple is not actually a parent class
+        return _get_typed_tuple_encoder(cls)(obj)
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        types = set(map(type, obj))
+        if len(types) == 1:
+            item_cls = types.pop()
+            if issubclass(item_cls, tuple) and hasattr(item_cls, "_fields"):
+                return "[" + _get_typed_tuple_encoder(item_cls).encode_many(obj) + "]"
+        return "[" + ",".join(map(_encode_value, obj)) + "]"
+    if isinstance(obj, dict):
+        return "{" + ",".join(f"{_encode_key(key)}:{_encode_value(value)}" for key, value in obj.items()) + "}"
+    return _encode_plain(obj)
 
 
 def encode(obj: typing.Any) -> str:
-    return _encode(_scan_for_TypedTuples(obj))
+    """
+    Encodes obj as JSON, with NamedTuples as dicts that name their class in a "class" key.
+    Produces the same text as _encode(_scan_for_TypedTuples(obj)), but only builds strings of its own
+    for containers holding NamedTuples and leaves everything else to the C encoder.
+    """
+    return _encode_value(obj)
 
 
 def get_any_version(data: dict) -> Version:
@@ -121,13 +251,27 @@ custom_hooks = {
 }
 
 
+_typed_tuple_getters: typing.Dict[type, typing.Callable[[dict], typing.Tuple]] = {}
+
+
 def _object_hook(o: typing.Any) -> typing.Any:
     if isinstance(o, dict):
-        hook = custom_hooks.get(o.get("class", None), None)
+        class_name = o.get("class", None)
+        if class_name is None:
+            return o
+        hook = custom_hooks.get(class_name, None)
         if hook:
             return hook(o)
-        cls = allowlist.get(o.get("class", None), None)
+        cls = allowlist.get(class_name, None)
         if cls:
+            if len(o) == len(cls._fields) + 1:  # every field and "class", the way encode writes them
+                getter = _typed_tuple_getters.get(cls)
+                if getter is None:
+                    getter = _typed_tuple_getters[cls] = operator.itemgetter(*cls._fields, "class")
+                try:
+                    return cls._make(getter(o)[:-1])
+                except KeyError:
+                    pass
             for key in tuple(o):
                 if key not in cls._fields:
                     del (o[key])
@@ -346,6 +490,255 @@ class Hint(typing.NamedTuple):
         return self.receiving_player == self.finding_player
 
 
+multidata_format_version = 4
+"""
+Version byte of .archipelago files written by write_multidata. Up to version 3, the version byte is followed by the
+zlib compressed pickle of the whole multidata. Version 4 follows it with one section per key of the multidata and one
+per game of the data package, each made of a little-endian uint16 name length, the utf-8 name, a uint64 payload length
+and the zlib compressed pickle as payload. The "datapackage" section only holds the checksum of each game, their data
+follows in sections named "datapackage:" + game.
+"""
+_data_package_prefix = "datapackage:"
+
+
+class _CompressingWriter:
+    """Compresses everything written to it into file, so pickle can stream into a section."""
+
+    def __init__(self, file: typing.BinaryIO, compression_level: int) -> None:
+        self.file = file
+        self.compressor = zlib.compressobj(compression_level)
+
+    def write(self, data: bytes) -> int:
+        self.file.write(self.compressor.compress(data))
+        return len(data)
+
+    def flush(self) -> None:
+        self.file.write(self.compressor.flush())
+
+
+def _write_section(file: typing.BinaryIO, name: str, value: typing.Any, compression_level: int) -> None:
+    encoded_name = name.encode()
+    file.write(struct.pack("<H", len(encoded_name)))
+    file.write(encoded_name)
+    size_position = file.tell()
+    file.write(struct.pack("<Q", 0))
+    writer = _CompressingWriter(file, compression_level)
+    pickle.Pickler(writer).dump(value)
+    writer.flush()
+    end_position = file.tell()
+    file.seek(size_position)
+    file.write(struct.pack("<Q", end_position - size_position - 8))
+    file.seek(end_position)
+
+
+def write_multidata(file: typing.BinaryIO, multidata: typing.Dict[str, typing.Any], compression_level: int = 6,
+                    format_version: int = multidata_format_version) -> None:
+    """
+    Writes multidata into the seekable file, in format version 4 one section at a time.
+    Format version 3 can be read by servers before version 4 was introduced.
+    """
+    if format_version < 4:
+        file.write(bytes([format_version]))
+        file.write(zlib.compress(pickle.dumps(multidata), compression_level))
+        return
+    file.write(bytes([multidata_format_version]))
+    for key, value in multidata.items():
+        if key == "datapackage":
+            _write_section(file, key, {game: game_data.get("checksum") for game, game_data in value.items()},
+                           compression_level)
+            for game, game_data in value.items():
+                _write_section(file, _data_package_prefix + game, game_data, compression_level)
+        else:
+            _write_section(file, key, value, compression_level)
+
+
+def read_multidata(data: bytes, known_checksums: typing.Container[str] = ()) -> typing.Dict[str, typing.Any]:
+    """
+    Reads multidata of any format version.
+    From version 4 on, data packages with a checksum in known_checksums are not unpacked and only hold their checksum.
+    """
+    format_version = data[0]
+    if format_version > multidata_format_version:
+        raise VersionException("Incompatible multidata.")
+    if format_version < 4:
+        return restricted_loads(zlib.decompress(data[1:]))
+
+    multidata: typing.Dict[str, typing.Any] = {}
+    view = memoryview(data)
+    position = 1
+    while position < len(data):
+        name_length, = struct.unpack_from("<H", data, position)
+        position += 2
+        name = str(view[position:position + name_length], "utf-8")
+        position += name_length
+        size, = struct.unpack_from("<Q", data, position)
+        position += 8
+        payload = view[position:position + size]
+        position += size
+        if name.startswith(_data_package_prefix):
+            game = name[len(_data_package_prefix):]
+            checksum = multidata["datapackage"][game]
+            if checksum and checksum in known_checksums:
+                multidata["datapackage"][game] = {"checksum": checksum}
+                continue
+            multidata["datapackage"][game] = restricted_loads(zlib.decompress(payload))
+        else:
+            multidata[name] = restricted_loads(zlib.decompress(payload))
+    return multidata
+
+
+class _IdNames(typing.Mapping[int, str]):
+    """Names by ID, looked up in a sorted array of IDs pointing into a table of utf-8 strings."""
+    __slots__ = ("ids", "offsets", "strings")
+
+    def __init__(self, buffer: memoryview, ids: int, count: int, offsets: int, strings: int, strings_size: int):
+        self.ids = buffer[ids:ids + count * 8].cast("q")
+        self.offsets = buffer[offsets:offsets + (count + 1) * 8].cast("Q")
+        self.strings = buffer[strings:strings + strings_size]
+
+    def __getitem__(self, key: int) -> str:
+        if type(key) is int:
+            index = bisect.bisect_left(self.ids, key)
+            if index < len(self.ids) and self.ids[index] == key:
+                return str(self.strings[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+        raise KeyError(key)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(self.ids)
+
+
+class _LazyPackages(typing.Mapping[str, typing.Dict[str, typing.Any]]):
+    """Data packages by game, each unpacked on first access."""
+
+    def __init__(self, buffer: memoryview, positions: typing.Dict[str, typing.Tuple[int, int]]):
+        self.buffer = buffer
+        self.positions = positions
+        self.packages: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+
+    def __getitem__(self, game: str) -> typing.Dict[str, typing.Any]:
+        package = self.packages.get(game)
+        if package is None:
+            offset, size = self.positions[game]
+            package = self.packages[game] = restricted_loads(self.buffer[offset:offset + size])
+        return package
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.positions)
+
+
+class _PackageView(typing.Mapping[str, typing.Any]):
+    """One key of every data package by game, like the item_name_groups of every game."""
+
+    def __init__(self, packages: _LazyPackages, key: str):
+        self.packages = packages
+        self.key = key
+
+    def __getitem__(self, game: str) -> typing.Any:
+        return self.packages[game][self.key]
+
+    def __len__(self) -> int:
+        return len(self.packages)
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self.packages)
+
+
+class DataPackageStore:
+    """
+    Read-only data packages of many games in one memory-mapped file made by DataPackageStore.write,
+    so every process reading the same file shares its pages instead of holding its own copy.
+    Item and location names are looked up by ID, a game's data package is only unpacked when accessed.
+    """
+    header = struct.Struct("<4sIQQ")
+    magic = b"APDP"
+    version = 1
+
+    item_names: typing.Mapping[int, str]
+    location_names: typing.Mapping[int, str]
+    games: typing.Mapping[str, typing.Dict[str, typing.Any]]
+    item_name_groups: typing.Mapping[str, typing.Dict[str, typing.List[str]]]
+    location_name_groups: typing.Mapping[str, typing.Dict[str, typing.List[str]]]
+    checksums: typing.Dict[str, str]
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        magic, version, index_offset, index_size = self.header.unpack_from(buffer)
+        if magic != self.magic or version != self.version:
+            raise VersionException(f"{path} is not a data package store of version {self.version}.")
+        index = restricted_loads(buffer[index_offset:index_offset + index_size])
+        self.item_names = _IdNames(buffer, *index["items"])
+        self.location_names = _IdNames(buffer, *index["locations"])
+        self.games = _LazyPackages(buffer, index["games"])
+        self.item_name_groups = _PackageView(self.games, "item_name_groups")
+        self.location_name_groups = _PackageView(self.games, "location_name_groups")
+        self.checksums = index["checksums"]
+
+    @staticmethod
+    def _write_names(file: typing.BinaryIO, names: typing.Dict[int, str]) -> typing.Tuple[int, ...]:
+        ids = sorted(names)
+        encoded = [names[name_id].encode() for name_id in ids]
+        offsets = [0]
+        for name in encoded:
+            offsets.append(offsets[-1] + len(name))
+        ids_offset = file.tell()
+        file.write(struct.pack(f"<{len(ids)}q", *ids))
+        offsets_offset = file.tell()
+        file.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+        strings_offset = file.tell()
+        file.write(b"".join(encoded))
+        file.write(bytes(-file.tell() % 8))  # keep the next array aligned
+        return ids_offset, len(ids), offsets_offset, strings_offset, offsets[-1]
+
+    @classmethod
+    def write(cls, directory: str, games: typing.Dict[str, typing.Dict[str, typing.Any]]) -> str:
+        """
+        Writes the data packages of games into directory, unless a file with the same data packages exists already.
+        Returns the path of the file. Names of IDs used by several games are taken from the game that comes last.
+        """
+        digest = hashlib.sha1(pickle.dumps([(game, package.get("checksum"), package.get("version"))
+                                            for game, package in games.items()])).hexdigest()
+        path = os.path.join(directory, f"datapackage_{digest}.bin")
+        if os.path.exists(path):
+            return path
+
+        item_names: typing.Dict[int, str] = {}
+        location_names: typing.Dict[int, str] = {}
+        for package in games.values():
+            item_names.update((item_id, name) for name, item_id in package["item_name_to_id"].items())
+            location_names.update((location_id, name) for name, location_id in package["location_name_to_id"].items())
+
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(bytes(cls.header.size))
+            file.write(bytes(-file.tell() % 8))
+            index: typing.Dict[str, typing.Any] = {
+                "items": cls._write_names(file, item_names),
+                "locations": cls._write_names(file, location_names),
+                "games": {},
+                "checksums": {game: package["checksum"] for game, package in games.items() if "checksum" in package},
+            }
+            for game, package in games.items():
+                data = pickle.dumps(package)
+                index["games"][game] = file.tell(), len(data)
+                file.write(data)
+            data = pickle.dumps(index)
+            index_offset = file.tell()
+            file.write(data)
+            file.seek(0)
+            file.write(cls.header.pack(cls.magic, cls.version, index_offset, len(data)))
+        os.replace(temp_path, path)
+        return path
+
+
 class _LocationStore(dict, typing.MutableMapping[int, typing.Dict[int, typing.Tuple[int, int, int]]]):
     def __init__(self, values: typing.MutableMapping[int, typing.Dict[int, typing.Tuple[int, int, int]]]):
         super().__init__(values)
@@ -359,21 +752,30 @@ class _LocationStore(dict, typing.MutableMapping[int, typing.Dict[int, typing.Tu
         if len(self.get(0, {})):
             raise ValueError("Invalid player id 0 for location")
 
-    def find_item(self, slots: typing.Set[int], seeked_item_id: int
-                  ) -> typing.Generator[typing.Tuple[int, int, int, int, int], None, None]:
+        # indexes by receiver and by (receiver, item), entries are numbered in the order a scan would find them
+        self._receiver_index: typing.Dict[int, typing.Dict[int, typing.Set[int]]] = {}
+        self._item_index: typing.Dict[typing.Tuple[int, int],
+                                      typing.List[typing.Tuple[int, int, int, int, int, int]]] = {}
+        order = 0
         for finding_player, check_data in self.items():
             for location_id, (item_id, receiving_player, item_flags) in check_data.items():
-                if receiving_player in slots and item_id == seeked_item_id:
-                    yield finding_player, location_id, item_id, receiving_player, item_flags
+                self._receiver_index.setdefault(receiving_player, {}).setdefault(finding_player, set()).add(location_id)
+                self._item_index.setdefault((receiving_player, item_id), []).append(
+                    (order, finding_player, location_id, item_id, receiving_player, item_flags))
+                order += 1
+
+    def find_item(self, slots: typing.Set[int], seeked_item_id: int
+                  ) -> typing.Generator[typing.Tuple[int, int, int, int, int], None, None]:
+        found = [entry for slot in slots for entry in self._item_index.get((slot, seeked_item_id), ())]
+        if len(slots) > 1:
+            found.sort()
+        for entry in found:
+            yield entry[1:]
 
     def get_for_player(self, slot: int) -> typing.Dict[int, typing.Set[int]]:
         import collections
-        all_locations: typing.Dict[int, typing.Set[int]] = collections.defaultdict(set)
-        for source_slot, location_data in self.items():
-            for location_id, values in location_data.items():
-                if values[1] == slot:
-                    all_locations[source_slot].add(location_id)
-        return all_locations
+        return collections.defaultdict(set, {source_slot: set(location_ids) for source_slot, location_ids
+                                             in self._receiver_index.get(slot, {}).items()})
 
     def get_checked(self, state: typing.Dict[typing.Tuple[int, int], typing.Set[int]], team: int, slot: int
                     ) -> typing.List[int]:
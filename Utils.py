@@ -595,6 +595,9 @@ def format_SI_prefix(value, power=1000, power_labels=("", "k", "M", "G", "T", "P
 
 def get_fuzzy_results(input_word: str, wordlist: typing.Sequence[str], limit: typing.Optional[int] = None) \
         -> typing.List[typing.Tuple[str, int]]:
+    if isinstance(wordlist, FuzzyIndex):
+        return wordlist.get_results(input_word, limit)
+
     import jellyfish
 
     def get_fuzzy_ratio(word1: str, word2: str) -> float:
@@ -615,6 +618,85 @@ def get_fuzzy_results(input_word: str, wordlist: typing.Sequence[str], limit: ty
     )
 
 
+class FuzzyIndex:
+    """
+    Prebuilt index to repeatedly get the same results as get_fuzzy_results for one list of words, without scoring all of
+    them. Each character shared by input and candidate can at best save one edit, so the characters in common bound the
+    score; candidates are scored in order of that bound until no remaining one can place within the limit.
+    The distance is counted in grapheme clusters, so words that could contain multi-character ones are always scored.
+    """
+    words: typing.List[str]
+    lowered: typing.List[str]
+    lengths: typing.List[typing.Tuple[int, int]]
+    postings: typing.Dict[typing.Tuple[str, int], typing.List[int]]
+    """indices of words containing the character at least n times, by (character, n)"""
+    unbounded: typing.List[int]
+
+    def __init__(self, wordlist: typing.Iterable[str]):
+        self.words = list(wordlist)
+        self.lowered = [word.lower() for word in self.words]
+        self.lengths = [(len(word), len(lowered)) for word, lowered in zip(self.words, self.lowered)]
+        self.postings = {}
+        self.unbounded = []
+        for index, lowered in enumerate(self.lowered):
+            if not self.is_bounded(lowered):
+                self.unbounded.append(index)
+                continue
+            for char, count in collections.Counter(lowered).items():
+                for n in range(1, count + 1):
+                    self.postings.setdefault((char, n), []).append(index)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def is_bounded(word: str) -> bool:
+        """If each character of word is its own grapheme cluster."""
+        return word.isascii() and "\r" not in word
+
+    def get_results(self, input_word: str, limit: typing.Optional[int] = None) -> typing.List[typing.Tuple[str, int]]:
+        if not input_word or not self.is_bounded(input_word.lower()):
+            return get_fuzzy_results(input_word, self.words, limit)
+        import heapq
+        import jellyfish
+        distance = jellyfish.damerau_levenshtein_distance
+
+        limit: int = limit if limit else len(self.words)
+        lowered_input = input_word.lower()
+        input_length = len(input_word)
+        lowered_input_length = len(lowered_input)
+
+        shared: typing.Counter[int] = collections.Counter()
+        for char, count in collections.Counter(lowered_input).items():
+            for n in range(1, count + 1):
+                postings = self.postings.get((char, n))
+                if postings is None:
+                    break
+                shared.update(postings)
+
+        # the distance is at least the length of the longer word minus the characters they have in common
+        shared_count = shared.get
+        bounds = [1 - (max(lowered_input_length, lowered_length) - shared_count(index, 0)) / max(input_length, length)
+                  for index, (length, lowered_length) in enumerate(self.lengths)]
+        for index in self.unbounded:
+            bounds[index] = 1
+
+        scored: typing.List[typing.Tuple[float, int]] = []
+        best: typing.List[float] = []  # heap of the highest scores up to limit
+        for index in sorted(range(len(bounds)), key=bounds.__getitem__, reverse=True):
+            if len(best) == limit and bounds[index] < best[0]:
+                break
+            ratio = 1 - distance(lowered_input, self.lowered[index]) / max(input_length, self.lengths[index][0])
+            scored.append((-ratio, index))
+            if len(best) < limit:
+                heapq.heappush(best, ratio)
+            elif ratio > best[0]:
+                heapq.heapreplace(best, ratio)
+
+        # ties keep the order of the word list, same as the stable sort in get_fuzzy_results
+        return [(self.words[index], int(-ratio * 100)) for ratio, index in sorted(scored)[:limit]]
+
+
 def open_filename(title: str, filetypes: typing.Sequence[typing.Tuple[str, typing.Sequence[str]]], suggest: str = "") \
         -> typing.Optional[str]:
     def run(*args: str):
@@ -37,6 +37,8 @@ app.config["SECRET_KEY"] = bytes(socket.gethostname(), encoding="utf-8")
 app.config["JOB_THRESHOLD"] = 1
 # after what time in seconds should generation be aborted, freeing the queue slot. Can be set to None to disable.
 app.config["JOB_TIME"] = 600
+# from what size in bytes should uploads be stored and processed by the generators, instead of in the web-thread
+app.config["UPLOAD_JOB_THRESHOLD"] = 1024 * 1024
 app.config['SESSION_PERMANENT'] = True
 
 # waitress uses one thread for I/O, these are for processing of views that then get sent
@@ -51,6 +53,13 @@ app.config["PONY"] = {
 app.config["MAX_ROLL"] = 20
 app.config["CACHE_TYPE"] = "SimpleCache"
 app.config["HOST_ADDRESS"] = ""
+# rooms measure their packets and keep their metrics in room_metrics/<room id>.json, to find busy rooms
+app.config["ROOM_METRICS"] = False
+# rooms hosted by one process on a shared event loop, 1 to give every room its own process
+app.config["ROOMS_PER_WORKER"] = 1
+# seconds between looking through the database for rooms to start and seeds to generate,
+# the website wakes the schedulers for these right away if they run on the same machine
+app.config["SCHEDULER_INTERVAL"] = 30
 
 cache = Cache()
 Compress(app)
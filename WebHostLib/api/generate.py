@@ -10,6 +10,7 @@ from WebHostLib import app
 from WebHostLib.check import get_yaml_data, roll_options
 from WebHostLib.generate import get_meta
 from WebHostLib.models import Generation, STATE_QUEUED, Seed, STATE_ERROR
+from WebHostLib.wakeup import wake
 from . import api_endpoints
 
 
@@ -61,6 +62,7 @@ def generate_api():
                 meta=json.dumps(meta), state=STATE_QUEUED,
                 owner=session["_id"])
             commit()
+            wake("autogen")
             return {"text": f"Generation of seed {gen.id} started successfully.",
                     "detail": gen.id,
                     "encoded": app.url_map.converters["suuid"].to_url(None, gen.id),
@@ -82,4 +84,7 @@ def wait_seed_api(seed: UUID):
         return {"text": "Generation not found"}, 404
     elif generation.state == STATE_ERROR:
         return {"text": "Generation failed"}, 500
+    progress = json.loads(generation.meta).get("progress", None)
+    if progress:
+        return {"text": "Generation running", "progress": progress}, 202
     return {"text": "Generation running"}, 202
@@ -0,0 +1,82 @@
+"""
+Tracker data as JSON, for tools following a room without scraping the tracker pages.
+Items, locations and games are given by id, their names are in the data package.
+Responses carry the room's save as ETag, so polling with If-None-Match gets a 304 until the room saves again.
+"""
+from typing import Any, Callable, Dict
+from uuid import UUID
+
+from flask import Response, abort, jsonify, request
+
+from NetUtils import Hint
+from . import api_endpoints
+from ..models import Room
+from ..tracker import TrackerData
+
+
+def get_tracker_data(tracker: UUID) -> TrackerData:
+    room = Room.get(tracker=tracker)
+    if not room:
+        abort(404)
+    return TrackerData(room)
+
+
+def conditional_response(tracker_data: TrackerData, get_data: Callable[[], Dict[str, Any]]) -> Response:
+    """Responds with the JSON of get_data, or a 304 if the client already has it for the room's current save."""
+    etag = tracker_data.get_room_save_tag()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(get_data())
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def get_hint_data(hint: Hint) -> Dict[str, Any]:
+    return hint._asdict()
+
+
+def get_player_summary(tracker_data: TrackerData, team: int, player: int) -> Dict[str, Any]:
+    return {
+        "team": team,
+        "player": player,
+        "name": tracker_data.get_player_name(team, player),
+        "alias": tracker_data.get_player_alias(team, player),
+        "game": tracker_data.get_player_game(team, player),
+        "status": tracker_data.get_player_client_status(team, player),
+        "checked": len(tracker_data.get_player_checked_locations(team, player)),
+        "total": len(tracker_data.get_player_locations(team, player)),
+        "last_activity": tracker_data.get_room_activity_timestamps().get((team, player), None),
+    }
+
+
+@api_endpoints.route("/tracker/<suuid:tracker>")
+def get_room_tracker_data(tracker: UUID):
+    """Statuses, progress and activity of every player, with the hints of each team."""
+    tracker_data = get_tracker_data(tracker)
+    return conditional_response(tracker_data, lambda: {
+        "seed_name": tracker_data.get_seed_name(),
+        "teams": [
+            {
+                "team": team,
+                "players": [get_player_summary(tracker_data, team, player) for player in players],
+                "hints": [get_hint_data(hint) for hint in tracker_data.get_team_hints().get(team, ())],
+            } for team, players in tracker_data.get_all_players().items()
+        ],
+    })
+
+
+@api_endpoints.route("/tracker/<suuid:tracker>/<int:team>/<int:player>")
+def get_player_tracker_data(tracker: UUID, team: int, player: int):
+    """Checked and missing locations, received items as [item, location, player, flags] in order and hints."""
+    tracker_data = get_tracker_data(tracker)
+    if player not in tracker_data.get_all_slots().get(team, ()):
+        abort(404)
+    return conditional_response(tracker_data, lambda: {
+        **get_player_summary(tracker_data, team, player),
+        "checked_locations": sorted(tracker_data.get_player_checked_locations(team, player)),
+        "missing_locations": sorted(tracker_data.get_player_missing_locations(team, player)),
+        "received_items": tracker_data.get_player_received_items(team, player),
+        "hints": [get_hint_data(hint) for hint in tracker_data.get_player_hints(team, player)],
+    })
@@ -1,17 +1,22 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import json
 import logging
 import multiprocessing
+import queue
 import threading
 import time
 import typing
 from datetime import timedelta, datetime
+from uuid import UUID
 
 from pony.orm import db_session, select, commit
 
 from Utils import restricted_loads
 from .locker import Locker, AlreadyRunningException
+from .wakeup import WakeupListener, wake
 
 
 def launch_room(room: Room, config: dict):
@@ -38,13 +43,19 @@ def handle_generation_failure(result: BaseException):
 def launch_generator(pool: multiprocessing.pool.Pool, generation: Generation):
     try:
         meta = json.loads(generation.meta)
-        options = restricted_loads(generation.options)
-        logging.info(f"Generating {generation.id} for {len(options)} players")
-        pool.apply_async(gen_game, (options,),
-                         {"meta": meta,
-                          "sid": generation.id,
-                          "owner": generation.owner},
-                         handle_generation_success, handle_generation_failure)
+        if meta.get("upload", False):
+            # the generator reads the upload itself, instead of it being sent through the pool
+            logging.info(f"Processing upload {generation.id}")
+            pool.apply_async(process_queued_upload, (generation.id,), {},
+                             handle_generation_success, handle_generation_failure)
+        else:
+            options = restricted_loads(generation.options)
+            logging.info(f"Generating {generation.id} for {len(options)} players")
+            pool.apply_async(gen_game, (options,),
+                             {"meta": meta,
+                              "sid": generation.id,
+                              "owner": generation.owner},
+                             handle_generation_success, handle_generation_failure)
     except Exception as e:
         generation.state = STATE_ERROR
         commit()
@@ -58,19 +69,84 @@ def init_db(pony_config: dict):
     db.generate_mapping()
 
 
+class RoomScheduler:
+    """
+    Starts rooms when woken for them by the website or the guardian, see wakeup.wake.
+    Rooms it knows to be active are kept in a heap by when they time out, at which point it checks whether
+    they saw activity since and have to keep running, so wake-ups for running rooms don't need the database.
+    All recently active rooms are only looked through every SCHEDULER_INTERVAL seconds, to catch what it missed.
+    """
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.interval: float = config["SCHEDULER_INTERVAL"]
+        self.timeouts: typing.List[typing.Tuple[datetime, UUID]] = []  # heap of when rooms time out
+        self.active: typing.Dict[UUID, datetime] = {}  # room id -> its current entry in timeouts
+        self.next_reconcile = 0.0
+
+    def run(self, listener: WakeupListener):
+        while 1:
+            timeout = max(0.0, self.next_reconcile - time.monotonic())
+            if self.timeouts:
+                timeout = min(timeout, max(0.0, (self.timeouts[0][0] - datetime.utcnow()).total_seconds()))
+            woken = listener.wait(timeout)
+            with db_session:
+                if time.monotonic() >= self.next_reconcile:
+                    self.reconcile()
+                    self.next_reconcile = time.monotonic() + self.interval
+                for room_id in woken:
+                    self.wake(room_id)
+                self.expire()
+
+    def launch(self, room: Room):
+        # requires db_session!
+        launch_room(room, self.config)
+        timeout = room.last_activity + timedelta(seconds=room.timeout)
+        if timeout > datetime.utcnow() and self.active.get(room.id) != timeout:
+            self.active[room.id] = timeout
+            heapq.heappush(self.timeouts, (timeout, room.id))
+
+    def wake(self, room_id: str):
+        try:
+            room_id = UUID(room_id)
+        except ValueError:
+            return
+        multiworld = multiworlds.get(room_id, None)
+        if room_id in self.active and multiworld and not multiworld.done():
+            return  # running and not about to time out, nothing to do
+        room = Room.get(id=room_id)
+        if room:
+            self.launch(room)
+
+    def expire(self):
+        now = datetime.utcnow()
+        while self.timeouts and self.timeouts[0][0] <= now:
+            timeout, room_id = heapq.heappop(self.timeouts)
+            if self.active.get(room_id) != timeout:
+                continue  # the room got a later timeout since
+            del self.active[room_id]
+            room = Room.get(id=room_id)
+            if room:
+                self.launch(room)  # stays active if it saw activity in the meantime
+
+    def reconcile(self):
+        rooms = select(
+            room for room in Room if
+            room.last_activity >= datetime.utcnow() - timedelta(days=3))
+        for room in rooms:
+            self.launch(room)
+
+
 def autohost(config: dict):
     def keep_running():
         try:
             with Locker("autohost"):
                 run_guardian()
-                while 1:
-                    time.sleep(0.1)
-                    with db_session:
-                        rooms = select(
-                            room for room in Room if
-                            room.last_activity >= datetime.utcnow() - timedelta(days=3))
-                        for room in rooms:
-                            launch_room(room, config)
+                listener = WakeupListener("autohost")
+                try:
+                    RoomScheduler(config).run(listener)
+                finally:
+                    listener.close()
 
         except AlreadyRunningException:
             logging.info("Autohost reports as already running, not starting another.")
@@ -101,15 +177,21 @@ def autogen(config: dict):
                             commit()
                         select(generation for generation in Generation if generation.state == STATE_ERROR).delete()
 
-                    while 1:
-                        time.sleep(0.1)
-                        with db_session:
-                            # for update locks the database row(s) during transaction, preventing writes from elsewhere
-                            to_start = select(
-                                generation for generation in Generation
-                                if generation.state == STATE_QUEUED).for_update()
-                            for generation in to_start:
-                                launch_generator(generator_pool, generation)
+                    listener = WakeupListener("autogen")
+                    try:
+                        while 1:
+                            with db_session:
+                                # for update locks the database row(s) during transaction,
+                                # preventing writes from elsewhere
+                                to_start = select(
+                                    generation for generation in Generation
+                                    if generation.state == STATE_QUEUED).for_update()
+                                for generation in to_start:
+                                    launch_generator(generator_pool, generation)
+                            # woken when a generation is queued, looking anyway every now and then in case it was not
+                            listener.wait(config["SCHEDULER_INTERVAL"])
+                    finally:
+                        listener.close()
         except AlreadyRunningException:
             logging.info("Autogen reports as already running, not starting another.")
 
@@ -118,27 +200,94 @@ def autogen(config: dict):
 
 
 multiworlds: typing.Dict[type(Room.id), MultiworldInstance] = {}
+room_workers: typing.List[RoomWorkerProcess] = []
+
+
+class RoomWorkerProcess:
+    """A process hosting many rooms, see customserver.RoomWorker."""
+
+    def __init__(self, config: dict):
+        self.inbox = multiprocessing.Queue()
+        self.outbox = multiprocessing.Queue()
+        self.rooms: typing.Set[type(Room.id)] = set()
+        self.done_rooms: typing.Set[type(Room.id)] = set()
+        self.load = 0  # rooms and their clients, as last reported
+        self.worker_id = next(worker_ids)
+        self.process = multiprocessing.Process(group=None, target=run_room_worker,
+                                               args=(self.worker_id, self.inbox, self.outbox, config["PONY"],
+                                                     get_static_server_data(), config["SELFLAUNCHCERT"],
+                                                     config["SELFLAUNCHKEY"], config["HOST_ADDRESS"],
+                                                     config["SECRET_KEY"], config["ROOM_METRICS"]),
+                                               name="RoomWorker")
+        self.process.start()
+
+    def start_room(self, room_id: type(Room.id)):
+        self.rooms.add(room_id)
+        self.load += 1  # until the worker reports again, so that rooms starting at once spread over workers
+        self.inbox.put(("start", room_id))
+
+    def stop_room(self, room_id: type(Room.id)):
+        self.inbox.put(("stop", room_id))
+
+    def update(self):
+        """Takes in what the worker reported since the last update."""
+        while True:
+            try:
+                action, value = self.outbox.get_nowait()
+            except queue.Empty:
+                return
+            if action == "done":
+                self.done_rooms.add(value)
+            elif action == "load":
+                self.load = value
+
+    def close(self):
+        """Lets the worker exit once its rooms shut down."""
+        self.inbox.put(None)
+
+
+def get_room_worker(config: dict) -> RoomWorkerProcess:
+    """Least loaded worker with space for another room, a new one if all are full. Requires guardian_lock."""
+    workers = [worker for worker in room_workers
+               if worker.process.is_alive() and len(worker.rooms) < config["ROOMS_PER_WORKER"]]
+    if workers:
+        return min(workers, key=lambda worker: worker.load)
+    worker = RoomWorkerProcess(config)
+    room_workers.append(worker)
+    return worker
 
 
 class MultiworldInstance():
     def __init__(self, room: Room, config: dict):
         self.room_id = room.id
         self.process: typing.Optional[multiprocessing.Process] = None
+        self.worker: typing.Optional[RoomWorkerProcess] = None
         with guardian_lock:
             multiworlds[self.room_id] = self
+        self.config = config
         self.ponyconfig = config["PONY"]
         self.cert = config["SELFLAUNCHCERT"]
         self.key = config["SELFLAUNCHKEY"]
         self.host = config["HOST_ADDRESS"]
+        self.command_key = config["SECRET_KEY"]
+        self.metrics = config["ROOM_METRICS"]
 
     def start(self):
-        if self.process and self.process.is_alive():
+        if self.process and self.process.is_alive() or self.worker:
             return False
 
+        if self.config["ROOMS_PER_WORKER"] > 1:
+            with guardian_lock:
+                self.worker = get_room_worker(self.config)
+                logging.info(f"Spinning up {self.room_id} in room worker {self.worker.worker_id}")
+                self.worker.start_room(self.room_id)
+            return
+
         logging.info(f"Spinning up {self.room_id}")
         process = multiprocessing.Process(group=None, target=run_server_process,
                                           args=(self.room_id, self.ponyconfig, get_static_server_data(),
-                                                self.cert, self.key, self.host),
+                                                self.cert, self.key, self.host, self.command_key,
+                                                self.metrics),
                                           name="MultiHost")
         process.start()
         # bind after start to prevent thread sync issues with guardian.
@@ -148,17 +297,29 @@ class MultiworldInstance():
         if self.process:
             self.process.terminate()
             self.process = None
+            unregister(self.room_id)
+        elif self.worker:
+            self.worker.stop_room(self.room_id)
 
     def done(self):
+        if self.worker:
+            return self.room_id in self.worker.done_rooms or not self.worker.process.is_alive()
         return self.process and not self.process.is_alive()
 
     def collect(self):
-        self.process.join()  # wait for process to finish
-        self.process = None
+        if self.worker:
+            self.worker.rooms.discard(self.room_id)
+            self.worker.done_rooms.discard(self.room_id)
+            self.worker = None
+        else:
+            self.process.join()  # wait for process to finish
+            self.process = None
+        unregister(self.room_id)
 
 
 guardian = None
 guardian_lock = threading.Lock()
+worker_ids = itertools.count(1)
 
 
 def run_guardian():
@@ -181,16 +342,30 @@ def run_guardian():
                     time.sleep(1)
                     done = []
                     with guardian_lock:
+                        for worker in room_workers[:]:
+                            worker.update()
+                            if not worker.process.is_alive():
+                                logging.error(f"Room worker {worker.worker_id} died, its rooms will start again.")
+                                room_workers.remove(worker)
                         for key, instance in multiworlds.items():
                             if instance.done():
                                 instance.collect()
                                 done.append(key)
                         for key in done:
                             del (multiworlds[key])
+                        for worker in room_workers[:]:
+                            if not worker.rooms:
+                                worker.close()
+                                room_workers.remove(worker)
+                    for key in done:
+                        wake("autohost", str(key))  # to start it again, should it have stopped before its time
 
             guardian = threading.Thread(name="Guardian", target=guard)
+            guardian.start()
 
 
 from .models import Room, Generation, STATE_QUEUED, STATE_STARTED, STATE_ERROR, db, Seed
-from .customserver import run_server_process, get_static_server_data
+from .customserver import run_room_worker, run_server_process, get_static_server_data
+from .roomcommands import unregister
 from .generate import gen_game
+from .upload import process_queued_upload
@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import asyncio
 import collections
+import contextvars
 import datetime
 import functools
 import logging
+import multiprocessing
+import os
 import pickle
 import random
 import socket
@@ -18,10 +21,15 @@ from pony.orm import commit, db_session, select
 
 import Utils
 
-from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, load_server_cert
+from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, \
+    load_server_cert, apply_save_journal
+from NetUtils import DataPackageStore
 from Utils import restricted_loads, cache_argsless
-from .locker import Locker
-from .models import Command, GameDataPackage, Room, db
+from .locker import AlreadyRunningException, Locker
+from .models import Command, GameDataPackage, Room, SaveJournal, db
+from .roomcommands import CommandListener
+
+metrics_folder = Utils.user_path("room_metrics")
 
 
 class CustomClientMessageProcessor(ClientMessageProcessor):
@@ -33,11 +41,13 @@ class CustomClientMessageProcessor(ClientMessageProcessor):
         """
         if platform.lower().startswith("t"):  # twitch
             self.ctx.video[self.client.team, self.client.slot] = "Twitch", user
+            self.ctx.journal("video", (self.client.team, self.client.slot), ("Twitch", user))
             self.ctx.save()
             self.output(f"Registered Twitch Stream https://www.twitch.tv/{user}")
             return True
         elif platform.lower().startswith("y"):  # youtube
             self.ctx.video[self.client.team, self.client.slot] = "Youtube", user
+            self.ctx.journal("video", (self.client.team, self.client.slot), ("Youtube", user))
             self.ctx.save()
             self.output(f"Registered Youtube Stream for {user}")
             return True
@@ -56,36 +66,118 @@ class DBCommandProcessor(ServerCommandProcessor):
         logging.info(text)
 
 
+class UnknownNames(collections.ChainMap):
+    """Names of the room's embedded data packages in front of the shared ones, unknown IDs resolve to a placeholder."""
+
+    def __init__(self, placeholder: str, *maps: typing.Mapping[int, str]):
+        super().__init__(*maps)
+        self.placeholder = placeholder
+
+    def __missing__(self, key: int) -> str:
+        return self.placeholder.format(key)
+
+
+class GameNames(dict):
+    """Item or location names and their group names by game, only built for games someone asks for."""
+
+    def __init__(self, ctx: WebHostContext, names_key: str, groups: typing.Mapping[str, typing.Dict[str, typing.Any]]):
+        super().__init__()
+        self.ctx = ctx
+        self.names_key = names_key
+        self.groups = groups
+
+    def __contains__(self, game: object) -> bool:
+        return game in self.ctx.gamespackage
+
+    def __missing__(self, game: str) -> typing.Set[str]:
+        names = self[game] = set(self.ctx.gamespackage[game][self.names_key]) | set(self.groups.get(game, ()))
+        return names
+
+
 class WebHostContext(Context):
     room_id: int
+    data_package_store: DataPackageStore
 
     def __init__(self, static_server_data: dict):
         # static server data is used during _load_game_data to load required data,
         # without needing to import worlds system, which takes quite a bit of memory
         self.static_server_data = static_server_data
-        super(WebHostContext, self).__init__("", 0, "", "", 1, 40, True, "enabled", "enabled", "enabled", 0, 2)
+        super(WebHostContext, self).__init__("", 0, "", "", 1, 40, True, "enabled", "enabled", "enabled", 0, 2,
+                                             journal_saves=True)
         del self.static_server_data
         self.main_loop = asyncio.get_running_loop()
+        self.main_context = contextvars.copy_context()  # commands from other threads run in it, see RoomWorker
         self.video = {}
         self.tags = ["AP", "WebHost"]
+        self.command_processor = DBCommandProcessor(self)
+        self.command_listener: typing.Optional[CommandListener] = None
+        self.save_lock = threading.Lock()
+        self.saves_closed = False  # see close_saves
 
     def _load_game_data(self):
-        for key, value in self.static_server_data.items():
-            setattr(self, key, value)
-        self.non_hintable_names = collections.defaultdict(frozenset, self.non_hintable_names)
+        # data packages of all installed games are shared with the other rooms through a memory mapped file,
+        # embedded data packages of this room are layered on top of it in _init_game_data
+        self.data_package_store = store = get_data_package_store(self.static_server_data["data_package"])
+        self.gamespackage = collections.ChainMap({}, store.games)
+        self.item_name_groups = collections.ChainMap({}, store.item_name_groups)
+        self.location_name_groups = collections.ChainMap({}, store.location_name_groups)
+        self.checksums = dict(store.checksums)
+        self.non_hintable_names = collections.defaultdict(frozenset, self.static_server_data["non_hintable_names"])
+
+    def _init_game_data(self):
+        store = self.data_package_store
+        item_names = {}
+        location_names = {}
+        for game_name, game_package in self.gamespackage.maps[0].items():
+            if "checksum" in game_package:
+                self.checksums[game_name] = game_package["checksum"]
+            else:
+                self.checksums.pop(game_name, None)
+            item_names.update((item_id, name) for name, item_id in game_package["item_name_to_id"].items())
+            location_names.update((location_id, name) for name, location_id
+                                  in game_package["location_name_to_id"].items())
+        self.item_names = UnknownNames("Unknown item (ID:{})", item_names, store.item_names)
+        self.location_names = UnknownNames("Unknown location (ID:{})", location_names, store.location_names)
+        self.all_item_and_group_names = GameNames(self, "item_name_to_id", self.item_name_groups)
+        self.all_location_and_group_names = GameNames(self, "location_name_to_id", self.location_name_groups)
+
+    def run_command(self, commandtext: str):
+        """Thread-safe way to run a command sent from the website."""
+        self.main_loop.call_soon_threadsafe(self.command_processor, commandtext, context=self.main_context)
+
+    def listen_for_commands(self, key: typing.Union[bytes, str]):
+        self.command_listener = CommandListener(self.room_id, key, self.run_command)
+
+    async def write_metrics_regularly(self, interval: float = 60):
+        """Keeps the metrics of this room in room_metrics/<room id>.json, where operators can compare rooms."""
+        import json
+        import os
+        metrics_file = os.path.join(metrics_folder, f"{self.room_id}.json")
+
+        def write(data: str):
+            os.makedirs(metrics_folder, exist_ok=True)
+            with open(metrics_file + ".tmp", "w") as f:
+                f.write(data)
+            os.replace(metrics_file + ".tmp", metrics_file)
+
+        loop = asyncio.get_running_loop()
+        while not self.exit_event.is_set():
+            await asyncio.sleep(interval)
+            if self.metrics:
+                # the file is written by a thread to not hold up the room's clients
+                await loop.run_in_executor(None, write, json.dumps(self.metrics.as_dict()))
 
     def listen_to_db_commands(self):
-        cmdprocessor = DBCommandProcessor(self)
-
         while not self.exit_event.is_set():
             with db_session:
                 commands = select(command for command in Command if command.room.id == self.room_id)
                 if commands:
                     for command in commands:
-                        self.main_loop.call_soon_threadsafe(cmdprocessor, command.commandtext)
+                        self.run_command(command.commandtext)
                         command.delete()
                     commit()
-            time.sleep(5)
+            # commands normally arrive through the listener, the database only catches those that could not be pushed
+            time.sleep(30 if self.command_listener else 5)
 
     @db_session
     def load(self, room_id: int):
@@ -96,12 +188,12 @@ class WebHostContext(Context):
         else:
             self.port = get_random_port()
 
-        multidata = self.decompress(room.seed.multidata)
+        multidata = self.decompress(room.seed.multidata, set(self.checksums.values()))
         game_data_packages = {}
         for game in list(multidata.get("datapackage", {})):
             game_data = multidata["datapackage"][game]
             if "checksum" in game_data:
-                if self.gamespackage.get(game, {}).get("checksum") == game_data["checksum"]:
+                if self.checksums.get(game) == game_data["checksum"]:
                     # non-custom. remove from multidata
                     # games package could be dropped from static data once all rooms embed data package
                     del multidata["datapackage"][game]
@@ -116,27 +208,62 @@ class WebHostContext(Context):
     def init_save(self, enabled: bool = True):
         self.saving = enabled
         if self.saving:
-            savegame_data = Room.get(id=self.room_id).multisave
-            if savegame_data:
-                self.set_save(restricted_loads(Room.get(id=self.room_id).multisave))
+            room = Room.get(id=self.room_id)
+            if room.multisave:
+                self.set_save(apply_save_journal(restricted_loads(room.multisave),
+                                                 [entry.data for entry in room.save_journal.order_by(SaveJournal.id)]))
             self._start_async_saving()
-        threading.Thread(target=self.listen_to_db_commands, daemon=True).start()
 
-    @db_session
     def _save(self, exit_save: bool = False) -> bool:
+        with self.save_lock:
+            if self.saves_closed:
+                return False
+            return self._save_room(exit_save)
+
+    def close_saves(self):
+        """Saves one last time, as the room shut down. Later saves, like one the auto saver still had due,
+        are dropped, as they would mark the room as active again and it may be hosted elsewhere by then."""
+        with self.save_lock:
+            self.save_dirty = False
+            try:
+                if self.saving:
+                    self._save_room(True)
+            finally:
+                self.saves_closed = True
+
+    @db_session
+    def _save_room(self, exit_save: bool) -> bool:
         room = Room.get(id=self.room_id)
-        room.multisave = pickle.dumps(self.get_save())
+        if self.journal_saves:
+            self._save_journal()
+        else:
+            room.multisave = pickle.dumps(self.get_save())
         # saving only occurs on activity, so we can "abuse" this information to mark this as last_activity
         if not exit_save:  # we don't want to count a shutdown as activity, which would restart the server again
             room.last_activity = datetime.datetime.utcnow()
         return True
 
+    def _write_save_snapshot(self, save: dict) -> int:
+        room = Room.get(id=self.room_id)
+        room.multisave = data = pickle.dumps(save)
+        room.save_journal.select().delete(bulk=True)
+        return len(data)
+
+    def _append_save_journal(self, frame: bytes):
+        SaveJournal(room=Room.get(id=self.room_id), data=frame)
+
     def get_save(self) -> dict:
         d = super(WebHostContext, self).get_save()
         d["video"] = [(tuple(playerslot), videodata) for playerslot, videodata in self.video.items()]
         return d
 
 
+@functools.lru_cache(maxsize=None)
+def get_data_package_store(path: str) -> DataPackageStore:
+    """Rooms hosted by the same process share one store, so each game is only unpacked once."""
+    return DataPackageStore(path)
+
+
 def get_random_port():
     return random.randint(49152, 65535)
 
@@ -146,11 +273,7 @@ def get_static_server_data() -> dict:
     import worlds
     data = {
         "non_hintable_names": {},
-        "gamespackage": worlds.network_data_package["games"],
-        "item_name_groups": {world_name: world.item_name_groups for world_name, world in
-                             worlds.AutoWorldRegister.world_types.items()},
-        "location_name_groups": {world_name: world.location_name_groups for world_name, world in
-                                 worlds.AutoWorldRegister.world_types.items()},
+        "data_package": DataPackageStore.write(Utils.cache_path("datapackage"), worlds.network_data_package["games"]),
     }
 
     for world_name, world in worlds.AutoWorldRegister.world_types.items():
@@ -159,9 +282,87 @@ def get_static_server_data() -> dict:
     return data
 
 
+async def start_room(room_id, static_server_data: dict, cert_file: typing.Optional[str],
+                     cert_key_file: typing.Optional[str], host: str, command_key: typing.Union[bytes, str, None] = None,
+                     metrics: bool = False, poll_commands: bool = True) -> WebHostContext:
+    """Loads the room and starts serving it, see finish_room to wait for it to shut down.
+    poll_commands starts a thread checking the database for commands to this room."""
+    ctx = WebHostContext(static_server_data)
+
+    def load():
+        ctx.load(room_id)
+        if command_key:
+            ctx.listen_for_commands(command_key)
+        ctx.init_save()
+
+    # unpacking multidata and save takes a while, other rooms sharing the loop keep running meanwhile
+    await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run, load)
+    if poll_commands:
+        threading.Thread(target=ctx.listen_to_db_commands, daemon=True).start()
+    ssl_context = load_server_cert(cert_file, cert_key_file) if cert_file else None
+    try:
+        ctx.server = websockets.serve(functools.partial(server, ctx=ctx), ctx.host, ctx.port, ssl=ssl_context)
+
+        await ctx.server
+    except OSError:  # likely port in use
+        ctx.server = websockets.serve(functools.partial(server, ctx=ctx), ctx.host, 0, ssl=ssl_context)
+
+        await ctx.server
+    port = 0
+    for wssocket in ctx.server.ws_server.sockets:
+        socketname = wssocket.getsockname()
+        if wssocket.family == socket.AF_INET6:
+            # Prefer IPv4, as most users seem to not have working ipv6 support
+            if not port:
+                port = socketname[1]
+        elif wssocket.family == socket.AF_INET:
+            port = socketname[1]
+    if port:
+        logging.info(f'Hosting game at {host}:{port}')
+        with db_session:
+            room = Room.get(id=ctx.room_id)
+            room.last_port = port
+    else:
+        logging.exception("Could not determine port. Likely hosting failure.")
+    if metrics:
+        ctx.enable_metrics()
+        Utils.async_start(ctx.write_metrics_regularly(), name="write metrics")
+    with db_session:
+        ctx.auto_shutdown = Room.get(id=room_id).timeout
+    ctx.shutdown_task = asyncio.create_task(auto_shutdown(ctx, []))
+    return ctx
+
+
+async def finish_room(ctx: WebHostContext):
+    """Waits until the room shuts down, by inactivity or command."""
+    try:
+        # unlike awaiting the task, waiting for it does not raise once /exit cancelled it
+        await asyncio.wait((ctx.shutdown_task,))
+    finally:
+        if ctx.command_listener:
+            ctx.command_listener.close()
+
+    # ensure auto launch is on the same page in regard to room activity.
+    with db_session:
+        room: Room = Room.get(id=ctx.room_id)
+        room.last_activity = datetime.datetime.utcnow() - datetime.timedelta(seconds=room.timeout + 60)
+
+    logging.info("Shutting down")
+
+
+@db_session
+def stop_room(room_id, crashed: bool = False):
+    """Ensures the Room does not spin up again on its own, with a minute of safety buffer,
+    crashed rooms are also marked as such for the room page."""
+    room = Room.get(id=room_id)
+    if crashed:
+        room.last_port = -1
+    room.last_activity = datetime.datetime.utcnow() - datetime.timedelta(minutes=1, seconds=room.timeout)
+
+
 def run_server_process(room_id, ponyconfig: dict, static_server_data: dict,
                        cert_file: typing.Optional[str], cert_key_file: typing.Optional[str],
-                       host: str):
+                       host: str, command_key: typing.Union[bytes, str, None] = None, metrics: bool = False):
     # establish DB connection for multidata and multisave
     db.bind(**ponyconfig)
     db.generate_mapping(check_tables=False)
@@ -172,59 +373,171 @@ def run_server_process(room_id, ponyconfig: dict, static_server_data: dict,
 
         import gc
         Utils.init_logging(str(room_id), write_mode="a")
-        ctx = WebHostContext(static_server_data)
-        ctx.load(room_id)
-        ctx.init_save()
-        ssl_context = load_server_cert(cert_file, cert_key_file) if cert_file else None
+        ctx = await start_room(room_id, static_server_data, cert_file, cert_key_file, host, command_key, metrics)
         gc.collect()  # free intermediate objects used during setup
-        try:
-            ctx.server = websockets.serve(functools.partial(server, ctx=ctx), ctx.host, ctx.port, ssl=ssl_context)
-
-            await ctx.server
-        except OSError:  # likely port in use
-            ctx.server = websockets.serve(functools.partial(server, ctx=ctx), ctx.host, 0, ssl=ssl_context)
-
-            await ctx.server
-        port = 0
-        for wssocket in ctx.server.ws_server.sockets:
-            socketname = wssocket.getsockname()
-            if wssocket.family == socket.AF_INET6:
-                # Prefer IPv4, as most users seem to not have working ipv6 support
-                if not port:
-                    port = socketname[1]
-            elif wssocket.family == socket.AF_INET:
-                port = socketname[1]
-        if port:
-            logging.info(f'Hosting game at {host}:{port}')
-            with db_session:
-                room = Room.get(id=ctx.room_id)
-                room.last_port = port
-        else:
-            logging.exception("Could not determine port. Likely hosting failure.")
-        with db_session:
-            ctx.auto_shutdown = Room.get(id=room_id).timeout
-        ctx.shutdown_task = asyncio.create_task(auto_shutdown(ctx, []))
-        await ctx.shutdown_task
-
-        # ensure auto launch is on the same page in regard to room activity.
-        with db_session:
-            room: Room = Room.get(id=ctx.room_id)
-            room.last_activity = datetime.datetime.utcnow() - datetime.timedelta(seconds=room.timeout + 60)
-
-        logging.info("Shutting down")
+        await finish_room(ctx)
 
     with Locker(room_id):
         try:
             asyncio.run(main())
         except (KeyboardInterrupt, SystemExit):
-            with db_session:
-                room = Room.get(id=room_id)
-                # ensure the Room does not spin up again on its own, minute of safety buffer
-                room.last_activity = datetime.datetime.utcnow() - datetime.timedelta(minutes=1, seconds=room.timeout)
+            stop_room(room_id)
         except Exception:
-            with db_session:
-                room = Room.get(id=room_id)
-                room.last_port = -1
-                # ensure the Room does not spin up again on its own, minute of safety buffer
-                room.last_activity = datetime.datetime.utcnow() - datetime.timedelta(minutes=1, seconds=room.timeout)
+            stop_room(room_id, crashed=True)
             raise
+
+
+current_room: contextvars.ContextVar[typing.Any] = contextvars.ContextVar("current_room", default=None)
+
+
+class RoomLogHandler(logging.FileHandler):
+    """Writes what the tasks of one room log into the log file that room would have on its own."""
+
+    def __init__(self, room_id):
+        super().__init__(os.path.join(Utils.user_path("logs"), f"{room_id}.txt"), "a", encoding="utf-8-sig",
+                         delay=True)
+        self.room_id = room_id
+        self.setFormatter(logging.Formatter("[%(name)s at %(asctime)s]: %(message)s"))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return current_room.get() == self.room_id and super().filter(record)
+
+
+class RoomWorker:
+    """Hosts many rooms on one event loop, each in its own task, started and stopped through the inbox.
+    Reports ("done", room id) once a room shut down and ("load", load) every few seconds to the outbox."""
+    load_interval = 5
+
+    def __init__(self, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue, static_server_data: dict,
+                 cert_file: typing.Optional[str], cert_key_file: typing.Optional[str], host: str,
+                 command_key: typing.Union[bytes, str, None] = None, metrics: bool = False):
+        self.inbox = inbox
+        self.outbox = outbox
+        self.room_args = static_server_data, cert_file, cert_key_file, host, command_key, metrics
+        self.rooms: typing.Dict[typing.Any, typing.Optional[WebHostContext]] = {}  # None while starting
+        self.loop: typing.Optional[asyncio.AbstractEventLoop] = None
+        self.exit_event = asyncio.Event()
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        threading.Thread(target=self.read_inbox, name="Inbox", daemon=True).start()
+        threading.Thread(target=self.listen_to_db_commands, name="Commands", daemon=True).start()
+        while not self.exit_event.is_set():
+            self.outbox.put(("load", self.get_load()))
+            try:
+                await asyncio.wait_for(self.exit_event.wait(), self.load_interval)
+            except asyncio.TimeoutError:
+                pass
+        # asked to close, so let running rooms finish before leaving
+        while self.rooms:
+            await asyncio.sleep(1)
+
+    def get_load(self) -> int:
+        """Rooms and their connected clients."""
+        return sum(1 + (len(ctx.endpoints) if ctx else 0) for ctx in self.rooms.values())
+
+    def read_inbox(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                self.loop.call_soon_threadsafe(self.exit_event.set)
+                return
+            action, room_id = message
+            if action == "start":
+                self.loop.call_soon_threadsafe(self.start_room, room_id)
+            elif action == "stop":
+                self.loop.call_soon_threadsafe(self.stop_room, room_id)
+
+    def start_room(self, room_id):
+        if room_id in self.rooms:
+            return
+        self.rooms[room_id] = None
+        # the task copies the current context, so the room's value of current_room stays within its tasks
+        self.loop.create_task(self.host_room(room_id), name=f"Room {room_id}")
+
+    def stop_room(self, room_id):
+        ctx = self.rooms.get(room_id)
+        if ctx:
+            ctx.command_processor("/exit")
+
+    async def host_room(self, room_id):
+        current_room.set(room_id)
+        handler = RoomLogHandler(room_id)
+        logging.getLogger().addHandler(handler)
+        try:
+            with Locker(room_id):
+                ctx = None
+                try:
+                    ctx = self.rooms[room_id] = await start_room(room_id, *self.room_args, poll_commands=False)
+                    await finish_room(ctx)
+                except Exception as e:
+                    # only this room goes down, other rooms of the worker keep running
+                    logging.exception(e)
+                    stop_room(room_id, crashed=True)
+                finally:
+                    if ctx:
+                        ctx.exit_event.set()  # ends the room's auto saver
+                        await self.loop.run_in_executor(None, contextvars.copy_context().run, self.save_room, ctx)
+        except AlreadyRunningException:
+            logging.error(f"Room {room_id} is already running elsewhere.")
+        except Exception as e:
+            logging.exception(e)
+        finally:
+            del self.rooms[room_id]
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+            self.outbox.put(("done", room_id))
+
+    @staticmethod
+    def save_room(ctx: WebHostContext):
+        """Saves once more, as a room process would on exit,
+        which must not happen again at exit of this worker as the room may be hosted elsewhere by then."""
+        import atexit
+        atexit.unregister(ctx._save)
+        ctx.close_saves()
+
+    def stop_all_rooms(self):
+        for room_id in list(self.rooms):
+            stop_room(room_id)
+
+    def listen_to_db_commands(self):
+        """One thread checking the database for commands to all rooms of this worker,
+        instead of WebHostContext.listen_to_db_commands for each of them."""
+        while not self.exit_event.is_set():
+            rooms = {room_id: ctx for room_id, ctx in list(self.rooms.items()) if ctx}
+            if rooms:
+                room_ids = list(rooms)
+                with db_session:
+                    commands = select(command for command in Command if command.room.id in room_ids)
+                    if commands:
+                        for command in commands:
+                            rooms[command.room.id].run_command(command.commandtext)
+                            command.delete()
+                        commit()
+            # commands normally arrive through the listener, the database only catches those that could not be pushed
+            time.sleep(30 if all(ctx.command_listener for ctx in rooms.values()) else 5)
+
+
+def run_room_worker(worker_id: int, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue,
+                    ponyconfig: dict, static_server_data: dict,
+                    cert_file: typing.Optional[str], cert_key_file: typing.Optional[str],
+                    host: str, command_key: typing.Union[bytes, str, None] = None, metrics: bool = False):
+    """Runs a RoomWorker, rooms log to their own files in addition to the worker's log."""
+    db.bind(**ponyconfig)
+    db.generate_mapping(check_tables=False)
+    worker: typing.Optional[RoomWorker] = None
+
+    async def main():
+        nonlocal worker
+        if "worlds" in sys.modules:
+            raise Exception("Worlds system should not be loaded in the custom server.")
+
+        Utils.init_logging(f"RoomWorker{worker_id}", write_mode="a")
+        worker = RoomWorker(inbox, outbox, static_server_data, cert_file, cert_key_file, host, command_key, metrics)
+        await worker.run()
+
+    try:
+        asyncio.run(main())
+    except (KeyboardInterrupt, SystemExit):
+        if worker:
+            worker.stop_all_rooms()
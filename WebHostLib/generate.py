@@ -20,6 +20,7 @@ from worlds.alttp.EntranceRandomizer import parse_arguments
 from .check import get_yaml_data, roll_options
 from .models import Generation, STATE_ERROR, STATE_QUEUED, Seed, UUID
 from .upload import upload_zip_to_db
+from .wakeup import wake
 
 
 def get_meta(options_source: dict, race: bool = False) -> Dict[str, Union[List[str], Dict[str, Any]]]:
@@ -85,6 +86,7 @@ def generate(race=False):
                         state=STATE_QUEUED,
                         owner=session["_id"])
                     commit()
+                    wake("autogen")
 
                     return redirect(url_for("wait_seed", seed=gen.id))
                 else:
@@ -192,7 +194,9 @@ def wait_seed(seed: UUID):
         return "Generation not found."
     elif generation.state == STATE_ERROR:
         return render_template("seedError.html", seed_error=generation.meta)
-    return render_template("waitSeed.html", seed_id=seed_id)
+    meta = json.loads(generation.meta)
+    return render_template("waitSeed.html", seed_id=seed_id, upload=meta.get("upload", False),
+                           progress=meta.get("progress", None))
 
 
 def upload_to_db(folder, sid, owner, race):
@@ -202,7 +206,7 @@ def upload_to_db(folder, sid, owner, race):
             with db_session:
                 with zipfile.ZipFile(file) as zfile:
                     res = upload_zip_to_db(zfile, owner, {"race": race}, sid)
-                if type(res) == "str":
+                if isinstance(res, str):
                     raise Exception(res)
                 elif res:
                     seed = res
@@ -9,6 +9,8 @@ from pony.orm import count, commit, db_session
 from worlds.AutoWorld import AutoWorldRegister
 from . import app, cache
 from .models import Seed, Room, Command, UUID, uuid4
+from .roomcommands import push_command
+from .wakeup import wake
 
 
 def get_world_theme(game_name: str):
@@ -153,7 +155,8 @@ def host_room(room: UUID):
     if request.method == "POST":
         if room.owner == session["_id"]:
             cmd = request.form["cmd"]
-            if cmd:
+            # hand the command straight to the room's process, or leave it in the database for the room to pick up
+            if cmd and not push_command(room.id, cmd, app.config["SECRET_KEY"]):
                 Command(room=room, commandtext=cmd)
                 commit()
 
@@ -162,6 +165,8 @@ def host_room(room: UUID):
     should_refresh = not room.last_port and now - room.creation_time < datetime.timedelta(seconds=3)
     with db_session:
         room.last_activity = now  # will trigger a spinup, if it's not already running
+    commit()  # before waking the autohost, so it sees the activity
+    wake("autohost", str(room.id))
 
     return render_template("hostRoom.html", room=room, should_refresh=should_refresh)
 
@@ -0,0 +1,116 @@
+"""
+Delivers commands from the website straight to the process hosting a room.
+A room process listens on a local port and writes that port into a file named after the room,
+where any website process on the same machine can find it.
+Each connection carries one command, signed for a challenge the room sent on that connection, so it can't be replayed.
+If a command can't be delivered this way, the website stores it in the database, which rooms still check occasionally.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import typing
+
+import Utils
+
+registry_folder = Utils.user_path("room_commands")
+message_limit = 4096  # bytes, longer commands are left to the database
+
+
+def get_registry_file(room_id: typing.Any) -> str:
+    return os.path.join(registry_folder, f"{room_id}.port")
+
+
+def get_room_key(key: typing.Union[bytes, str], room_id: typing.Any) -> str:
+    """Proof of knowing the server's secret key, bound to one room."""
+    if isinstance(key, str):
+        key = key.encode()
+    return hmac.new(key, str(room_id).encode(), hashlib.sha256).hexdigest()
+
+
+def sign_command(room_key: str, challenge: str, command: str) -> str:
+    return hmac.new(room_key.encode(), f"{challenge}\n{command}".encode(), hashlib.sha256).hexdigest()
+
+
+class CommandListener:
+    """Receives commands for one room on a local port, until closed."""
+
+    def __init__(self, room_id: typing.Any, key: typing.Union[bytes, str], on_command: typing.Callable[[str], None]):
+        self.room_id = room_id
+        self.room_key = get_room_key(key, room_id)
+        self.on_command = on_command
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.thread = threading.Thread(target=self._listen, name=f"Commands {room_id}", daemon=True)
+        self.thread.start()
+
+        os.makedirs(registry_folder, exist_ok=True)
+        registry_file = get_registry_file(room_id)
+        with open(registry_file + ".tmp", "w") as f:
+            f.write(str(self.socket.getsockname()[1]))
+        os.replace(registry_file + ".tmp", registry_file)
+
+    def _listen(self):
+        while True:
+            try:
+                connection, _ = self.socket.accept()
+            except OSError:  # closed
+                return
+            try:
+                with connection, connection.makefile("rwb") as stream:
+                    connection.settimeout(1)
+                    challenge = secrets.token_hex(16)
+                    stream.write(challenge.encode() + b"\n")
+                    stream.flush()
+                    command = self._read_command(stream, challenge)
+                    stream.write(b"0\n" if command is None else b"1\n")
+                    stream.flush()
+                if command is not None:
+                    self.on_command(command)
+            except Exception as e:
+                logging.exception(e)
+
+    def _read_command(self, stream: typing.BinaryIO, challenge: str) -> typing.Optional[str]:
+        """Reads one message, returns its command if it was sent to this room and signed for challenge."""
+        line = stream.readline(message_limit + 1)
+        if len(line) > message_limit or not line.endswith(b"\n"):
+            return None  # too long or cut off, not read any further
+        message = json.loads(line)
+        if not isinstance(message, dict) or message.get("room") != str(self.room_id):
+            return None
+        command, signature = message.get("command"), message.get("signature")
+        if type(command) is not str or type(signature) is not str:
+            return None
+        expected = sign_command(self.room_key, challenge, command)
+        return command if hmac.compare_digest(signature.encode(), expected.encode()) else None
+
+    def close(self):
+        unregister(self.room_id)
+        self.socket.close()
+
+
+def unregister(room_id: typing.Any):
+    try:
+        os.remove(get_registry_file(room_id))
+    except FileNotFoundError:
+        pass
+
+
+def push_command(room_id: typing.Any, command: str, key: typing.Union[bytes, str], timeout: float = 1) -> bool:
+    """Hands command to the process hosting room_id, returns False if that process could not be reached."""
+    try:
+        with open(get_registry_file(room_id)) as f:
+            port = int(f.read())
+        with socket.create_connection(("127.0.0.1", port), timeout=timeout) as connection, \
+                connection.makefile("rwb") as stream:
+            challenge = stream.readline(64).decode().rstrip("\n")
+            stream.write(json.dumps({"room": str(room_id), "command": command,
+                                     "signature": sign_command(get_room_key(key, room_id), challenge, command)
+                                     }).encode() + b"\n")
+            stream.flush()
+            return stream.readline(2) == b"1\n"
+    except (OSError, ValueError):
+        return False
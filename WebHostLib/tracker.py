@@ -1,5 +1,7 @@
 import datetime
 import collections
+import functools
+import threading
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from uuid import UUID
@@ -7,16 +9,17 @@ from uuid import UUID
 from flask import render_template
 from werkzeug.exceptions import abort
 
-from MultiServer import Context, get_saving_second
+from MultiServer import Context, apply_save_journal, get_saving_second
 from NetUtils import ClientStatus, Hint, NetworkItem, NetworkSlot, SlotType
 from Utils import restricted_loads, KeyedDefaultDict
 from . import app, cache
-from .models import GameDataPackage, Room
+from .models import GameDataPackage, Room, SaveJournal, Seed
 
 # Multisave is currently updated, at most, every minute.
 TRACKER_CACHE_TIMEOUT_IN_SECONDS = 60
+# Seeds and rooms whose decoded data this process keeps around for their trackers.
+TRACKER_DATA_CACHE_SIZE = 32
 
-_multidata_cache = {}
 _multiworld_trackers: Dict[str, Callable] = {}
 _player_trackers: Dict[str, Callable] = {}
 
@@ -26,7 +29,8 @@ ItemMetadata = Tuple[int, int, int]
 
 def _cache_results(func: Callable) -> Callable:
     """Stores the results of any computationally expensive methods after the initial call in TrackerData.
-    If called again, returns the cached result instead, as results will not change for the lifetime of TrackerData.
+    If called again, returns the cached result instead, as results will not change until the room is saved again.
+    Results are shared by all requests for the room in the meantime, so they must not be changed.
     """
     def method_wrapper(self: "TrackerData", *args):
         cache_key = f"{func.__name__}{''.join(f'_[{arg.__repr__()}]' for arg in args)}"
@@ -40,24 +44,110 @@ def _cache_results(func: Callable) -> Callable:
     return method_wrapper
 
 
+def _cache_request_results(func: Callable) -> Callable:
+    """Like _cache_results, for results that also depend on the time of the request,
+    so they are only kept for the lifetime of TrackerData.
+    """
+    def method_wrapper(self: "TrackerData", *args):
+        cache_key = f"{func.__name__}{''.join(f'_[{arg.__repr__()}]' for arg in args)}"
+        if cache_key in self._request_cache:
+            return self._request_cache[cache_key]
+
+        result = func(self, *args)
+        self._request_cache[cache_key] = result
+        return result
+
+    return method_wrapper
+
+
+@functools.lru_cache(maxsize=TRACKER_DATA_CACHE_SIZE)
+def _get_multidata(seed_id: UUID) -> Dict[str, Any]:
+    """Decoded multidata of a seed, which never changes. Requires db_session."""
+    return Context.decompress(Seed.get(id=seed_id).multidata)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_game_names(checksum: str) -> Tuple[Dict[int, str], Dict[int, str], Dict[str, int], Dict[str, int]]:
+    """Item and location names by id and ids by name from the data package with checksum. Requires db_session."""
+    game_package = restricted_loads(GameDataPackage.get(checksum=checksum).data)
+    return (
+        KeyedDefaultDict(lambda code: f"Unknown Item (ID: {code})", {
+            id: name for name, id in game_package["item_name_to_id"].items()}),
+        KeyedDefaultDict(lambda code: f"Unknown Location (ID: {code})", {
+            id: name for name, id in game_package["location_name_to_id"].items()}),
+        game_package["item_name_to_id"],
+        game_package["location_name_to_id"],
+    )
+
+
+@dataclass
+class _RoomSave:
+    """The save of a room as of its journal entry last_journal_id, with the results of TrackerData derived from it."""
+    seed_id: UUID
+    last_activity: datetime.datetime
+    last_journal_id: int
+    save: Dict[str, Any]
+    tracker_cache: Dict[str, Any]
+
+
+_room_saves: "collections.OrderedDict[UUID, _RoomSave]" = collections.OrderedDict()
+_room_saves_lock = threading.Lock()
+
+
+def _get_room_save(room: Room) -> _RoomSave:
+    """The current save of room, updated by the journal entries written since it was last asked for.
+    A room replaces its snapshot on its first save and when folding in its journal, which deletes all its entries,
+    so the save is read again once the last entry it was updated by is gone or it had none and the room was active.
+    Requires db_session."""
+    with _room_saves_lock:
+        room_save = _room_saves.get(room.id)
+    if room_save and room_save.seed_id == room.seed.id and \
+            (SaveJournal.exists(id=room_save.last_journal_id) if room_save.last_journal_id
+             else room.last_activity == room_save.last_activity):
+        entries = list(room.save_journal.select(lambda entry: entry.id > room_save.last_journal_id)
+                       .order_by(SaveJournal.id))
+        if not entries:
+            return room_save
+        room_save = _RoomSave(room_save.seed_id, room.last_activity, entries[-1].id,
+                              apply_save_journal(room_save.save, [entry.data for entry in entries]), {})
+    else:
+        entries = list(room.save_journal.select().order_by(SaveJournal.id))
+        save = apply_save_journal(restricted_loads(room.multisave), [entry.data for entry in entries]) \
+            if room.multisave else {}
+        room_save = _RoomSave(room.seed.id, room.last_activity, entries[-1].id if entries else 0, save, {})
+
+    with _room_saves_lock:
+        _room_saves[room.id] = room_save
+        _room_saves.move_to_end(room.id)
+        while len(_room_saves) > TRACKER_DATA_CACHE_SIZE:
+            _room_saves.popitem(last=False)
+    return room_save
+
+
 @dataclass
 class TrackerData:
     """A helper dataclass that is instantiated each time an HTTP request comes in for tracker data.
 
     Provides helper methods to lazily load necessary data that each tracker require and caches any results so any
-    subsequent helper method calls do not need to recompute results during the lifetime of this instance.
+    subsequent helper method calls do not need to recompute results until the room is saved again.
+    Decoded multidata, names and saves are kept by the process across requests, see _get_room_save.
     """
     room: Room
     _multidata: Dict[str, Any]
     _multisave: Dict[str, Any]
     _tracker_cache: Dict[str, Any]
+    _request_cache: Dict[str, Any]
+    _save_tag: str
 
     def __init__(self, room: Room):
         """Initialize a new RoomMultidata object for the current room."""
         self.room = room
-        self._multidata = Context.decompress(room.seed.multidata)
-        self._multisave = restricted_loads(room.multisave) if room.multisave else {}
-        self._tracker_cache = {}
+        self._multidata = _get_multidata(room.seed.id)
+        room_save = _get_room_save(room)
+        self._multisave = room_save.save
+        self._tracker_cache = room_save.tracker_cache
+        self._save_tag = f"{room.seed.id}-{room_save.last_journal_id}-{room_save.last_activity.timestamp()}"
+        self._request_cache = {}
 
         self.item_name_to_id: Dict[str, Dict[str, int]] = {}
         self.location_name_to_id: Dict[str, Dict[str, int]] = {}
@@ -70,15 +160,9 @@ class TrackerData:
             game_name: KeyedDefaultDict(lambda code: f"Unknown Game {game_name} - Location (ID: {code})")
         })
         for game, game_package in self._multidata["datapackage"].items():
-            game_package = restricted_loads(GameDataPackage.get(checksum=game_package["checksum"]).data)
-            self.item_id_to_name[game] = KeyedDefaultDict(lambda code: f"Unknown Item (ID: {code})", {
-                id: name for name, id in game_package["item_name_to_id"].items()})
-            self.location_id_to_name[game] = KeyedDefaultDict(lambda code: f"Unknown Location (ID: {code})", {
-                id: name for name, id in game_package["location_name_to_id"].items()})
-
             # Normal lookup tables as well.
-            self.item_name_to_id[game] = game_package["item_name_to_id"]
-            self.location_name_to_id[game] = game_package["item_name_to_id"]
+            self.item_id_to_name[game], self.location_id_to_name[game], \
+                self.item_name_to_id[game], self.location_name_to_id[game] = _get_game_names(game_package["checksum"])
 
     def get_seed_name(self) -> str:
         """Retrieves the seed name."""
@@ -136,7 +220,7 @@ class TrackerData:
         """Retrieves a set of all hints relevant for a particular player."""
         return self._multisave.get("hints", {}).get((team, player), set())
 
-    @_cache_results
+    @_cache_request_results
     def get_player_last_activity(self, team: int, player: int) -> Optional[datetime.timedelta]:
         """Retrieves the relative timedelta for when a particular player was last active.
         Returns None if no activity was ever recorded.
@@ -210,6 +294,10 @@ class TrackerData:
             ]
         }
 
+    def get_room_save_tag(self) -> str:
+        """Retrieves a tag that changes whenever the room is saved, for HTTP ETags."""
+        return self._save_tag
+
     @_cache_results
     def get_room_saving_second(self) -> int:
         """Retrieves the saving second value for this seed.
@@ -265,16 +353,23 @@ class TrackerData:
         return long_player_names
 
     @_cache_results
+    def get_room_activity_timestamps(self) -> Dict[TeamPlayer, float]:
+        """Retrieves a dictionary of all players and the UTC timestamp of their last activity.
+        Does not include players who have no activity recorded.
+        """
+        return {(team, player): timestamp
+                for (team, player), timestamp in self._multisave.get("client_activity_timers", [])}
+
+    @_cache_request_results
     def get_room_last_activity(self) -> Dict[TeamPlayer, datetime.timedelta]:
         """Retrieves a dictionary of all players and the timedelta from now to their last activity.
         Does not include players who have no activity recorded.
         """
-        last_activity: Dict[TeamPlayer, datetime.timedelta] = {}
         now = datetime.datetime.utcnow()
-        for (team, player), timestamp in self._multisave.get("client_activity_timers", []):
-            last_activity[team, player] = now - datetime.datetime.utcfromtimestamp(timestamp)
-
-        return last_activity
+        return {
+            team_player: now - datetime.datetime.utcfromtimestamp(timestamp)
+            for team_player, timestamp in self.get_room_activity_timestamps().items()
+        }
 
     @_cache_results
     def get_room_videos(self) -> Dict[TeamPlayer, Tuple[str, str]]:
@@ -1859,7 +1954,7 @@ if "Starcraft 2 Wings of Liberty" in network_data_package["games"]:
             "Progressive Ship Armor":      106 + SC2WOL_ITEM_ID_OFFSET,
         }
 
-        inventory = tracker_data.get_player_inventory_counts(team, player)
+        inventory = collections.Counter(tracker_data.get_player_inventory_counts(team, player))
         for grouped_item_name, grouped_item_id in grouped_item_ids.items():
             count: int = inventory[grouped_item_id]
             if count > 0:
@@ -1,6 +1,7 @@
 import base64
 import json
 import pickle
+import time
 import typing
 import uuid
 import zipfile
@@ -9,18 +10,19 @@ import zlib
 from io import BytesIO
 from flask import request, flash, redirect, url_for, session, render_template
 from markupsafe import Markup
-from pony.orm import commit, flush, select, rollback
+from pony.orm import commit, db_session, flush, select, rollback
 from pony.orm.core import TransactionIntegrityError
 import schema
 
 import MultiServer
-from NetUtils import SlotType
-from Utils import VersionException, __version__
+from NetUtils import SlotType, write_multidata
+from Utils import VersionException, __version__, restricted_loads
 from worlds import GamesPackage
 from worlds.Files import AutoPatchRegister
 from worlds.AutoWorld import data_package_checksum
 from . import app
-from .models import Seed, Room, Slot, GameDataPackage
+from .models import Generation, Seed, Room, Slot, GameDataPackage, STATE_ERROR, STATE_QUEUED
+from .wakeup import wake
 
 banned_extensions = (".sfc", ".z64", ".n64", ".nes", ".smc", ".sms", ".gb", ".gbc", ".gba")
 allowed_options_extensions = (".yaml", ".json", ".yml", ".txt", ".zip")
@@ -48,10 +50,18 @@ def banned_file(filename: str) -> bool:
     return filename.endswith(banned_extensions)
 
 
+class StoredChecksums(typing.Container[str]):
+    """Checksums of the data packages in the database, which were validated when they were first uploaded."""
+
+    def __contains__(self, checksum: object) -> bool:
+        return GameDataPackage.exists(checksum=checksum)
+
+
 def process_multidata(compressed_multidata, files={}):
     game_data: GamesPackage
 
-    decompressed_multidata = MultiServer.Context.decompress(compressed_multidata)
+    # data packages already stored are not even unpacked, if the format allows
+    decompressed_multidata = MultiServer.Context.decompress(compressed_multidata, StoredChecksums())
 
     slots: typing.Set[Slot] = set()
     if "datapackage" in decompressed_multidata:
@@ -60,25 +70,29 @@ def process_multidata(compressed_multidata, files={}):
         for game, game_data in decompressed_multidata["datapackage"].items():
             if game_data.get("checksum"):
                 original_checksum = game_data.pop("checksum")
-                game_data = games_package_schema.validate(game_data)
-                game_data = {key: value for key, value in sorted(game_data.items())}
-                game_data["checksum"] = data_package_checksum(game_data)
-                game_data_package = GameDataPackage(checksum=game_data["checksum"],
-                                                    data=pickle.dumps(game_data))
-                if original_checksum != game_data["checksum"]:
-                    raise Exception(f"Original checksum {original_checksum} != "
-                                    f"calculated checksum {game_data['checksum']} "
-                                    f"for game {game}.")
+                game_data_package = GameDataPackage.get(checksum=original_checksum)
+                if game_data_package:
+                    game_data = restricted_loads(game_data_package.data)
+                else:
+                    game_data = games_package_schema.validate(game_data)
+                    game_data = {key: value for key, value in sorted(game_data.items())}
+                    game_data["checksum"] = data_package_checksum(game_data)
+                    game_data_package = GameDataPackage(checksum=game_data["checksum"],
+                                                        data=pickle.dumps(game_data))
+                    if original_checksum != game_data["checksum"]:
+                        raise Exception(f"Original checksum {original_checksum} != "
+                                        f"calculated checksum {game_data['checksum']} "
+                                        f"for game {game}.")
+                    try:
+                        commit()  # commit game data package
+                        game_data_packages.append(game_data_package)
+                    except TransactionIntegrityError:
+                        del game_data_package
+                        rollback()
                 decompressed_multidata["datapackage"][game] = {
                     "version": game_data.get("version", 0),
                     "checksum": game_data["checksum"],
                 }
-                try:
-                    commit()  # commit game data package
-                    game_data_packages.append(game_data_package)
-                except TransactionIntegrityError:
-                    del game_data_package
-                    rollback()
 
     if "slot_info" in decompressed_multidata:
         for slot, slot_info in decompressed_multidata["slot_info"].items():
@@ -91,25 +105,36 @@ def process_multidata(compressed_multidata, files={}):
                            game=slot_info.game))
         flush()  # commit slots
 
-    compressed_multidata = compressed_multidata[0:1] + zlib.compress(pickle.dumps(decompressed_multidata), 9)
+    if compressed_multidata[0] >= 4:
+        stream = BytesIO()
+        write_multidata(stream, decompressed_multidata)
+        compressed_multidata = stream.getvalue()
+    else:
+        compressed_multidata = compressed_multidata[0:1] + zlib.compress(pickle.dumps(decompressed_multidata), 9)
     return slots, compressed_multidata
 
 
-def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, sid=None):
+def no_progress(message: str) -> None:
+    pass
+
+
+def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, sid=None,
+                     progress: typing.Callable[[str], None] = no_progress) -> typing.Union[Seed, str]:
+    """Stores the seed in zfile, or returns what is wrong with it. Reports what it is doing to progress."""
     if not owner:
         owner = session["_id"]
     infolist = zfile.infolist()
     if all(allowed_options(file.filename) or file.is_dir() for file in infolist):
-        flash(Markup("Error: Your .zip file only contains options files. "
-                     'Did you mean to <a href="/generate">generate a game</a>?'))
-        return
+        return Markup("Error: Your .zip file only contains options files. "
+                      'Did you mean to <a href="/generate">generate a game</a>?')
 
     spoiler = ""
     files = {}
     multidata = None
 
     # Load files.
-    for file in infolist:
+    for number, file in enumerate(infolist, 1):
+        progress(f"Reading file {number} of {len(infolist)}")
         handler = AutoPatchRegister.get_handler(file.filename)
         if banned_file(file.filename):
             return "Uploaded data contained a rom file, which is likely to contain copyrighted material. " \
@@ -131,8 +156,7 @@ def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, s
             try:
                 multidata = zfile.open(file).read()
             except:
-                flash("Could not load multidata. File may be corrupted or incompatible.")
-                multidata = None
+                return "Could not load multidata. File may be corrupted or incompatible."
 
         # Minecraft
         elif file.filename.endswith(".apmc"):
@@ -145,8 +169,7 @@ def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, s
             try:
                 _, _, slot_id, *_ = file.filename.split('_')[0].split('-', 3)
             except ValueError:
-                flash("Error: Unexpected file found in .zip: " + file.filename)
-                return
+                return "Error: Unexpected file found in .zip: " + file.filename
             data = zfile.open(file, "r").read()
             files[int(slot_id[1:])] = data
 
@@ -155,13 +178,13 @@ def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, s
             try:
                 _, _, slot_id, *_ = file.filename.split('.')[0].split('_', 3)
             except ValueError:
-                flash("Error: Unexpected file found in .zip: " + file.filename)
-                return
+                return "Error: Unexpected file found in .zip: " + file.filename
             data = zfile.open(file, "r").read()
             files[int(slot_id[1:])] = data
 
     # Load multi data.
     if multidata:
+        progress("Validating multidata")
         slots, multidata = process_multidata(multidata, files)
 
         seed = Seed(multidata=multidata, spoiler=spoiler, slots=slots, owner=owner, meta=json.dumps(meta),
@@ -171,7 +194,64 @@ def upload_zip_to_db(zfile: zipfile.ZipFile, owner=None, meta={"race": False}, s
             slot.seed = seed
         return seed
     else:
-        flash("No multidata was found in the zip file, which is required.")
+        return "No multidata was found in the zip file, which is required."
+
+
+def upload_file_to_db(data: bytes, owner, sid=None,
+                      progress: typing.Callable[[str], None] = no_progress) -> typing.Union[Seed, str]:
+    """Stores the seed in data, a .zip or .archipelago, or returns what is wrong with it."""
+    file = BytesIO(data)
+    if zipfile.is_zipfile(file):
+        with zipfile.ZipFile(file, "r") as zfile:
+            try:
+                return upload_zip_to_db(zfile, owner, sid=sid, progress=progress)
+            except VersionException:
+                return "Could not load multidata. Wrong Version detected."
+
+    progress("Validating multidata")
+    # noinspection PyBroadException
+    try:
+        slots, multidata = process_multidata(data)
+    except Exception as e:
+        return f"Could not load multidata. File may be corrupted or incompatible. ({e})"
+    seed = Seed(multidata=multidata, slots=slots, owner=owner, id=sid if sid else uuid.uuid4())
+    flush()  # place into DB and generate ids
+    return seed
+
+
+def process_queued_upload(sid: uuid.UUID) -> uuid.UUID:
+    """Stores the upload queued as the Generation sid as the seed sid, run by the generators."""
+    last_report = 0.0
+
+    def report(message: str):
+        # only commits the Generation, so before anything else of the seed is written
+        nonlocal last_report
+        if time.monotonic() - last_report >= 1:
+            last_report = time.monotonic()
+            meta = json.loads(generation.meta)
+            meta["progress"] = message
+            generation.meta = json.dumps(meta)
+            commit()
+
+    try:
+        with db_session:
+            generation = Generation.get(id=sid)
+            result = upload_file_to_db(generation.options, generation.owner, sid, report)
+            if isinstance(result, str):
+                raise Exception(result)
+            generation.delete()
+    except BaseException as e:
+        with db_session:
+            generation = Generation.get(id=sid)
+            if generation is not None:
+                generation.state = STATE_ERROR
+                generation.options = b""  # the upload may be a rom, don't keep it
+                meta = json.loads(generation.meta)
+                meta.pop("progress", None)
+                meta["error"] = (e.__class__.__name__ + ": " + str(e))
+                generation.meta = json.dumps(meta)
+        raise
+    return sid
 
 
 @app.route("/uploads", methods=["GET", "POST"])
@@ -186,29 +266,19 @@ def uploads():
             if uploaded_file.filename == "":
                 flash("No selected file.")
             elif uploaded_file and allowed_generation(uploaded_file.filename):
-                if zipfile.is_zipfile(uploaded_file):
-                    with zipfile.ZipFile(uploaded_file, "r") as zfile:
-                        try:
-                            res = upload_zip_to_db(zfile)
-                        except VersionException:
-                            flash(f"Could not load multidata. Wrong Version detected.")
-                        else:
-                            if res is str:
-                                return res
-                            elif res:
-                                return redirect(url_for("view_seed", seed=res.id))
+                data = uploaded_file.read()
+                if len(data) >= app.config["UPLOAD_JOB_THRESHOLD"]:
+                    # the generators validate and store it, while the wait page shows how far they got
+                    generation = Generation(options=data, meta=json.dumps({"race": False, "upload": True}),
+                                            state=STATE_QUEUED, owner=session["_id"])
+                    commit()
+                    wake("autogen")
+                    return redirect(url_for("wait_seed", seed=generation.id))
+                res = upload_file_to_db(data, session["_id"])
+                if isinstance(res, str):
+                    flash(res)
                 else:
-                    uploaded_file.seek(0)  # offset from is_zipfile check
-                    # noinspection PyBroadException
-                    try:
-                        multidata = uploaded_file.read()
-                        slots, multidata = process_multidata(multidata)
-                    except Exception as e:
-                        flash(f"Could not load multidata. File may be corrupted or incompatible. ({e})")
-                    else:
-                        seed = Seed(multidata=multidata, slots=slots, owner=session["_id"])
-                        flush()  # place into DB and generate ids
-                        return redirect(url_for("view_seed", seed=seed.id))
+                    return redirect(url_for("view_seed", seed=res.id))
             else:
                 flash("Not recognized file format. Awaiting a .archipelago file or .zip containing one.")
     return render_template("hostGame.html", version=__version__)
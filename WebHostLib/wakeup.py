@@ -0,0 +1,64 @@
+"""
+Wakes the autohost and autogen schedulers from the website, so they don't have to keep polling the database.
+A scheduler listens on a local UDP port and writes it into a file named after the scheduler,
+where any website process on the same machine can find it.
+A wake-up is only a hint to look at the database now, schedulers still do so every once in a while to catch lost ones.
+"""
+import os
+import socket
+import typing
+
+import Utils
+
+registry_folder = Utils.user_path("scheduler_wakeups")
+
+
+def get_registry_file(name: str) -> str:
+    return os.path.join(registry_folder, f"{name}.port")
+
+
+class WakeupListener:
+    """Receives wake-ups for the scheduler called name, until closed."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+
+        os.makedirs(registry_folder, exist_ok=True)
+        registry_file = get_registry_file(name)
+        with open(registry_file + ".tmp", "w") as f:
+            f.write(str(self.socket.getsockname()[1]))
+        os.replace(registry_file + ".tmp", registry_file)
+
+    def wait(self, timeout: typing.Optional[float]) -> typing.List[str]:
+        """Waits up to timeout seconds for a wake-up, returns what the wake-ups received until then were about."""
+        messages = []
+        self.socket.settimeout(timeout)
+        try:
+            messages.append(self.socket.recv(1024))
+            self.socket.setblocking(False)
+            while True:
+                messages.append(self.socket.recv(1024))
+        except (socket.timeout, BlockingIOError):
+            pass
+        return [message.decode() for message in messages]
+
+    def close(self):
+        try:
+            os.remove(get_registry_file(self.name))
+        except FileNotFoundError:
+            pass
+        self.socket.close()
+
+
+def wake(name: str, about: str = "") -> bool:
+    """Wakes the scheduler called name, returns False if it could not be found on this machine."""
+    try:
+        with open(get_registry_file(name)) as f:
+            port = int(f.read())
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            sender.sendto(about.encode(), ("127.0.0.1", port))
+        return True
+    except (OSError, ValueError):
+        return False
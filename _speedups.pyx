@@ -13,7 +13,9 @@ from cpython cimport PyObject
 from typing import Any, Dict, Iterable, Iterator, Generator, Sequence, Tuple, TypeVar, Union, Set, List, TYPE_CHECKING
 from cymem.cymem cimport Pool
 from libc.stdint cimport int64_t, uint32_t
-from libcpp.set cimport set as std_set
+from libcpp.algorithm cimport sort
+from libcpp.utility cimport pair
+from libcpp.vector cimport vector
 from collections import defaultdict
 
 cdef extern from *:
@@ -48,6 +50,9 @@ cdef struct IndexEntry:
     size_t count
 
 
+ctypedef pair[ap_id_t, size_t] ItemEntry  # item and index into entries, sorted per receiver
+
+
 cdef class LocationStore:
     """Compact store for locations and their items in a MultiServer"""
     # The original implementation uses Dict[int, Dict[int, Tuple(int, int, int]]
@@ -62,6 +67,10 @@ cdef class LocationStore:
     cdef size_t entry_count
     cdef IndexEntry* sender_index  # 16KB/1000 players
     cdef size_t sender_index_size
+    cdef IndexEntry* receiver_index  # 16KB/1000 players, ranges in receiver_entries and receiver_items
+    cdef size_t receiver_index_size
+    cdef size_t* receiver_entries  # 800KB/100k items, indices into entries grouped by receiver
+    cdef ItemEntry* receiver_items  # 1.6MB/100k items, (item, index into entries) grouped by receiver, sorted
     cdef list _keys  # ~36KB/1000 players, speed up iter (28 per int + 8 per list entry)
     cdef list _items  # ~64KB/1000 players, speed up items (56 per tuple + 8 per list entry)
     cdef list _proxies  # ~92KB/1000 players, speed up self[player] (56 per struct + 28 per len + 8 per list entry)
@@ -70,7 +79,9 @@ cdef class LocationStore:
     def get_size(self):
         from sys import getsizeof
         size = getsizeof(self) + getsizeof(self._mem) + getsizeof(self._len) \
-                + sizeof(LocationEntry) * self.entry_count + sizeof(IndexEntry) * self.sender_index_size
+                + sizeof(LocationEntry) * self.entry_count + sizeof(IndexEntry) * self.sender_index_size \
+                + sizeof(IndexEntry) * self.receiver_index_size \
+                + (sizeof(size_t) + sizeof(ItemEntry)) * self.entry_count
         size += getsizeof(self._keys) + getsizeof(self._items) + getsizeof(self._proxies)
         size += sum(sizeof(key) for key in self._keys)
         size += sum(sizeof(item) for item in self._items)
@@ -88,6 +99,10 @@ cdef class LocationStore:
         self.entry_count = 0
         self.sender_index = NULL
         self.sender_index_size = 0
+        self.receiver_index = NULL
+        self.receiver_index_size = 0
+        self.receiver_entries = NULL
+        self.receiver_items = NULL
         self._raw_proxies = NULL
 
     def __init__(self, locations_dict: Dict[int, Dict[int, Sequence[int]]]) -> None:
@@ -99,6 +114,7 @@ cdef class LocationStore:
 
         # iterate over everything to get all maxima and validate everything
         cdef size_t max_sender = INVALID_SIZE  # keep track of highest used player id for indexing
+        cdef size_t max_receiver = 0
         cdef size_t sender_count = 0
         cdef size_t count = 0
         for sender, locations in locations_dict.items():
@@ -113,6 +129,7 @@ cdef class LocationStore:
                 receiver = data[1]
                 if receiver < 1 or receiver > MAX_PLAYER_ID:
                     raise ValueError(f"Invalid player id {receiver} for item")
+                max_receiver = max(max_receiver, receiver)
                 count += 1
             sender_count += 1
 
@@ -130,6 +147,9 @@ cdef class LocationStore:
         self.entries = <LocationEntry*>self._mem.alloc(count, sizeof(LocationEntry))
         self.sender_index = <IndexEntry*>self._mem.alloc(max_sender + 1, sizeof(IndexEntry))
         self._raw_proxies = <PyObject**>self._mem.alloc(max_sender + 1, sizeof(PyObject*))
+        self.receiver_index = <IndexEntry*>self._mem.alloc(max_receiver + 1, sizeof(IndexEntry))
+        self.receiver_entries = <size_t*>self._mem.alloc(count, sizeof(size_t))
+        self.receiver_items = <ItemEntry*>self._mem.alloc(count, sizeof(ItemEntry))
 
         # build entries and index
         cdef size_t i = 0
@@ -148,6 +168,27 @@ cdef class LocationStore:
                 self.sender_index[sender].count += 1
                 i += 1
 
+        # build receiver indexes, entries of a receiver keep their order so results match a scan over entries
+        cdef size_t j
+        cdef IndexEntry* receiver_range
+        for j in range(count):
+            self.receiver_index[self.entries[j].receiver].count += 1
+        i = 0
+        for j in range(max_receiver + 1):
+            self.receiver_index[j].start = i
+            i += self.receiver_index[j].count
+            self.receiver_index[j].count = 0
+        for j in range(count):
+            receiver_range = self.receiver_index + self.entries[j].receiver
+            i = receiver_range.start + receiver_range.count
+            self.receiver_entries[i] = j
+            self.receiver_items[i] = ItemEntry(self.entries[j].item, j)
+            receiver_range.count += 1
+        for j in range(max_receiver + 1):
+            receiver_range = self.receiver_index + j
+            sort(self.receiver_items + receiver_range.start,
+                 self.receiver_items + receiver_range.start + receiver_range.count)
+
         # build pyobject caches
         self._proxies.append(None)  # player 0
         assert self.sender_index[0].count == 0
@@ -163,6 +204,7 @@ cdef class LocationStore:
             self._raw_proxies[i] = <PyObject*>proxy
 
         self.sender_index_size = max_sender + 1
+        self.receiver_index_size = max_receiver + 1
         self.entry_count = count
         self._len = sender_count
 
@@ -193,40 +235,54 @@ cdef class LocationStore:
         return self._items
 
     # specialized accessors
+    cdef void _find_item(self, ap_player_t receiver, ap_id_t item, vector[size_t]& found) noexcept nogil:
+        # binary search for the first entry of item in the receiver's sorted items
+        if receiver >= self.receiver_index_size:
+            return
+        cdef size_t l = self.receiver_index[receiver].start
+        cdef size_t r = l + self.receiver_index[receiver].count
+        cdef size_t end = r
+        cdef size_t m
+        while l < r:
+            m = (l + r) // 2
+            if self.receiver_items[m].first < item:
+                l = m + 1
+            else:
+                r = m
+        while l < end and self.receiver_items[l].first == item:
+            found.push_back(self.receiver_items[l].second)
+            l += 1
+
     def find_item(self, slots: Set[int], seeked_item_id: int) -> Generator[Tuple[int, int, int, int, int], None, None]:
         cdef ap_id_t item = seeked_item_id
         cdef ap_player_t receiver
-        cdef std_set[ap_player_t] receivers
-        cdef size_t slot_count = len(slots)
-        if slot_count == 1:
-            # specialized implementation for single slot
-            receiver = list(slots)[0]
-            with nogil:
-                for entry in self.entries[:self.entry_count]:
-                    if entry.item == item and entry.receiver == receiver:
-                        with gil:
-                            yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
-        elif slot_count:
-            # generic implementation with lookup in set
-            for receiver in slots:
-                receivers.insert(receiver)
-            with nogil:
-                for entry in self.entries[:self.entry_count]:
-                    if entry.item == item and receivers.count(entry.receiver):
-                        with gil:
-                            yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
+        cdef vector[size_t] found
+        cdef size_t i
+        cdef LocationEntry* entry
+        for receiver in slots:
+            self._find_item(receiver, item, found)
+        if len(slots) > 1:
+            # restore the order of entries, as if all of them were scanned
+            sort(found.begin(), found.end())
+        for i in found:
+            entry = self.entries + i
+            yield entry.sender, entry.location, entry.item, entry.receiver, entry.flags
 
     def get_for_player(self, slot: int) -> Dict[int, Set[int]]:
         cdef ap_player_t receiver = slot
+        cdef size_t i
+        cdef LocationEntry* entry
         all_locations: Dict[int, Set[int]] = {}
-        with nogil:
-            for entry in self.entries[:self.entry_count]:
-                if entry.receiver == receiver:
-                    with gil:
-                        sender: int = entry.sender
-                        if sender not in all_locations:
-                            all_locations[sender] = set()
-                        all_locations[sender].add(entry.location)
+        if receiver >= self.receiver_index_size:
+            return all_locations
+        cdef size_t start = self.receiver_index[receiver].start
+        cdef size_t count = self.receiver_index[receiver].count
+        for i in self.receiver_entries[start:start + count]:
+            entry = self.entries + i
+            sender: int = entry.sender
+            if sender not in all_locations:
+                all_locations[sender] = set()
+            all_locations[sender].add(entry.location)
         return all_locations
 
     if TYPE_CHECKING:
@@ -586,6 +586,22 @@ class ServerOptions(Group):
         OFF = 0
         ON = 1
 
+    class JournalSaves(IntEnum):
+        """
+        Append changes to a journal next to the save file instead of rewriting the whole save every time,
+        the journal is folded into the save file once it grew larger than it
+        """
+        OFF = 0
+        ON = 1
+
+    class Metrics(IntEnum):
+        """Measure call counts, latencies and bytes sent per packet type, shown by the /metrics server command"""
+        OFF = 0
+        ON = 1
+
+    class MetricsPort(int):
+        """Serve metrics as JSON over HTTP on this port of localhost, 0 to not serve them"""
+
     host: Optional[str] = None
     port: int = 38281
     password: Optional[str] = None
@@ -603,6 +619,9 @@ class ServerOptions(Group):
     auto_shutdown: AutoShutdown = AutoShutdown(0)
     compatibility: Compatibility = Compatibility(2)
     log_network: LogNetwork = LogNetwork(0)
+    journal_saves: JournalSaves = JournalSaves(0)
+    metrics: Metrics = Metrics(0)
+    metrics_port: MetricsPort = MetricsPort(0)
 
 
 class GeneratorOptions(Group):
@@ -665,6 +684,21 @@ class GeneratorOptions(Group):
         OFF = 0
         ON = 1
 
+    class MultidataCompression(int):
+        """
+        zlib compression level of the .archipelago file
+        1 -> fastest, 9 -> smallest file
+        """
+
+    class MultidataFormat(IntEnum):
+        """
+        Format of the .archipelago file
+        3 -> one compressed block, readable by every server
+        4 -> compressed sections, faster to load, but servers of earlier versions can't read it
+        """
+        COMPATIBLE = 3
+        SECTIONS = 4
+
     enemizer_path: EnemizerPath = EnemizerPath("EnemizerCLI/EnemizerCLI.Core")  # + ".exe" is implied on Windows
     player_files_path: PlayerFilesPath = PlayerFilesPath("Players")
     players: Players = Players(0)
@@ -674,6 +708,8 @@ class GeneratorOptions(Group):
     glitch_triforce_room: GlitchTriforceRoom = GlitchTriforceRoom(1)  # why is this here?
     race: Race = Race(0)
     plando_options: PlandoOptions = PlandoOptions("bosses, connections, texts")
+    multidata_compression: MultidataCompression = MultidataCompression(6)
+    multidata_format: MultidataFormat = MultidataFormat(3)
 
 
 class SNIOptions(Group):
@@ -0,0 +1,64 @@
+def run_encoding_benchmark():
+    """Time NetUtils.encode and decode on typical server packets, against scanning for NamedTuples up front, and check
+    that both encodings are byte-identical."""
+    import logging
+    import random
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from NetUtils import Hint, NetworkItem, NetworkPlayer, NetworkSlot, SlotType, decode, encode, _encode, \
+        _scan_for_TypedTuples
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        iterations: int = 100
+        players: int = 50
+
+        def create_packets(self):
+            rand = random.Random(0)
+            items = [NetworkItem(rand.randrange(1, 1 << 20), rand.randrange(-2, 1 << 20),
+                                 rand.randrange(self.players + 1), rand.choice((0, 1, 2, 4))) for _ in range(2000)]
+            slot_data = {f"option_{i}": rand.choice((1, "text", [1, 2, 3], {"a": 0.5, "b": [True, None]}))
+                         for i in range(300)}
+            return {
+                "ReceivedItems": [{"cmd": "ReceivedItems", "index": 0, "items": items}],
+                "Connected": [{"cmd": "Connected", "team": 0, "slot": 1,
+                               "players": [NetworkPlayer(0, slot, f"Player{slot}", f"Player{slot}")
+                                           for slot in range(1, self.players + 1)],
+                               "missing_locations": list(range(1000)), "checked_locations": list(range(1000, 2000)),
+                               "slot_info": {slot: NetworkSlot(f"Player{slot}", "Game", SlotType.player)
+                                             for slot in range(1, self.players + 1)},
+                               "slot_data": slot_data, "hint_points": 0}],
+                "Hints": [Hint(1, 2, item.location, item.item, False, "", item.flags).as_network_message()
+                          for item in items[:200]],
+                "Bounced": [{"cmd": "Bounced", "tags": ["DeathLink"], "data": {"time": 1.5, "source": "Player1"}}],
+            }
+
+        def main(self):
+            for name, packet in self.create_packets().items():
+                expected = _encode(_scan_for_TypedTuples(packet))
+                text = encode(packet)
+                if text != expected:
+                    logger.error(f"{name} encodes differently")
+                iterations = self.iterations if len(text) > 1000 else self.iterations * 100
+                with TimeIt(f"{name} {iterations} scans for NamedTuples, then encodes", logger):
+                    for _ in range(iterations):
+                        _encode(_scan_for_TypedTuples(packet))
+                with TimeIt(f"{name} {iterations} encodes", logger):
+                    for _ in range(iterations):
+                        encode(packet)
+                with TimeIt(f"{name} {iterations} decodes", logger):
+                    for _ in range(iterations):
+                        decode(text)
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_encoding_benchmark()
@@ -9,7 +9,7 @@ def run_locations_benchmark():
     from time_it import TimeIt
 
     from Utils import init_logging
-    from BaseClasses import MultiWorld, CollectionState, Location
+    from BaseClasses import MultiWorld, CollectionState, ItemCounter, Location
     from worlds import AutoWorld
     from worlds.AutoWorld import call_all
 
@@ -40,12 +40,20 @@ def run_locations_benchmark():
                 gc.collect()
             return t.dif
 
+        @staticmethod
+        def with_group_counts(state: CollectionState, group_counts: bool) -> CollectionState:
+            """Copy of state, with its item counts kept as plain Counters or as ItemCounters."""
+            state = state.copy()
+            prog_items: typing.Dict[int, collections.Counter[str]] = {}
+            for player, counter in state.prog_items.items():
+                world = state.multiworld.worlds[player]
+                prog_items[player] = ItemCounter(world.item_name_group_ids, world.item_name_to_group_ids, counter) \
+                    if group_counts else collections.Counter(counter)
+            state.prog_items = prog_items
+            return state
+
         def main(self):
             for game in sorted(AutoWorld.AutoWorldRegister.world_types):
-                summary_data: typing.Dict[str, collections.Counter[str]] = {
-                    "empty_state": collections.Counter(),
-                    "all_state": collections.Counter(),
-                }
                 try:
                     multiworld = MultiWorld(1)
                     multiworld.game[1] = game
@@ -70,23 +78,31 @@ def run_locations_benchmark():
                         continue
 
                     all_state = multiworld.get_all_state(False)
-                    for location in locations:
-                        time_taken = self.location_test(location, multiworld.state, "empty_state")
-                        summary_data["empty_state"][location.name] = time_taken
-
-                        time_taken = self.location_test(location, all_state, "all_state")
-                        summary_data["all_state"][location.name] = time_taken
-
-                    total_empty_state = sum(summary_data["empty_state"].values())
-                    total_all_state = sum(summary_data["all_state"].values())
-
-                    logger.info(f"{game} took {total_empty_state/len(locations):.4f} "
-                                f"seconds per location in empty_state and {total_all_state/len(locations):.4f} "
-                                f"in all_state. (all times summed for {self.rule_iterations} runs.)")
-                    logger.info(f"Top times in empty_state:\n"
-                                f"{self.format_times_from_counter(summary_data['empty_state'])}")
-                    logger.info(f"Top times in all_state:\n"
-                                f"{self.format_times_from_counter(summary_data['all_state'])}")
+                    for counts_name, group_counts in (("plain counts", False), ("group counts", True)):
+                        summary_data: typing.Dict[str, collections.Counter[str]] = {
+                            "empty_state": collections.Counter(),
+                            "all_state": collections.Counter(),
+                        }
+                        empty_state = self.with_group_counts(multiworld.state, group_counts)
+                        full_state = self.with_group_counts(all_state, group_counts)
+                        for location in locations:
+                            time_taken = self.location_test(location, empty_state, "empty_state")
+                            summary_data["empty_state"][location.name] = time_taken
+
+                            time_taken = self.location_test(location, full_state, "all_state")
+                            summary_data["all_state"][location.name] = time_taken
+
+                        total_empty_state = sum(summary_data["empty_state"].values())
+                        total_all_state = sum(summary_data["all_state"].values())
+
+                        logger.info(f"{game} took {total_empty_state/len(locations):.4f} "
+                                    f"seconds per location in empty_state and {total_all_state/len(locations):.4f} "
+                                    f"in all_state with {counts_name}. "
+                                    f"(all times summed for {self.rule_iterations} runs.)")
+                        logger.info(f"Top times in empty_state with {counts_name}:\n"
+                                    f"{self.format_times_from_counter(summary_data['empty_state'])}")
+                        logger.info(f"Top times in all_state with {counts_name}:\n"
+                                    f"{self.format_times_from_counter(summary_data['all_state'])}")
 
                 except Exception as e:
                     logger.exception(e)
@@ -0,0 +1,44 @@
+def run_multidata_benchmark():
+    """Time writing and loading a big multidata in each .archipelago format, with and without its data packages."""
+    import io
+    import logging
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from MultiServer import Context
+    from NetUtils import write_multidata
+    from test.programs.test_multi_server import TestMultidata
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        slots: int = 100
+        locations: int = 500
+        games: int = 20
+
+        def main(self):
+            multidata = TestMultidata.make_multidata(self.slots, self.locations, self.games)
+            stored_games = {f"checksum {game}" for game in range(self.games)}
+            for format_version in (3, 4):
+                stream = io.BytesIO()
+                with TimeIt(f"Format {format_version} write", logger):
+                    write_multidata(stream, multidata, format_version=format_version)
+                data = stream.getvalue()
+                logger.info(f"Format {format_version} is {len(data)} bytes")
+                with TimeIt(f"Format {format_version} load", logger):
+                    loaded = Context.decompress(data)
+                if loaded != multidata:
+                    logger.error(f"Format {format_version} does not load what was written")
+                with TimeIt(f"Format {format_version} load without data packages", logger):
+                    Context.decompress(data, stored_games)
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_multidata_benchmark()
@@ -0,0 +1,74 @@
+def run_playthrough_benchmark():
+    """Time fill and playthrough creation of a generated multi-game seed, and count the full searches the playthrough
+    culling needed compared to searching once per progression item."""
+    import argparse
+    import logging
+    import gc
+    import typing
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from BaseClasses import MultiWorld, CollectionState
+    from Fill import distribute_items_restrictive
+    from worlds import AutoWorld
+    from worlds.AutoWorld import call_all
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        gen_steps: typing.Tuple[str, ...] = (
+            "generate_early", "create_regions", "create_items", "set_rules", "generate_basic", "pre_fill")
+        games: typing.Tuple[str, ...] = (
+            "A Link to the Past", "Hollow Knight", "Rogue Legacy", "Timespinner", "Dark Souls III", "Super Mario 64")
+        players: int = 50
+
+        def setup_multiworld(self) -> MultiWorld:
+            multiworld = MultiWorld(self.players)
+            multiworld.player_name = {player: f"Tester{player}" for player in multiworld.player_ids}
+            for player in multiworld.player_ids:
+                multiworld.game[player] = self.games[(player - 1) % len(self.games)]
+            multiworld.set_seed(0)
+            multiworld.state = CollectionState(multiworld)
+            args = argparse.Namespace()
+            for player in multiworld.player_ids:
+                world_type = AutoWorld.AutoWorldRegister.world_types[multiworld.game[player]]
+                for name, option in world_type.options_dataclass.type_hints.items():
+                    getattr(args, name, None) or setattr(args, name, {})
+                    getattr(args, name)[player] = option.from_any(getattr(option, "default"))
+            multiworld.set_options(args)
+            for step in self.gen_steps:
+                call_all(multiworld, step)
+            return multiworld
+
+        def main(self):
+            multiworld = self.setup_multiworld()
+            gc.collect()
+            with TimeIt(f"{self.players} players fill", logger):
+                distribute_items_restrictive(multiworld)
+                gc.collect()
+
+            searches = 0
+            can_beat_game = multiworld.can_beat_game
+
+            def counted_can_beat_game(*args, **kwargs) -> bool:
+                nonlocal searches
+                searches += 1
+                return can_beat_game(*args, **kwargs)
+
+            multiworld.can_beat_game = counted_can_beat_game
+            progression = sum(1 for location in multiworld.get_filled_locations() if location.item.advancement)
+            with TimeIt(f"{self.players} players playthrough", logger):
+                multiworld.spoiler.create_playthrough(create_paths=False)
+                gc.collect()
+            logger.info(f"Culling the playthrough took {searches} searches for {progression} progression items.")
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_playthrough_benchmark()
@@ -0,0 +1,79 @@
+def run_reachability_benchmark():
+    """Compare fill and playthrough time of large single-game seeds with and without incremental reachability.
+    Only games that set World.incremental_reachability are benchmarked."""
+    import argparse
+    import logging
+    import gc
+    import typing
+
+    from time_it import TimeIt
+
+    from Utils import init_logging
+    from BaseClasses import MultiWorld, CollectionState
+    from Fill import distribute_items_restrictive
+    from worlds import AutoWorld
+    from worlds.AutoWorld import call_all
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    class BenchmarkRunner:
+        gen_steps: typing.Tuple[str, ...] = (
+            "generate_early", "create_regions", "create_items", "set_rules", "generate_basic", "pre_fill")
+        players: int = 100
+
+        def setup_multiworld(self, game: str) -> MultiWorld:
+            multiworld = MultiWorld(self.players)
+            multiworld.player_name = {player: f"Tester{player}" for player in multiworld.player_ids}
+            for player in multiworld.player_ids:
+                multiworld.game[player] = game
+            multiworld.set_seed(0)
+            multiworld.state = CollectionState(multiworld)
+            args = argparse.Namespace()
+            for name, option in AutoWorld.AutoWorldRegister.world_types[game].options_dataclass.type_hints.items():
+                setattr(args, name, {
+                    player: option.from_any(getattr(option, "default")) for player in multiworld.player_ids
+                })
+            multiworld.set_options(args)
+            for step in self.gen_steps:
+                call_all(multiworld, step)
+            return multiworld
+
+        def generate(self, game: str, incremental: bool) -> typing.Tuple[float, typing.Dict[str, str]]:
+            world_type = AutoWorld.AutoWorldRegister.world_types[game]
+            world_type.incremental_reachability = incremental
+            try:
+                multiworld = self.setup_multiworld(game)
+                gc.collect()
+                mode = "incremental" if incremental else "full"
+                with TimeIt(f"{game} {self.players} players fill and playthrough with {mode} search", logger) as t:
+                    distribute_items_restrictive(multiworld)
+                    multiworld.spoiler.create_playthrough(create_paths=False)
+                    gc.collect()
+                placements = {str(location): str(location.item) for location in multiworld.get_filled_locations()}
+                return t.dif, placements
+            finally:
+                world_type.incremental_reachability = True
+
+        def main(self):
+            for game in sorted(AutoWorld.AutoWorldRegister.world_types):
+                if not AutoWorld.AutoWorldRegister.world_types[game].incremental_reachability:
+                    continue
+                try:
+                    full_time, full_placements = self.generate(game, False)
+                    incremental_time, incremental_placements = self.generate(game, True)
+                    if full_placements != incremental_placements:
+                        logger.warning(f"{game} placed items differently with incremental reachability.")
+                    logger.info(f"{game} took {full_time:.4f} seconds with full search and {incremental_time:.4f} "
+                                f"with incremental search, {full_time / incremental_time:.2f}x speedup.")
+                except Exception as e:
+                    logger.exception(e)
+
+    runner = BenchmarkRunner()
+    runner.main()
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_reachability_benchmark()
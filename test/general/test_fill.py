@@ -1,11 +1,12 @@
 from typing import List, Iterable
+import random
 import unittest
 
 import Options
 from Options import Accessibility
 from worlds.AutoWorld import World
-from Fill import FillError, balance_multiworld_progression, fill_restrictive, \
-    distribute_early_items, distribute_items_restrictive
+from Fill import ExplorationState, FillError, LocationPool, balance_multiworld_progression, fill_restrictive, \
+    distribute_early_items, distribute_items_restrictive, sweep_from_pool
 from BaseClasses import Entrance, LocationProgressType, MultiWorld, Region, Item, Location, \
     ItemClassification, CollectionState
 from worlds.generic.Rules import CollectionRule, add_item_rule, locality_rules, set_rule
@@ -515,6 +516,27 @@ class TestFillRestrictive(unittest.TestCase):
         self.assertIsNot(loc0.item, player1.prog_items[0], "Filled item was still present in item pool")
 
 
+    def test_exploration_state_follows_pool(self):
+        """Test that an updated ExplorationState matches a fresh sweep of the new pool"""
+        multiworld = generate_multiworld()
+        player1 = generate_player_data(multiworld, 1, 0, 2)
+        item0, item1 = player1.prog_items
+        region = player1.generate_region(player1.menu, 1, lambda state: state.has(item0.name, player1.id))
+        event_item = Item("Event", ItemClassification.progression, None, player1.id)
+        region.locations[0].place_locked_item(event_item)
+
+        exploration = ExplorationState(multiworld.state, [item0, item1])
+        self.assertTrue(exploration.state.has("Event", player1.id))
+
+        for pool in ([item1], [item0], [item0, item1], [], [item0]):
+            state = exploration.update(pool)
+            expected = sweep_from_pool(multiworld.state, pool)
+            self.assertEqual(expected.prog_items, state.prog_items)
+            self.assertEqual(expected.events, state.events)
+            self.assertEqual(expected.can_reach(region), state.can_reach(region))
+        self.assertFalse(multiworld.state.has("Event", player1.id), "base state was modified")
+
+
 class TestDistributeItemsRestrictive(unittest.TestCase):
     def test_basic_distribute(self):
         """Test that distribute_items_restrictive is deterministic"""
@@ -800,6 +822,55 @@ class TestDistributeItemsRestrictive(unittest.TestCase):
             assert item in items_in_locations, "early item to be placed in location"
 
 
+class TestLocationPool(unittest.TestCase):
+    def test_pop_order_matches_scan(self):
+        """Test that the pool hands out the same locations as a scan over the location list"""
+        multiworld = generate_multiworld(2)
+        rand = random.Random(0)
+        items: List[Item] = []
+        for player in multiworld.player_ids:
+            player_data = generate_player_data(multiworld, player, 20, 5, 15)
+            key = player_data.prog_items[0]
+            player_data.generate_region(player_data.menu, 10, lambda state, key=key: state.has(key.name, key.player))
+            for location in player_data.locations:
+                if rand.random() < 0.3:
+                    location.progress_type = LocationProgressType.EXCLUDED
+                forbidden = rand.randrange(15)
+                add_item_rule(location, lambda item, forbidden=forbidden: not item.name.endswith(f"item{forbidden}"))
+            items += player_data.prog_items + player_data.basic_items
+        all_locations = multiworld.get_unfilled_locations()
+        rand.shuffle(items)
+
+        state = multiworld.state
+        for single_player_placement in (False, True):
+            with self.subTest(single_player_placement=single_player_placement):
+                locations = all_locations.copy()
+                pool = LocationPool(locations, single_player_placement)
+                for item in items:
+                    expected = None
+                    for i, location in enumerate(locations):
+                        if (not single_player_placement or location.player == item.player) \
+                                and location.can_fill(state, item):
+                            expected = locations.pop(i)
+                            break
+                    self.assertIs(expected, pool.pop_fillable(state, item))
+                self.assertEqual(locations, pool.to_list())
+
+    def test_single_player_placement_identical(self):
+        """Test that single player placement does not change placements of a single player"""
+        placements = []
+        for single_player_placement in (False, True):
+            multiworld = generate_multiworld()
+            player1 = generate_player_data(multiworld, 1, 10, 10)
+            for item in player1.prog_items[:-1]:
+                player1.generate_region(player1.menu, 1, lambda state, name=item.name: state.has(name, 1))
+            multiworld.random.shuffle(player1.prog_items)
+            fill_restrictive(multiworld, multiworld.state, multiworld.get_unfilled_locations(), player1.prog_items,
+                             single_player_placement)
+            placements.append({location.name: location.item.name for location in multiworld.get_filled_locations()})
+        self.assertEqual(*placements)
+
+
 class TestBalanceMultiworldProgression(unittest.TestCase):
     def assertRegionContains(self, region: Region, item: Item) -> bool:
         for location in region.locations:
@@ -69,3 +69,26 @@ class TestBase(unittest.TestCase):
                             locations.add(location)
                     self.assertGreater(len(locations), 0,
                                        msg="Need to be able to reach at least one location to get started.")
+
+    def test_incremental_reachability_matches_full_search(self):
+        """Ensure worlds using incremental reachability reach the same regions as a full search would"""
+        for game_name, world_type in AutoWorldRegister.world_types.items():
+            if not world_type.incremental_reachability:
+                continue
+            with self.subTest("Game", game=game_name):
+                multiworld = setup_solo_multiworld(world_type)
+                items = [item for item in multiworld.itempool if item.advancement]
+                multiworld.random.shuffle(items)
+                state = CollectionState(multiworld)
+                regions = list(multiworld.get_regions())
+                for item in items:
+                    state.collect(item, True)
+                    reached = {region for region in regions if region.can_reach(state)}
+                    world_type.incremental_reachability = False
+                    try:
+                        full_state = CollectionState(multiworld)
+                        full_state.prog_items = state.copy().prog_items
+                        expected = {region for region in regions if region.can_reach(full_state)}
+                    finally:
+                        world_type.incremental_reachability = True
+                    self.assertEqual(reached, expected, f"Mismatch after collecting {item}")
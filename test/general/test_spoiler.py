@@ -0,0 +1,61 @@
+import random
+import unittest
+from typing import Dict, List, Optional, Set
+
+from BaseClasses import CollectionState, Item, ItemClassification, Location
+from .test_fill import generate_multiworld
+
+
+class TestPlaythroughCulling(unittest.TestCase):
+    def setUp(self) -> None:
+        self.multiworld = generate_multiworld()
+        menu = self.multiworld.get_region("Menu", 1)
+        self.multiworld.completion_condition[1] = lambda state: state.has("Key", 1, 3) and state.has("Gem", 1, 2)
+        self.locations: List[Location] = []
+        for i in range(24):
+            location = Location(1, f"Location {i}", None, menu)
+            location.access_rule = lambda state, keys=i % 4: state.has("Key", 1, keys)
+            menu.locations.append(location)
+            self.locations.append(location)
+
+    def place_items(self, seed: int) -> None:
+        names = ["Key"] * 5 + ["Gem"] * 3 + ["Feather"] * 16
+        random.Random(seed).shuffle(names)
+        for location, name in zip(self.locations, names):
+            location.item = Item(name, ItemClassification.progression, None, 1)
+            location.item.location = location
+
+    def cull(self, cull_sphere) -> List[Set[Location]]:
+        spheres = list(self.multiworld.get_spheres())
+        states: List[Optional[CollectionState]] = [None]
+        state = CollectionState(self.multiworld)
+        for sphere in spheres:
+            for location in sphere:
+                state.collect(location.item, True, location)
+            states.append(state.copy())
+        restore_later: Dict[Location, Item] = {}
+        culled = [cull_sphere(sphere, states[num], restore_later) for num, sphere in reversed(list(enumerate(spheres)))]
+        for location, item in restore_later.items():
+            location.item = item
+        return culled
+
+    def test_same_as_one_at_a_time(self) -> None:
+        """Test that culling in batches decides the same as testing one location after the other"""
+
+        def cull_one_at_a_time(sphere: Set[Location], state: Optional[CollectionState],
+                               restore_later: Dict[Location, Item]) -> Set[Location]:
+            culled = set()
+            for location in sphere:
+                old_item, location.item = location.item, None
+                if self.multiworld.can_beat_game(state):
+                    culled.add(location)
+                    restore_later[location] = old_item
+                else:
+                    location.item = old_item
+            return culled
+
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.place_items(seed)
+                expected = self.cull(cull_one_at_a_time)
+                self.assertEqual(expected, self.cull(self.multiworld.spoiler.cull_sphere))
@@ -0,0 +1,158 @@
+import pickle
+import unittest
+from collections import Counter
+
+from BaseClasses import CollectionState, ItemClassification, Item, ItemCounter, Location, Region, SphereSearch
+from .test_fill import generate_multiworld
+
+
+class TestCollectionStateCopy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.multiworld = generate_multiworld(2)
+        for player in self.multiworld.player_ids:
+            menu = self.multiworld.get_region("Menu", player)
+            region = Region("Locked", player, self.multiworld)
+            self.multiworld.regions.append(region)
+            menu.connect(region, rule=lambda state, player=player: state.has("Key", player))
+        self.state = CollectionState(self.multiworld)
+
+    def key(self, player: int) -> Item:
+        return Item("Key", ItemClassification.progression, None, player)
+
+    def test_copy_is_independent(self):
+        """Tests that collecting into a copy or its original does not leak into the other"""
+        self.state.collect(self.key(1), True)
+        copy = self.state.copy()
+        copy.collect(self.key(2), True)
+        self.state.collect(self.key(1), True)
+
+        self.assertEqual(self.state.count("Key", 1), 2)
+        self.assertEqual(copy.count("Key", 1), 1)
+        self.assertEqual(self.state.count("Key", 2), 0)
+        self.assertEqual(copy.count("Key", 2), 1)
+        self.assertFalse(self.state.can_reach("Locked", "Region", 2))
+        self.assertTrue(copy.can_reach("Locked", "Region", 2))
+
+    def test_copy_of_copy(self):
+        """Tests that untouched players are still resolved through several generations of copies"""
+        self.state.collect(self.key(2), True)
+        self.assertTrue(self.state.can_reach("Locked", "Region", 2))
+        copy = self.state.copy().copy().copy()
+        self.state.remove(self.key(2))
+
+        self.assertTrue(copy.can_reach("Locked", "Region", 2))
+        self.assertFalse(self.state.can_reach("Locked", "Region", 2))
+        self.assertEqual(copy.prog_items, {1: {}, 2: {"Key": 1}})
+        self.assertEqual(set(copy.reachable_regions), set(self.multiworld.player_ids))
+
+    def test_many_copies(self):
+        """Tests that copying touched states thousands of times keeps lookups one level deep"""
+        state = self.state
+        for _ in range(5000):
+            state.collect(self.key(1), True)
+            state = state.copy()
+        self.assertEqual(state.count("Key", 1), 5000)
+        self.assertIn(2, state.prog_items)
+        self.assertIn(2, state.reachable_regions)
+        self.assertEqual(state.prog_items.get(2), {})
+        self.assertTrue(state.can_reach("Locked", "Region", 1))
+        self.assertNotIsInstance(state.prog_items.source, type(state.prog_items))
+
+    def test_copy_functions(self):
+        """Tests that additional_copy_functions still get to copy their data"""
+        def copy_mixin(state: CollectionState, ret: CollectionState) -> CollectionState:
+            ret.copied_from = state
+            return ret
+
+        CollectionState.additional_copy_functions.append(copy_mixin)
+        try:
+            copy = self.state.copy()
+        finally:
+            CollectionState.additional_copy_functions.remove(copy_mixin)
+        self.assertIs(copy.copied_from, self.state)
+
+
+class TestItemCounter(unittest.TestCase):
+    groups = {
+        "Keys": {"Small Key", "Big Key"},
+        "Big": {"Big Key", "Big Bomb"},
+        "Everything": {"Small Key", "Big Key", "Big Bomb", "Bow"},
+    }
+
+    def setUp(self) -> None:
+        group_ids = {group_name: group_id for group_id, group_name in enumerate(self.groups)}
+        item_group_ids = {item_name: tuple(group_ids[group_name] for group_name, group in self.groups.items()
+                                           if item_name in group)
+                          for item_name in self.groups["Everything"]}
+        self.counter = ItemCounter(group_ids, item_group_ids)
+
+    def assert_group_counts(self, counter: ItemCounter) -> None:
+        for group_name, group in self.groups.items():
+            self.assertEqual(sum(counter[item_name] for item_name in group), counter.count_group(group_name),
+                             group_name)
+
+    def test_group_counts_follow_changes(self):
+        """Tests that the group counts match the item counts after each way of changing them"""
+        counter = self.counter
+        changes = (
+            lambda: counter.update(["Small Key", "Small Key", "Big Key", "Bow"]),
+            lambda: counter.__setitem__("Big Bomb", 3),
+            lambda: counter.__iadd__(Counter({"Big Key": 2})),
+            lambda: counter.subtract({"Small Key": 1}),
+            lambda: counter.__delitem__("Bow"),
+            lambda: counter.pop("Big Bomb"),
+            lambda: counter.setdefault("Big Bomb", 2),
+            lambda: counter.update(Unknown=1),
+            lambda: counter.__isub__(Counter({"Big Key": 3})),
+            counter.popitem,
+            counter.clear,
+        )
+        for change in changes:
+            change()
+            self.assert_group_counts(counter)
+
+    def test_copies(self):
+        """Tests that copies keep their group counts and don't share them"""
+        self.counter.update(["Small Key", "Big Key"])
+        for copy in (self.counter.copy(), pickle.loads(pickle.dumps(self.counter))):
+            self.assertIs(type(copy), ItemCounter)
+            self.assertEqual(copy, self.counter)
+            self.assert_group_counts(copy)
+            copy["Big Key"] += 1
+            self.assertEqual(self.counter.count_group("Keys"), 2)
+            self.assertEqual(copy.count_group("Keys"), 3)
+
+
+class TestSphereSearch(unittest.TestCase):
+    def test_spheres_match_scan(self):
+        """Tests that spheres hold the same locations, in the same order, as scanning every remaining location"""
+        multiworld = generate_multiworld()
+        menu = multiworld.get_region("Menu", 1)
+        locations = []
+        parent = menu
+        for i in range(5):
+            region = Region(f"Region {i}", 1, multiworld)
+            multiworld.regions.append(region)
+            parent.connect(region, rule=lambda state, i=i: state.has(f"Key {i}", 1))
+            for region_to_fill in (parent, region):
+                location = Location(1, f"Key {i} in {region_to_fill.name}", None, region_to_fill)
+                location.access_rule = lambda state, i=i: state.has(f"Key {i - 1}", 1) or not i
+                location.place_locked_item(Item(f"Key {i}", ItemClassification.progression, None, 1))
+                region_to_fill.locations.append(location)
+                locations.append(location)
+            parent = region
+
+        search = SphereSearch(CollectionState(multiworld), set(locations))
+        scan_state = CollectionState(multiworld)
+        scan_remaining = set(locations)
+        while scan_remaining:
+            expected = {location for location in scan_remaining if location.can_reach(scan_state)}
+            scan_remaining -= expected
+            for location in expected:
+                scan_state.collect(location.item, True, location)
+
+            sphere = search.next_sphere()
+            self.assertEqual(list(expected), list(sphere))
+            self.assertEqual(scan_remaining, search.remaining)
+            search.collect_sphere(sphere)
+        self.assertFalse(search)
@@ -0,0 +1,67 @@
+# Tests for NetUtils.encode and NetUtils.decode
+import collections
+import enum
+import typing
+import unittest
+
+from NetUtils import Hint, JSONTypes, NetworkItem, NetworkPlayer, NetworkSlot, SlotType, decode, encode, _encode, \
+    _scan_for_TypedTuples
+
+
+class Color(enum.Enum):
+    red = 1
+
+
+class Empty(typing.NamedTuple):
+    pass
+
+
+class TestEncode(unittest.TestCase):
+    def assertEncodesLikeScan(self, obj: typing.Any) -> None:
+        self.assertEqual(_encode(_scan_for_TypedTuples(obj)), encode(obj))
+
+    def test_same_as_scan(self) -> None:
+        """Test that encode writes the same text as converting NamedTuples first"""
+        item = NetworkItem(1, 2, 3, 4)
+        for obj in (
+                1, "text", None, 1.5, float("nan"), True, [], {}, (), set(), item, Empty(),
+                [item, item], (item,), {item}, frozenset((1, 2)), [item, 1], [[item]],
+                {"items": [item]}, {1: item, 2.5: [item], False: {"a": [1, "ü\n\""]}, None: ()},
+                [{"text": "1", "type": JSONTypes.player_id}, {"text": 5, "player": 1}],
+                NetworkItem(True, 2, 3), NetworkItem(1.5, 2, 3), NetworkItem(1 << 70, -2, 0),
+                NetworkSlot("Player", "Game", SlotType.group, [1, 2]), NetworkPlayer(0, 1, "Alias", "Name"),
+                Hint(1, 2, 3, 4, True, "Entrance", 1), Hint(1, 2, 3, 4, False).as_network_message(),
+                [NetworkItem(1, 2, 3), NetworkItem(True, 2, 3)], [NetworkItem(1, 2, 3), NetworkPlayer(0, 1, "", "")],
+                collections.OrderedDict(a=item), collections.defaultdict(list, {"a": [1]}),
+                [{"a": {"b": [1, {"c": item}]}}], {SlotType.player: 1, "slots": {SlotType.group}},
+        ):
+            with self.subTest(obj=obj):
+                self.assertEncodesLikeScan(obj)
+
+    def test_errors(self) -> None:
+        """Test that encode refuses the same things as the C encoder"""
+        for obj in ({(1, 2): 1}, [b"bytes"], {"a": [Color.red]}, [NetworkItem(1, 2, 3), object()]):
+            with self.subTest(obj=obj):
+                with self.assertRaises(TypeError):
+                    _encode(_scan_for_TypedTuples(obj))
+                with self.assertRaises(TypeError):
+                    encode(obj)
+
+
+class TestDecode(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        """Test that NamedTuples decode into their class"""
+        packet = [{"cmd": "ReceivedItems", "index": 0, "items": [NetworkItem(1, 2, 3, 4), NetworkItem(5, 6, 7)]},
+                  {"cmd": "Connected", "players": [NetworkPlayer(0, 1, "Alias", "Name")],
+                   "slot_info": {"1": NetworkSlot("Name", "Game", SlotType.player, [])}}]
+        decoded = decode(encode(packet))
+        self.assertEqual(packet, decoded)
+        self.assertIs(NetworkItem, type(decoded[0]["items"][0]))
+        self.assertIs(NetworkSlot, type(decoded[1]["slot_info"]["1"]))
+
+    def test_partial(self) -> None:
+        """Test that missing fields take their default and unknown ones are dropped"""
+        self.assertEqual(NetworkItem(1, 2, 3, 0), decode('{"item":1,"location":2,"player":3,"class":"NetworkItem"}'))
+        self.assertEqual(NetworkItem(1, 2, 3, 4),
+                         decode('{"item":1,"location":2,"player":3,"flags":4,"extra":5,"class":"NetworkItem"}'))
+        self.assertEqual({"item": 1, "class": "Unknown"}, decode('{"item":1,"class":"Unknown"}'))
@@ -1,4 +1,7 @@
 # Tests for _speedups.LocationStore and NetUtils._LocationStore
+import logging
+import random
+import time
 import typing
 import unittest
 import warnings
@@ -39,6 +42,36 @@ one_state: State = {
 }
 
 
+def make_random_data(players: int, locations: int, items: int, seed: int = 0) -> RawLocations:
+    """Sender 1 to players with locations each, holding one of items for a random receiver, possibly an item link."""
+    rand = random.Random(seed)
+    return {
+        sender: {
+            location: (rand.randrange(items), rand.randint(1, players + 2), rand.choice((0, 1, 2, 4)))
+            for location in rand.sample(range(locations * 2), locations)
+        } for sender in rand.sample(range(1, players + 1), players)
+    }
+
+
+def scan_find_item(data: RawLocations, slots: typing.Set[int], seeked_item_id: int
+                   ) -> typing.List[typing.Tuple[int, int, int, int, int]]:
+    """find_item as a scan over all locations in the order of the sorted store."""
+    return [(sender, location, item, receiver, flags)
+            for sender, locations in sorted(data.items())
+            for location, (item, receiver, flags) in sorted(locations.items())
+            if receiver in slots and item == seeked_item_id]
+
+
+def scan_get_for_player(data: RawLocations, slot: int) -> typing.Dict[int, typing.Set[int]]:
+    """get_for_player as a scan over all locations."""
+    all_locations: typing.Dict[int, typing.Set[int]] = {}
+    for sender, locations in data.items():
+        for location, (item, receiver, flags) in locations.items():
+            if receiver == slot:
+                all_locations.setdefault(sender, set()).add(location)
+    return all_locations
+
+
 class Base:
     class TestLocationStore(unittest.TestCase):
         """Test method calls on a loaded store."""
@@ -181,6 +214,50 @@ class Base:
             self.assertEqual(len(store[1]), 1)
             self.assertEqual(len(store[2]), 0)
 
+    class TestLocationStoreIndexes(unittest.TestCase):
+        """Test that indexed lookups of a given store type find the same as a scan over all locations."""
+        type: type
+
+        def test_find_item(self) -> None:
+            for seed in range(5):
+                data = make_random_data(20, 50, 30, seed)
+                store = self.type(data)
+                for slots in ({1}, {22}, {0}, {50}, {3, 7}, {1, 2, 3, 21, 22}, set()):
+                    for item in (0, 7, 29, 30):
+                        with self.subTest(seed=seed, slots=slots, item=item):
+                            # for sorted stores, results have to come in the same order as a scan
+                            expected = scan_find_item(data, slots, item)
+                            if self.type is _LocationStore:
+                                self.assertEqual(sorted(store.find_item(slots, item)), expected)
+                            else:
+                                self.assertEqual(list(store.find_item(slots, item)), expected)
+
+        def test_get_for_player(self) -> None:
+            for seed in range(5):
+                data = make_random_data(20, 50, 30, seed)
+                store = self.type(data)
+                for slot in (0, 1, 5, 20, 21, 22, 23):
+                    with self.subTest(seed=seed, slot=slot):
+                        self.assertEqual(dict(store.get_for_player(slot)), scan_get_for_player(data, slot))
+
+        def test_timings(self) -> None:
+            """Time loading a room of 1000 slots with 100 locations each and looking up hints and collects"""
+            data = make_random_data(1000, 100, 200)
+            start = time.perf_counter()
+            store = self.type(data)
+            loaded = time.perf_counter()
+            for slot in range(1, 1001):
+                for item in range(10):
+                    for _ in store.find_item({slot}, item):
+                        pass
+            hinted = time.perf_counter()
+            for slot in range(1, 1001):
+                store.get_for_player(slot)
+            collected = time.perf_counter()
+            logging.info(f"{self.type.__name__} of {len(data) * 100} locations loaded in {loaded - start:.3f}s, "
+                         f"10000 item lookups in {hinted - loaded:.3f}s, "
+                         f"1000 player lookups in {collected - hinted:.3f}s")
+
 
 class TestPurePythonLocationStore(Base.TestLocationStore):
     """Run base method tests for pure python implementation."""
@@ -196,6 +273,13 @@ class TestPurePythonLocationStoreConstructor(Base.TestLocationStoreConstructor):
         super().setUp()
 
 
+class TestPurePythonLocationStoreIndexes(Base.TestLocationStoreIndexes):
+    """Run index tests for the pure python implementation."""
+    def setUp(self) -> None:
+        self.type = _LocationStore
+        super().setUp()
+
+
 @unittest.skipIf(LocationStore is _LocationStore, "_speedups not available")
 class TestSpeedupsLocationStore(Base.TestLocationStore):
     """Run base method tests for cython implementation."""
@@ -236,3 +320,11 @@ class TestSpeedupsLocationStoreConstructor(Base.TestLocationStoreConstructor):
             self.type({
                 1: {1: None},
             })
+
+
+@unittest.skipIf(LocationStore is _LocationStore, "_speedups not available")
+class TestSpeedupsLocationStoreIndexes(Base.TestLocationStoreIndexes):
+    """Run index tests for the cython implementation."""
+    def setUp(self) -> None:
+        self.type = LocationStore
+        super().setUp()
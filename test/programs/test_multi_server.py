@@ -1,5 +1,19 @@
+import asyncio
+import io
+import json
+import os
+import pickle
+import tempfile
+import typing
 import unittest
-from MultiServer import Context, ServerCommandProcessor
+import zlib
+
+from MultiServer import Client, ClientMessageProcessor, Context, ServerCommandProcessor, apply_save_journal, \
+    collect_player, encode_save_journal, process_client_cmd, process_measured, register_location_checks, send_items_to
+from NetUtils import DataPackageStore, Hint, LocationStore, NetworkItem, NetworkSlot, SlotType, encode, \
+    write_multidata
+from Utils import Version
+from Utils import restricted_loads
 
 
 class TestResolvePlayerName(unittest.TestCase):
@@ -38,3 +52,436 @@ class TestResolvePlayerName(unittest.TestCase):
         assert p.resolve_player("ABC") == (1, 2, "abc"), "case insensitive resolves when 1 match"
         assert p.resolve_player("abcd") == (1, 3, "abCD"), "case insensitive resolves when 1 match"
         assert not p.resolve_player("aB"), "partial name shouldn't resolve to player"
+
+
+class RecordingContext(Context):
+    """Context of a small room, that records frames instead of sending them."""
+    def __init__(self, **kwargs: typing.Any) -> None:
+        super().__init__("", 0, "", "", 0, 0, False, **kwargs)
+        self.frames: typing.List[typing.Tuple[typing.List[Client], typing.List[dict]]] = []
+        self.locations = LocationStore({
+            1: {1: (10, 1, 0), 2: (11, 2, 1), 3: (12, 2, 0), 6: (15, 4, 0)},
+            2: {4: (13, 1, 0), 7: (16, 2, 0)},
+            3: {5: (14, 3, 0)},
+        })
+        self.player_names = {(0, slot): f"Player {slot}" for slot in (1, 2, 3, 4)}
+        self.groups = {4: {2, 3}}
+        self.clients = {0: {slot: [] for slot in (1, 2, 3, 4)}}
+
+    def _load_game_data(self) -> None:
+        pass
+
+    async def broadcast_send_encoded_msgs(self, endpoints: typing.Iterable[Client], msg: str) -> bool:
+        self.frames.append((list(endpoints), json.loads(msg)))
+        return True
+
+
+class TestLocationChecks(unittest.IsolatedAsyncioTestCase):
+    def add_client(self, slot: int, items_handling: int = 0b111) -> Client:
+        client = Client(None, self.ctx)
+        client.auth = True
+        client.team = 0
+        client.slot = slot
+        client.items_handling = items_handling
+        self.ctx.endpoints.append(client)
+        self.ctx.clients[0].setdefault(slot, []).append(client)
+        return client
+
+    def setUp(self) -> None:
+        self.ctx = RecordingContext()
+
+    async def test_one_frame_per_client(self) -> None:
+        """Test that a batch of checks reaches each client as one frame with the messages in order"""
+        player_1 = self.add_client(1)
+        players_2 = [self.add_client(2), self.add_client(2)]
+        player_3 = self.add_client(3)
+        register_location_checks(self.ctx, 0, 1, [1, 2, 3, 9])
+        await asyncio.sleep(0)
+
+        frames = {id(endpoint): msgs for endpoints, msgs in self.ctx.frames for endpoint in endpoints}
+        self.assertEqual(4, len(frames))
+        self.assertEqual(3, len(self.ctx.frames))  # both clients of slot 2 share their frame
+        for client in (player_1, *players_2, player_3):
+            msgs = frames[id(client)]
+            self.assertEqual(["ItemSend"] * 3, [msg["type"] for msg in msgs[:3]])
+            self.assertEqual([1, 2, 3], sorted(msg["item"]["location"] for msg in msgs[:3]))
+            if client is player_3:
+                self.assertEqual(3, len(msgs))
+        self.assertEqual(["ReceivedItems", "RoomUpdate"], [msg["cmd"] for msg in frames[id(player_1)][3:]])
+        self.assertEqual([10], [item["item"] for item in frames[id(player_1)][3]["items"]])
+        self.assertEqual([1, 2, 3], sorted(frames[id(player_1)][4]["checked_locations"]))
+        for client in players_2:
+            self.assertEqual(["ReceivedItems"], [msg["cmd"] for msg in frames[id(client)][3:]])
+            self.assertEqual([11, 12], sorted(item["item"] for item in frames[id(client)][3]["items"]))
+            self.assertEqual(2, client.send_index)
+
+        self.ctx.frames.clear()
+        register_location_checks(self.ctx, 0, 1, [1, 2])
+        await asyncio.sleep(0)
+        self.assertEqual([], self.ctx.frames)
+
+
+    async def test_dirty_slots(self) -> None:
+        """Test that only clients of slots that received items are visited, including group members"""
+        player_1 = self.add_client(1)
+        player_2, player_2_local = self.add_client(2), self.add_client(2, 0b001)
+        player_3, player_3_no_items = self.add_client(3), self.add_client(3, 0b000)
+        register_location_checks(self.ctx, 0, 1, [6])
+        await asyncio.sleep(0)
+        frames = {id(endpoint): msgs for endpoints, msgs in self.ctx.frames for endpoint in endpoints}
+        for client in (player_2, player_2_local, player_3):
+            self.assertEqual([15], [item["item"] for item in frames[id(client)][-1]["items"]])
+        self.assertEqual(["PrintJSON", "RoomUpdate"], [msg["cmd"] for msg in frames[id(player_1)]])
+        self.assertEqual(["PrintJSON"], [msg["cmd"] for msg in frames[id(player_3_no_items)]])
+        self.assertEqual(1, self.ctx.skipped_item_deliveries)
+        self.assertEqual(set(), self.ctx.dirty_slots)
+
+        self.ctx.frames.clear()
+        register_location_checks(self.ctx, 0, 2, [7])
+        await asyncio.sleep(0)
+        frames = {id(endpoint): msgs for endpoints, msgs in self.ctx.frames for endpoint in endpoints}
+        self.assertEqual([16], [item["item"] for item in frames[id(player_2)][1]["items"]])
+        self.assertEqual(["PrintJSON", "RoomUpdate"], [msg["cmd"] for msg in frames[id(player_2_local)]])
+        self.assertEqual(1, player_2_local.send_index)
+        self.assertEqual(1 + 3, self.ctx.skipped_item_deliveries)
+
+
+
+class ConnectingTestCase(unittest.IsolatedAsyncioTestCase):
+    """Connects clients to a RecordingContext through Connect packets."""
+    def setUp(self) -> None:
+        self.ctx = ctx = RecordingContext()
+        ctx.connect_names = {name: team_slot for team_slot, name in ctx.player_names.items()}
+        ctx.slot_info = {slot: NetworkSlot(f"Player {slot}", "Game", SlotType.player) for slot in (1, 2, 3)}
+        ctx.slot_info[4] = NetworkSlot("Player 4", "Game", SlotType.group, [2, 3])
+        ctx.games = {slot: "Game" for slot in ctx.slot_info}
+        ctx.minimum_client_versions = {slot: Version(0, 0, 0) for slot in ctx.slot_info}
+        ctx.slot_data = {slot: {"option": slot, "list": [1.5, None]} for slot in ctx.slot_info}
+        ctx.start_inventory = {1: [NetworkItem(20, -2, 0)]}
+        self.sent: typing.List[typing.Tuple[Client, str]] = []
+
+        async def send_msgs(endpoint: Client, msgs: typing.Iterable[dict]) -> bool:
+            self.sent.append((endpoint, ctx.dumper(msgs)))
+            return True
+
+        ctx.send_msgs = send_msgs
+
+    async def join(self, slot: int, tags: typing.Sequence[str] = ()) -> Client:
+        client = Client(None, self.ctx)
+        self.ctx.endpoints.append(client)
+        self.sent.clear()
+        await process_client_cmd(self.ctx, client, {
+            "cmd": "Connect", "password": None, "name": f"Player {slot}", "game": "Game", "uuid": "",
+            "version": Version(0, 4, 4), "items_handling": 0b111, "tags": list(tags), "slot_data": True})
+        return client
+
+
+class TestConnect(ConnectingTestCase):
+    async def connect(self, slot: int) -> typing.List[dict]:
+        client = await self.join(slot)
+        frame = next(frame for endpoint, frame in self.sent if endpoint is client and "Connected" in frame)
+        return json.loads(frame)
+
+    def expected(self, slot: int) -> typing.List[dict]:
+        """Connected packet of slot encoded from scratch"""
+        ctx = self.ctx
+        items = ctx.start_inventory.get(slot, []) + ctx.received_items.get((0, slot, True), [])
+        packet = [{"cmd": "Connected", "team": 0, "slot": slot, "players": ctx.get_players_package(),
+                   "missing_locations": ctx.locations.get_missing(ctx.location_checks, 0, slot),
+                   "checked_locations": ctx.locations.get_checked(ctx.location_checks, 0, slot),
+                   "slot_info": ctx.slot_info, "hint_points": 0, "slot_data": ctx.slot_data[slot]}]
+        if items:
+            packet.append({"cmd": "ReceivedItems", "index": 0, "items": items})
+        return json.loads(encode(packet))
+
+    async def test_reconnect(self) -> None:
+        """Test that cached parts of the Connected packet are the same as encoding them again, also after changes"""
+        for slot in (1, 2, 1):
+            self.assertEqual(self.expected(slot), await self.connect(slot))
+        players = self.ctx.get_encoded_players_package()
+        self.assertIs(players, self.ctx.get_encoded_players_package())
+
+        register_location_checks(self.ctx, 0, 1, [1, 2])
+        send_items_to(self.ctx, 0, 1, NetworkItem(30, -1, 0))
+        ClientMessageProcessor(self.ctx, self.ctx.clients[0][1][0])("!alias One")
+        for slot in (1, 2, 3):
+            self.assertEqual(self.expected(slot), await self.connect(slot))
+        self.assertEqual("One (Player 1)", (await self.connect(2))[0]["players"][0]["alias"])
+        self.assertIsNot(players, self.ctx.get_encoded_players_package())
+
+
+class TestBounce(ConnectingTestCase):
+    async def bounce(self, sender: Client, **targets: typing.List[typing.Any]) -> typing.Set[Client]:
+        """Clients sender's Bounce reaches, all in the same frame"""
+        await asyncio.sleep(0)
+        self.ctx.frames.clear()
+        await process_client_cmd(self.ctx, sender, {"cmd": "Bounce", "data": {"time": 1.5}, **targets})
+        await asyncio.sleep(0)
+        self.assertLessEqual(len(self.ctx.frames), 1)
+        for endpoints, msgs in self.ctx.frames:
+            self.assertEqual([{"cmd": "Bounced", "data": {"time": 1.5}, **targets}], msgs)
+            return set(endpoints)
+        return set()
+
+    async def test_routing(self) -> None:
+        """Test that Bounces reach clients by game, tag and slot, also after tags change or clients leave"""
+        player_1 = await self.join(1, ["DeathLink"])
+        player_2 = await self.join(2)
+        player_3 = await self.join(3, ["DeathLink", "Tracker"])
+        self.assertEqual({player_1, player_3}, await self.bounce(player_2, tags=["DeathLink"]))
+        self.assertEqual({player_2}, await self.bounce(player_1, slots=[2, 5]))
+        self.assertEqual({player_1, player_2, player_3}, await self.bounce(player_1, games=["Game"]))
+        self.assertEqual({player_2, player_3}, await self.bounce(player_1, tags=["Tracker"], slots=[2]))
+        self.assertEqual(set(), await self.bounce(player_1, games=["Other Game"], tags=["Other"]))
+
+        await process_client_cmd(self.ctx, player_2, {"cmd": "ConnectUpdate", "tags": ["DeathLink"]})
+        await process_client_cmd(self.ctx, player_1, {"cmd": "ConnectUpdate", "tags": ["Tracker"]})
+        self.assertEqual({player_2, player_3}, await self.bounce(player_2, tags=["DeathLink"]))
+        self.assertEqual({player_1, player_3}, await self.bounce(player_2, tags=["Tracker"]))
+
+        await self.ctx.disconnect(player_3)
+        self.assertEqual({player_2}, await self.bounce(player_2, tags=["DeathLink"]))
+        self.assertEqual({player_1, player_2}, await self.bounce(player_2, games=["Game"]))
+        await self.ctx.disconnect(player_1)
+        await self.ctx.disconnect(player_2)
+        self.assertEqual({}, self.ctx.clients_by_tag)
+        self.assertEqual({}, self.ctx.clients_by_game)
+
+
+class TestMetrics(ConnectingTestCase):
+    async def test_metrics(self) -> None:
+        """Test that enabled metrics count packets, chat commands and bytes by kind, and show in /metrics"""
+        output: typing.List[str] = []
+        commands = ServerCommandProcessor(self.ctx)
+        commands.output = output.append
+        self.assertFalse(commands("/metrics"))
+        commands("/metrics on")
+        metrics = self.ctx.metrics
+        self.assertIsNotNone(metrics)
+
+        client = Client(None, self.ctx)
+        self.ctx.endpoints.append(client)
+        data = encode([{"cmd": "Connect", "password": None, "name": "Player 1", "game": "Game", "uuid": "",
+                        "version": Version(0, 4, 4), "items_handling": 0b111, "tags": [], "slot_data": True},
+                       {"cmd": "Say", "text": "!players"}, {"cmd": "Say", "text": "hello"}, {"cmd": "Unknown"},
+                       {"cmd": ["Say"]}])
+        await process_measured(self.ctx, client, data, metrics)
+        self.assertEqual([1, len(data)], metrics.received)
+        calls = {kind: timing[0] for kind, timing in metrics.timings.items()}
+        self.assertEqual({"decode": 1, "cmd:Connect": 1, "cmd:Say": 2, "cmd:other": 2, "command:players": 1,
+                          "command:chat": 1}, {kind: count for kind, count in calls.items() if kind != "loop_lag"})
+        for timing in metrics.timings.values():
+            self.assertEqual(timing[0], sum(timing[3:]))
+
+        metrics.record_sent('[{"cmd":"PrintJSON","data":[{"text":"ü"}]}]', 3)
+        self.assertEqual([1, 3, 3 * 44], metrics.sent["PrintJSON"])
+        json.dumps(metrics.as_dict())
+        self.assertTrue(commands("/metrics"))
+        self.assertIn("cmd:Say: 2 calls", output[-1])
+        self.assertIn("sent PrintJSON: 1 frames to 3 receivers", output[-1])
+
+        commands("/metrics reset")
+        self.assertIsNot(metrics, self.ctx.metrics)
+        commands("/metrics off")
+        self.assertIsNone(self.ctx.metrics)
+
+
+class TestSaveJournal(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.ctx = RecordingContext(journal_saves=True)
+        self.ctx.save_filename = os.path.join(self.directory.name, "test.apsave")
+        self.ctx.saving = True
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def load(self) -> dict:
+        with open(self.ctx.save_filename, "rb") as f:
+            save = restricted_loads(zlib.decompress(f.read()))
+        with open(self.ctx.save_filename + ".journal", "rb") as f:
+            return apply_save_journal(save, [f.read()])
+
+    def play(self) -> None:
+        register_location_checks(self.ctx, 0, 1, [1, 2])
+        self.ctx.notify_hints(0, [Hint(1, 2, 7, 16, False), Hint(2, 3, 5, 14, False)])
+        self.ctx.hints_used[0, 1] += 1
+        self.ctx.journal("hints_used", (0, 1), self.ctx.hints_used[0, 1])
+        self.ctx.stored_data["key"] = [1, 2]
+        self.ctx.journal("stored_data", "key", [1, 2])
+        self.ctx.name_aliases[0, 2] = "Alias"
+        self.ctx.journal("name_aliases", (0, 2), "Alias")
+        collect_player(self.ctx, 0, 2)
+        self.ctx.random.random()
+        register_location_checks(self.ctx, 0, 2, [7])
+        del self.ctx.name_aliases[0, 2]
+        self.ctx.journal("name_aliases", (0, 2), None)
+        self.ctx.hint_cost = 5
+
+    def assertSaveEqual(self, expected: dict, save: dict) -> None:
+        for key in expected:
+            if key in ("hints_used", "location_checks", "hints", "client_game_state"):
+                # reading these defaultdicts adds empty values, which don't need to be journaled
+                self.assertEqual({slot: value for slot, value in expected[key].items() if value},
+                                 {slot: value for slot, value in save[key].items() if value}, key)
+            else:
+                self.assertEqual(expected[key], save[key], key)
+
+    async def test_journal(self) -> None:
+        """Test that snapshot and journal load back what a full save contains"""
+        self.ctx._save()  # first save writes a snapshot
+        self.play()
+        self.ctx._save()
+        self.assertEqual(1, self.ctx.journal_generation)
+        self.assertGreater(os.path.getsize(self.ctx.save_filename + ".journal"), 0)
+        self.assertSaveEqual(self.ctx.get_save(), self.load())
+
+    async def test_compaction(self) -> None:
+        """Test that a journal larger than the snapshot is folded into a new snapshot"""
+        self.ctx._save()
+        self.play()
+        self.ctx._save()
+        self.ctx.journal_size = self.ctx.snapshot_size + (1 << 16)  # as if many changes were journaled
+        self.ctx.stored_data["key"] = 3
+        self.ctx.journal("stored_data", "key", 3)
+        self.ctx._save()
+        self.assertEqual(2, self.ctx.journal_generation)
+        self.assertEqual(0, os.path.getsize(self.ctx.save_filename + ".journal"))
+        self.assertSaveEqual(self.ctx.get_save(), self.load())
+
+    async def test_incremental(self) -> None:
+        """Test that new frames apply to an already applied save, leaving the saves they were applied to as they are"""
+        self.ctx._save()
+        with open(self.ctx.save_filename, "rb") as f:
+            snapshot = restricted_loads(zlib.decompress(f.read()))
+        snapshot_data = pickle.dumps(snapshot)
+        register_location_checks(self.ctx, 0, 1, [1])
+        self.ctx._save()
+        with open(self.ctx.save_filename + ".journal", "rb") as f:
+            first = f.read()
+        applied = apply_save_journal(snapshot, [first])
+        applied_data = pickle.dumps(applied)
+        self.play()
+        self.ctx._save()
+        with open(self.ctx.save_filename + ".journal", "rb") as f:
+            delta = f.read()[len(first):]
+        self.assertSaveEqual(self.ctx.get_save(), apply_save_journal(applied, [delta]))
+        self.assertEqual(snapshot_data, pickle.dumps(snapshot))
+        self.assertEqual(applied_data, pickle.dumps(applied))
+
+    async def test_failed_save(self) -> None:
+        """Test that changes of a save that failed to write are kept for the next save"""
+        self.ctx._save()
+        self.play()
+        records = list(self.ctx.save_journal)
+        journaled_values = dict(self.ctx.journaled_values)
+        append = self.ctx._append_save_journal
+
+        def append_cut_off(frame: bytes) -> None:
+            append(frame[:len(frame) // 2])
+            raise OSError("disk full")
+
+        self.ctx._append_save_journal = append_cut_off
+        with self.assertLogs(level="ERROR"):
+            self.assertFalse(self.ctx._save())
+        self.assertEqual(records, list(self.ctx.save_journal))
+        self.assertEqual(journaled_values, self.ctx.journaled_values)
+        self.ctx._append_save_journal = append
+        self.assertTrue(self.ctx._save())
+        self.assertSaveEqual(self.ctx.get_save(), self.load())
+
+    async def test_damaged_journal(self) -> None:
+        """Test that frames of an older snapshot and a cut off frame are ignored"""
+        self.ctx._save()
+        self.play()
+        save = self.ctx.get_save()
+        self.ctx._save()
+        with open(self.ctx.save_filename + ".journal", "ab") as f:
+            f.write(encode_save_journal(0, [("stored_data", "key", "old")]))
+            f.write(encode_save_journal(1, [("stored_data", "key", "cut off")])[:-1])
+        self.assertSaveEqual(save, self.load())
+
+
+class TestMultidata(unittest.TestCase):
+    @staticmethod
+    def make_multidata(slots: int, locations: int, games: int) -> dict:
+        data_package = {f"Game {game}": {
+            "item_name_to_id": {f"Item {item}": item for item in range(locations)},
+            "location_name_to_id": {f"Location {location}": location for location in range(locations)},
+            "item_name_groups": {"Everything": [f"Item {item}" for item in range(locations)]},
+            "location_name_groups": {},
+            "checksum": f"checksum {game}",
+            "version": 0,
+        } for game in range(games)}
+        return {
+            "slot_data": {slot: {"seed": slot, "options": list(range(50))} for slot in range(1, slots + 1)},
+            "slot_info": {slot: NetworkSlot(f"Player {slot}", f"Game {slot % games}", SlotType.player)
+                          for slot in range(1, slots + 1)},
+            "locations": {slot: {location: (location, slot % slots + 1, 0) for location in range(locations)}
+                          for slot in range(1, slots + 1)},
+            "precollected_hints": {slot: {Hint(slot, slot, 1, 2, False)} for slot in range(1, slots + 1)},
+            "version": (0, 4, 4),
+            "datapackage": data_package,
+        }
+
+    @staticmethod
+    def write(multidata: dict, format_version: int) -> bytes:
+        stream = io.BytesIO()
+        write_multidata(stream, multidata, format_version=format_version)
+        return stream.getvalue()
+
+    def test_round_trip(self) -> None:
+        """Test that both formats read back what was written"""
+        multidata = self.make_multidata(5, 20, 2)
+        for format_version in (3, 4):
+            with self.subTest(format_version=format_version):
+                data = self.write(multidata, format_version)
+                self.assertEqual(format_version, data[0])
+                self.assertEqual(multidata, Context.decompress(data))
+
+    def test_skip_known_data_packages(self) -> None:
+        """Test that data packages with a known checksum are not unpacked"""
+        multidata = self.make_multidata(5, 20, 2)
+        decompressed = Context.decompress(self.write(multidata, 4), {"checksum 1"})
+        self.assertEqual(multidata["datapackage"]["Game 0"], decompressed["datapackage"]["Game 0"])
+        self.assertEqual({"checksum": "checksum 1"}, decompressed["datapackage"]["Game 1"])
+        self.assertEqual(multidata["locations"], decompressed["locations"])
+
+
+class TestDataPackageStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.games = TestMultidata.make_multidata(1, 20, 3)["datapackage"]
+        self.games["Game 2"]["item_name_to_id"] = {f"Other Item {item}": item + 10 for item in range(20)}
+        self.path = DataPackageStore.write(self.directory.name, self.games)
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_names(self) -> None:
+        """Test that names are found by ID, with the last game winning shared IDs"""
+        store = DataPackageStore(self.path)
+        self.assertEqual(30, len(store.item_names))
+        self.assertEqual("Item 3", store.item_names[3])
+        self.assertEqual("Other Item 5", store.item_names[15])
+        self.assertEqual("Other Item 19", store.item_names[29])
+        self.assertEqual("Location 19", store.location_names[19])
+        for missing in (-1, 30, "3", 3.0):
+            self.assertNotIn(missing, store.item_names)
+
+    def test_lazy_games(self) -> None:
+        """Test that data packages are only unpacked when accessed and match what was written"""
+        store = DataPackageStore(self.path)
+        self.assertEqual({f"Game {game}": f"checksum {game}" for game in range(3)}, store.checksums)
+        self.assertEqual(list(self.games), list(store.games))
+        self.assertEqual({}, store.games.packages)
+        self.assertEqual(self.games["Game 1"], store.games["Game 1"])
+        self.assertEqual(self.games["Game 1"]["item_name_groups"], store.item_name_groups["Game 1"])
+        self.assertEqual(["Game 1"], list(store.games.packages))
+
+    def test_reuse(self) -> None:
+        """Test that the same data packages reuse the written file and changed ones don't"""
+        self.assertEqual(self.path, DataPackageStore.write(self.directory.name, self.games))
+        self.games["Game 0"]["checksum"] = "changed"
+        self.assertNotEqual(self.path, DataPackageStore.write(self.directory.name, self.games))
+        self.assertEqual(2, len(os.listdir(self.directory.name)))
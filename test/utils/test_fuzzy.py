@@ -0,0 +1,34 @@
+# Tests for FuzzyIndex in Utils.py
+
+import random
+import string
+import unittest
+
+from Utils import FuzzyIndex, get_fuzzy_results
+
+
+class TestFuzzyIndex(unittest.TestCase):
+    """Tests that FuzzyIndex gets the same results as scoring every word"""
+
+    def test_same_results(self):
+        rand = random.Random(0)
+        alphabet = string.ascii_letters[:8] + " -"
+        words = ["".join(rand.choices(alphabet, k=rand.randint(1, 16))) for _ in range(500)]
+        words += ["AP-1-00" + str(i) for i in range(10)]
+        words += ["Sword", "Master Sword", "master sword", "Swords", "İsword", "Épée"]
+        index = FuzzyIndex(words)
+        queries = [rand.choice(words) for _ in range(20)]
+        queries += [word[1:] + rand.choice(alphabet) for word in queries]
+        queries += ["sword", "AP-1-00x", "zzz", "S", "x" * 30, "İsword", "Epee", "épée"]
+        for query in queries:
+            for limit in (1, 2, 10, None):
+                with self.subTest(query=query, limit=limit):
+                    self.assertEqual(get_fuzzy_results(query, words, limit), index.get_results(query, limit))
+                    self.assertEqual(get_fuzzy_results(query, words, limit), get_fuzzy_results(query, index, limit))
+
+    def test_duplicates(self):
+        words = ["Bow", "Arrow", "Bow", "bow"]
+        index = FuzzyIndex(words)
+        for query in ("bow", "Bo", "row"):
+            with self.subTest(query=query):
+                self.assertEqual(get_fuzzy_results(query, words), index.get_results(query))
@@ -0,0 +1,24 @@
+import typing
+
+if typing.TYPE_CHECKING:
+    from flask import Flask
+
+_app: "typing.Optional[Flask]" = None
+
+
+def get_test_app() -> "Flask":
+    """The WebHost app on an in-memory database, set up once as the database can only be bound once."""
+    global _app
+    if _app is None:
+        from WebHostLib import app as raw_app
+        from WebHost import get_app
+        raw_app.config["PONY"] = {
+            "provider": "sqlite",
+            "filename": ":memory:",
+            "create_db": True,
+        }
+        raw_app.config.update({
+            "TESTING": True,
+        })
+        _app = get_app()
+    return _app
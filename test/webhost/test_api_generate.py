@@ -3,23 +3,13 @@ import unittest
 import json
 import yaml
 
+from . import get_test_app
+
 
 class TestDocs(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
-        from WebHostLib import app as raw_app
-        from WebHost import get_app
-        raw_app.config["PONY"] = {
-            "provider": "sqlite",
-            "filename": ":memory:",
-            "create_db": True,
-        }
-        raw_app.config.update({
-            "TESTING": True,
-        })
-        app = get_app()
-
-        cls.client = app.test_client()
+        cls.client = get_test_app().test_client()
 
     def test_correct_error_empty_request(self):
         response = self.client.post("/api/generate")
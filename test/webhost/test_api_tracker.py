@@ -0,0 +1,83 @@
+import base64
+import io
+import pickle
+import unittest
+import uuid
+
+from pony.orm import db_session
+
+from MultiServer import encode_save_journal
+from NetUtils import ClientStatus, NetworkItem, NetworkSlot, SlotType, write_multidata
+from . import get_test_app
+
+
+class TestTrackerAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = get_test_app().test_client()
+
+    def setUp(self) -> None:
+        from WebHostLib.models import Room, Seed
+
+        multidata = io.BytesIO()
+        write_multidata(multidata, {
+            "seed_name": "12345",
+            "datapackage": {},
+            "slot_info": {1: NetworkSlot("Player1", "Archipelago", SlotType.player),
+                          2: NetworkSlot("Player2", "Archipelago", SlotType.player)},
+            "locations": {1: {10: (20, 2, 0), 11: (21, 1, 0)}, 2: {12: (22, 1, 0)}},
+        })
+        save = {
+            "location_checks": {(0, 1): {10}},
+            "received_items": {(0, 2, True): [NetworkItem(20, 10, 1, 0)]},
+            "hints": {},
+            "client_game_state": {(0, 2): ClientStatus.CLIENT_GOAL},
+            "client_activity_timers": (((0, 1), 1000.0),),
+        }
+        self.tracker = uuid.uuid4()
+        with db_session:
+            seed = Seed(multidata=multidata.getvalue(), owner=uuid.uuid4())
+            self.room_id = Room(seed=seed, owner=uuid.uuid4(), tracker=self.tracker, multisave=pickle.dumps(save)).id
+        self.url = f"/api/tracker/{self.get_suuid(self.tracker)}"
+
+    @staticmethod
+    def get_suuid(value: uuid.UUID) -> str:
+        return base64.urlsafe_b64encode(value.bytes).rstrip(b"=").decode("ascii")
+
+    def test_room(self):
+        """Test that the room's players are summarized"""
+        response = self.client.get(self.url)
+        self.assertEqual(200, response.status_code)
+        teams = response.get_json()["teams"]
+        self.assertEqual([0], [team["team"] for team in teams])
+        player1, player2 = teams[0]["players"]
+        self.assertEqual(("Player1", 1, 2, 1000.0), (player1["name"], player1["checked"], player1["total"],
+                                                     player1["last_activity"]))
+        self.assertEqual((ClientStatus.CLIENT_GOAL, None), (player2["status"], player2["last_activity"]))
+
+    def test_player(self):
+        """Test that a player's checks and items are listed"""
+        data = self.client.get(f"{self.url}/0/2").get_json()
+        self.assertEqual([], data["checked_locations"])
+        self.assertEqual([12], data["missing_locations"])
+        self.assertEqual([[20, 10, 1, 0]], data["received_items"])
+        self.assertEqual(404, self.client.get(f"{self.url}/0/3").status_code)
+        self.assertEqual(404, self.client.get(f"/api/tracker/{self.get_suuid(uuid.uuid4())}/0/1").status_code)
+
+    def test_conditional(self):
+        """Test that the same save is answered by a 304, until the room saves again"""
+        from WebHostLib.models import Room, SaveJournal
+
+        url = f"{self.url}/0/1"
+        etag = self.client.get(url).headers["ETag"]
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response.headers["ETag"])
+
+        with db_session:
+            SaveJournal(room=Room.get(id=self.room_id),
+                        data=encode_save_journal(0, [("location_checks", (0, 1), {11})]))
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers["ETag"])
+        self.assertEqual([10, 11], response.get_json()["checked_locations"])
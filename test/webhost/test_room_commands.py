@@ -0,0 +1,75 @@
+import json
+import os
+import queue
+import socket
+import tempfile
+import typing
+import unittest
+import uuid
+from unittest import mock
+
+from WebHostLib import roomcommands
+
+
+class TestRoomCommands(unittest.TestCase):
+    key = b"secret"
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(roomcommands, "registry_folder", self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+        self.room_id = uuid.uuid4()
+        self.received = queue.Queue()
+        self.listener = roomcommands.CommandListener(self.room_id, self.key, self.received.put)
+        self.addCleanup(self.listener.close)
+
+    def test_push(self):
+        """Test that a pushed command reaches the room's listener"""
+        self.assertTrue(roomcommands.push_command(self.room_id, "/exit", self.key))
+        self.assertEqual("/exit", self.received.get(timeout=5))
+
+    def test_unknown_room(self):
+        """Test that pushing to a room without a listener fails, so the command can be stored instead"""
+        self.assertFalse(roomcommands.push_command(uuid.uuid4(), "/exit", self.key))
+        self.listener.close()
+        self.assertFalse(os.path.exists(roomcommands.get_registry_file(self.room_id)))
+        self.assertFalse(roomcommands.push_command(self.room_id, "/exit", self.key))
+
+    def test_wrong_key(self):
+        """Test that a command signed with another key is refused"""
+        self.assertFalse(roomcommands.push_command(self.room_id, "/exit", b"guess"))
+        self.assertTrue(self.received.empty())
+
+    def send(self, make_message: typing.Callable[[str], bytes]) -> bytes:
+        """Connects to the listener, sends the message made for its challenge and returns the answer."""
+        with open(roomcommands.get_registry_file(self.room_id)) as f:
+            port = int(f.read())
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as connection, \
+                connection.makefile("rwb") as stream:
+            stream.write(make_message(stream.readline().decode().rstrip("\n")))
+            stream.flush()
+            return stream.readline()
+
+    def test_replay(self):
+        """Test that a command signed for one connection's challenge is refused on another connection"""
+        room_key = roomcommands.get_room_key(self.key, self.room_id)
+        messages = []
+
+        def sign(challenge: str) -> bytes:
+            messages.append(json.dumps({"room": str(self.room_id), "command": "/exit",
+                                        "signature": roomcommands.sign_command(room_key, challenge, "/exit")}))
+            return messages[0].encode() + b"\n"
+
+        self.assertEqual(b"1\n", self.send(sign))
+        self.assertEqual("/exit", self.received.get(timeout=5))
+        self.assertEqual(b"0\n", self.send(sign))
+        self.assertTrue(self.received.empty())
+
+    def test_oversized(self):
+        """Test that a message longer than the limit is refused without being read as a whole"""
+        self.assertFalse(roomcommands.push_command(self.room_id, "a" * roomcommands.message_limit, self.key))
+        self.assertTrue(roomcommands.push_command(self.room_id, "/exit", self.key))
+        self.assertEqual("/exit", self.received.get(timeout=5))
+        self.assertTrue(self.received.empty())
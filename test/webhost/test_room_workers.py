@@ -0,0 +1,116 @@
+import asyncio
+import datetime
+import io
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from pony.orm import db_session
+
+from NetUtils import NetworkSlot, SlotType, write_multidata
+from WebHostLib import autolauncher, customserver
+from . import get_test_app
+
+
+class FakeWorker:
+    def __init__(self, rooms: int, load: int, alive: bool = True):
+        self.rooms = set(range(rooms))
+        self.load = load
+        self.process = mock.Mock(is_alive=mock.Mock(return_value=alive))
+
+
+class TestPlacement(unittest.TestCase):
+    config = {"ROOMS_PER_WORKER": 3}
+
+    def test_least_loaded(self):
+        """Test that rooms go to the least loaded worker that is alive and has space left"""
+        full, dead, busy, idle = FakeWorker(3, 0), FakeWorker(0, 0, False), FakeWorker(1, 20), FakeWorker(2, 5)
+        with mock.patch.object(autolauncher, "room_workers", [full, dead, busy, idle]):
+            self.assertIs(idle, autolauncher.get_room_worker(self.config))
+
+    def test_all_full(self):
+        """Test that a new worker is started once all workers are full"""
+        workers = [FakeWorker(3, 0)]
+        with mock.patch.object(autolauncher, "room_workers", workers), \
+                mock.patch.object(autolauncher, "RoomWorkerProcess") as worker_process:
+            worker = autolauncher.get_room_worker(self.config)
+        self.assertIs(worker_process.return_value, worker)
+        self.assertIn(worker, workers)
+
+
+class TestRoomLogs(unittest.TestCase):
+    def test_own_file(self):
+        """Test that each room's handler only takes what is logged within that room"""
+        rooms = [uuid.uuid4(), uuid.uuid4()]
+        with tempfile.TemporaryDirectory() as logs, mock.patch("Utils.user_path", return_value=logs):
+            handlers = [customserver.RoomLogHandler(room_id) for room_id in rooms]
+            logger = logging.getLogger("TestRoomLogs")
+            logger.propagate = False
+            for handler in handlers:
+                logger.addHandler(handler)
+            try:
+                for room_id in rooms:
+                    self.assertIsNone(customserver.current_room.get())
+                    token = customserver.current_room.set(room_id)
+                    logger.warning(f"Message of {room_id}")
+                    customserver.current_room.reset(token)
+                logger.warning("Message of the worker")
+            finally:
+                for handler in handlers:
+                    logger.removeHandler(handler)
+                    handler.close()
+            for room_id in rooms:
+                with open(os.path.join(logs, f"{room_id}.txt"), encoding="utf-8-sig") as f:
+                    lines = f.read().splitlines()
+                self.assertEqual([f"Message of {room_id}"], [line.split("]: ")[1] for line in lines])
+
+
+class TestRoomShutdown(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        from WebHostLib.models import Room, Seed
+
+        get_test_app()
+        multidata = io.BytesIO()
+        write_multidata(multidata, {
+            "seed_name": "12345",
+            "version": (0, 4, 4),
+            "minimum_versions": {"server": (0, 0, 0), "clients": {}},
+            "datapackage": {},
+            "slot_info": {1: NetworkSlot("Player1", "Archipelago", SlotType.player)},
+            "connect_names": {"Player1": (0, 1)},
+            "names": [["Player1"]],
+            "locations": {1: {}},
+            "slot_data": {1: {}},
+            "server_options": {},
+            "er_hint_data": {},
+            "precollected_items": {1: []},
+            "precollected_hints": {1: set()},
+            "tags": [],
+        })
+        with db_session:
+            seed = Seed(multidata=multidata.getvalue(), owner=uuid.uuid4())
+            self.room_id = Room(seed=seed, owner=uuid.uuid4()).id
+
+    def get_last_activity(self) -> datetime.datetime:
+        from WebHostLib.models import Room
+
+        with db_session:
+            return Room.get(id=self.room_id).last_activity
+
+    async def test_late_save(self) -> None:
+        """Test that a save the auto saver still had due does not mark a finished room as active again"""
+        ctx = customserver.WebHostContext(customserver.get_static_server_data())
+        ctx.load(self.room_id)
+        ctx.saving = True
+        ctx.shutdown_task = asyncio.create_task(asyncio.sleep(0))
+        await customserver.finish_room(ctx)
+        ctx.save_dirty = True
+        customserver.RoomWorker.save_room(ctx)
+        last_activity = self.get_last_activity()
+        self.assertFalse(ctx.save_dirty)
+        self.assertFalse(ctx._save())
+        self.assertEqual(last_activity, self.get_last_activity())
+        self.assertLess(last_activity, datetime.datetime.utcnow() - datetime.timedelta(minutes=1))
@@ -0,0 +1,94 @@
+import datetime
+import os
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+from WebHostLib import autolauncher, wakeup
+
+
+class TestWakeup(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(wakeup, "registry_folder", self.temp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+        self.listener = wakeup.WakeupListener("scheduler")
+        self.addCleanup(self.listener.close)
+
+    def test_wake(self):
+        """Test that a listener gets all wake-ups sent since it last waited"""
+        self.assertEqual([], self.listener.wait(0))
+        self.assertTrue(wakeup.wake("scheduler", "room"))
+        self.assertTrue(wakeup.wake("scheduler"))
+        self.assertEqual(["room", ""], self.listener.wait(5))
+        self.assertEqual([], self.listener.wait(0.01))
+
+    def test_unknown_scheduler(self):
+        """Test that waking a scheduler that does not run fails"""
+        self.assertFalse(wakeup.wake("other"))
+        self.listener.close()
+        self.assertFalse(os.path.exists(wakeup.get_registry_file("scheduler")))
+        self.assertFalse(wakeup.wake("scheduler"))
+
+
+class FakeRoom:
+    def __init__(self, minutes_ago: float, timeout: int = 60 * 60):
+        self.id = uuid.uuid4()
+        self.last_activity = datetime.datetime.utcnow() - datetime.timedelta(minutes=minutes_ago)
+        self.timeout = timeout
+
+
+class TestRoomScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rooms = {}
+        self.launched = []
+        for patcher in (mock.patch.object(autolauncher, "Room", get=mock.Mock(side_effect=self.get_room)),
+                        mock.patch.object(autolauncher, "launch_room", lambda room, config: self.launched.append(room)),
+                        mock.patch.object(autolauncher, "multiworlds", {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.scheduler = autolauncher.RoomScheduler({"SCHEDULER_INTERVAL": 30})
+
+    def get_room(self, id: uuid.UUID) -> FakeRoom:
+        return self.rooms.get(id)
+
+    def add_room(self, minutes_ago: float) -> FakeRoom:
+        room = FakeRoom(minutes_ago)
+        self.rooms[room.id] = room
+        return room
+
+    def test_wake(self):
+        """Test that woken rooms are launched, unless known to be running"""
+        room = self.add_room(0)
+        self.scheduler.wake(str(room.id))
+        self.assertEqual([room], self.launched)
+        self.assertIn(room.id, self.scheduler.active)
+
+        autolauncher.multiworlds[room.id] = mock.Mock(done=mock.Mock(return_value=False))
+        self.scheduler.wake(str(room.id))
+        self.assertEqual([room], self.launched)
+        autolauncher.multiworlds[room.id].done.return_value = True
+        self.scheduler.wake(str(room.id))
+        self.assertEqual([room, room], self.launched)
+
+        self.scheduler.wake(str(uuid.uuid4()))
+        self.scheduler.wake("not a room")
+        self.assertEqual([room, room], self.launched)
+
+    def test_expire(self):
+        """Test that rooms leave the heap once timed out, unless they saw activity in the meantime"""
+        quiet, busy, old = self.add_room(59.99), self.add_room(59.99), self.add_room(61)
+        for room in (quiet, busy, old):
+            self.scheduler.launch(room)
+        self.assertEqual({quiet.id, busy.id}, set(self.scheduler.active))
+        self.launched.clear()
+
+        busy.last_activity = datetime.datetime.utcnow()
+        with mock.patch.object(autolauncher, "datetime", mock.Mock(
+                utcnow=mock.Mock(return_value=datetime.datetime.utcnow() + datetime.timedelta(seconds=2)))):
+            self.scheduler.expire()
+        self.assertEqual({busy.id}, set(self.scheduler.active))
+        self.assertCountEqual([quiet, busy], self.launched)
@@ -0,0 +1,80 @@
+import io
+import unittest
+import uuid
+from unittest import mock
+
+from pony.orm import db_session
+
+from NetUtils import NetworkSlot, SlotType, write_multidata
+from worlds.AutoWorld import data_package_checksum
+from . import get_test_app
+
+
+class TestQueuedUpload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.app = get_test_app()
+        cls.client = cls.app.test_client()
+
+    def setUp(self) -> None:
+        patcher = mock.patch.dict(self.app.config, {"UPLOAD_JOB_THRESHOLD": 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("WebHostLib.upload.wake")
+        self.wake = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        game_data = {
+            "item_name_groups": {"Everything": ["Item"]},
+            "item_name_to_id": {"Item": 1},
+            "location_name_groups": {"Everywhere": []},
+            "location_name_to_id": {f"Location {uuid.uuid4()}": 1},
+        }
+        game_data["checksum"] = data_package_checksum(game_data)
+        multidata = io.BytesIO()
+        write_multidata(multidata, {
+            "slot_info": {1: NetworkSlot("Player1", "Game", SlotType.player)},
+            "datapackage": {"Game": game_data},
+        })
+        self.multidata = multidata.getvalue()
+
+    def upload(self, data: bytes) -> uuid.UUID:
+        """Uploads data, returns the id of the Generation it was queued as."""
+        response = self.client.post("/uploads", data={"file": (io.BytesIO(data), "test.archipelago")})
+        self.assertEqual(302, response.status_code)
+        self.wake.assert_called_with("autogen")
+        path, _, sid = response.location.rpartition("/")
+        self.assertTrue(path.endswith("/wait"))
+        return self.app.url_map.converters["suuid"].to_python(None, sid)
+
+    def test_queued(self):
+        """Test that an upload is stored as a seed by the generators, with stored data packages not validated again"""
+        from WebHostLib.models import Generation, Seed
+        from WebHostLib.upload import games_package_schema, process_queued_upload
+
+        sid = self.upload(self.multidata)
+        self.assertEqual(sid, process_queued_upload(sid))
+        with db_session:
+            self.assertIsNone(Generation.get(id=sid))
+            self.assertEqual(["Player1"], [slot.player_name for slot in Seed[sid].slots])
+
+        sid = self.upload(self.multidata)
+        with mock.patch.object(games_package_schema, "validate", side_effect=AssertionError):
+            process_queued_upload(sid)
+        with db_session:
+            self.assertIsNotNone(Seed.get(id=sid))
+
+    def test_error(self):
+        """Test that a broken upload fails its Generation and is not kept"""
+        from WebHostLib.models import Generation, STATE_ERROR
+        from WebHostLib.upload import process_queued_upload
+
+        sid = self.upload(self.multidata[:20])
+        with self.assertRaises(Exception):
+            process_queued_upload(sid)
+        with db_session:
+            generation = Generation[sid]
+            self.assertEqual(STATE_ERROR, generation.state)
+            self.assertEqual(b"", generation.options)
+        wait_page = "/wait/" + self.app.url_map.converters["suuid"].to_url(None, sid)
+        self.assertIn(b"Could not load multidata", self.client.get(wait_page).data)
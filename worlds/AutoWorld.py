@@ -52,6 +52,15 @@ class AutoWorldRegister(type):
         dct["item_name_groups"] = {group_name: frozenset(group_set) for group_name, group_set
                                    in dct.get("item_name_groups", {}).items()}
         dct["item_name_groups"]["Everything"] = dct["item_names"]
+        # index groups for the per group item counts of CollectionState
+        dct["item_name_group_ids"] = {group_name: group_id for group_id, group_name
+                                      in enumerate(dct["item_name_groups"])}
+        item_name_to_group_ids: Dict[str, List[int]] = {}
+        for group_name, group_id in dct["item_name_group_ids"].items():
+            for item_name in dct["item_name_groups"][group_name]:
+                item_name_to_group_ids.setdefault(item_name, []).append(group_id)
+        dct["item_name_to_group_ids"] = {item_name: tuple(group_ids) for item_name, group_ids
+                                         in item_name_to_group_ids.items()}
         dct["item_descriptions"] = {name: _normalize_description(description) for name, description
                                     in dct.get("item_descriptions", {}).items()}
         dct["item_descriptions"]["Everything"] = "All items in the entire game."
@@ -147,6 +156,7 @@ def call_single(multiworld: "MultiWorld", method_name: str, player: int, *args:
 
 
 def call_all(multiworld: "MultiWorld", method_name: str, *args: Any) -> None:
+    start = time.perf_counter()
     world_types: Set[AutoWorldRegister] = set()
     for player in multiworld.player_ids:
         prev_item_count = len(multiworld.itempool)
@@ -161,6 +171,9 @@ def call_all(multiworld: "MultiWorld", method_name: str, *args: Any) -> None:
                         f"of player \"{multiworld.player_name[player]}\". Please make a copy instead.")
 
     call_stage(multiworld, method_name, *args)
+    taken = time.perf_counter() - start
+    if taken > 1.0:
+        perf_logger.info(f"Took {taken:.4f} seconds in {method_name} for {len(multiworld.player_ids)} worlds.")
 
 
 def call_stage(multiworld: "MultiWorld", method_name: str, *args: Any) -> None:
@@ -208,6 +221,26 @@ class World(metaclass=AutoWorldRegister):
     topology_present: ClassVar[bool] = False
     """indicate if world type has any meaningful layout/pathing"""
 
+    incremental_reachability: ClassVar[bool] = False
+    """
+    Only re-test blocked Entrances whose access_rule looked at an item that has since been collected, instead of
+    re-testing every blocked Entrance of this world whenever one of its items gets collected.
+
+    Only enable this if every Entrance access_rule exclusively depends on item counts read through
+    `CollectionState`'s has/count family (or `prog_items` directly) and on Regions registered through
+    `MultiWorld.register_indirect_condition`, and if collecting an item only ever changes the count of that item's own
+    name, i.e. no LogicMixin state and no progressive item renaming in `collect_item`.
+    """
+
+    count_item_name_groups: ClassVar[bool] = False
+    """
+    Keep a running count per item name group in `CollectionState.prog_items`, so that `has_group` and `count_group`
+    only look up a single number instead of every item name in the group. This makes changing item counts a bit more
+    expensive, so only enable it if your rules lean on item name groups.
+
+    Only enable this if your world never changes `prog_items` bypassing item assignment, e.g. through `dict` methods.
+    """
+
     all_item_and_group_names: ClassVar[FrozenSet[str]] = frozenset()
     """gets automatically populated with all item and item group names"""
 
@@ -219,6 +252,11 @@ class World(metaclass=AutoWorldRegister):
     item_name_groups: ClassVar[Dict[str, Set[str]]] = {}
     """maps item group names to sets of items. Example: {"Weapons": {"Sword", "Bow"}}"""
 
+    item_name_group_ids: ClassVar[Dict[str, int]]
+    """automatically generated index of each item group name"""
+    item_name_to_group_ids: ClassVar[Dict[str, Tuple[int, ...]]]
+    """automatically generated indexes of the item groups each item name is in"""
+
     item_descriptions: ClassVar[Dict[str, str]] = {}
     """An optional map from item names (or item group names) to brief descriptions for users.
 
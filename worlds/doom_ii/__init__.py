@@ -43,6 +43,7 @@ class DOOM2World(World):
     options: DOOM2Options
     game = "DOOM II"
     web = DOOM2Web()
+    incremental_reachability = True
     data_version = 3
     required_client_version = (0, 3, 9)
 
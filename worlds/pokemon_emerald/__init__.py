@@ -67,6 +67,7 @@ class PokemonEmeraldWorld(World):
     game = "Pokemon Emerald"
     web = PokemonEmeraldWebWorld()
     topology_present = True
+    count_item_name_groups = True
 
     settings_key = "pokemon_emerald_settings"
     settings: ClassVar[PokemonEmeraldSettings]